@@ -0,0 +1,549 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import re
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qsl, urlsplit
+import db
+
+HOST = "127.0.0.1"
+PORT = 8765
+READ_THREADS = 4
+MAX_WRITE_BATCH = 500
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_HEADERS = 100
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+STREAM_PAGE_SIZE = 500
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+JSON_TYPE = "application/json; charset=utf-8"
+NDJSON_TYPE = "application/x-ndjson"
+TASK_KEYS = ['id'] + db.TASK_FIELDS
+EDITABLE_FIELDS = ['title', 'description', 'category', 'status', 'due_at']
+# JSON types a cursor value may have for each integer sort term; the other terms are text.
+CURSOR_TYPES = {db.SORT_TERMS['category'][0]: (int,), db.SORT_TERMS['status'][0]: (int,)}
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+           404: "Not Found", 405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+_STOP = object()
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = list(headers)
+
+
+class Request:
+    def __init__(self, method, target, version, headers, body):
+        url = urlsplit(target)
+        self.method = method.upper()
+        self.path = url.path.rstrip('/') or '/'
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+        connection = headers.get('connection', '').lower()
+        self.keep_alive = 'keep-alive' in connection if version == 'HTTP/1.0' else 'close' not in connection
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError:
+            raise ApiError(400, "Body is not valid JSON")
+
+    def has_etag(self, etag):
+        tags = [tag.strip().removeprefix('W/') for tag in self.headers.get('if-none-match', '').split(',')]
+        return '*' in tags or etag in tags
+
+    def wants_ndjson(self):
+        return self.query.get('format') == 'ndjson' or NDJSON_TYPE in self.headers.get('accept', '')
+
+
+class Response:
+    def __init__(self, status, body=b"", content_type=JSON_TYPE, etag=None, headers=(), stream=None):
+        self.status = status
+        self.body = body
+        self.stream = stream
+        self.headers = [('Content-Type', content_type)] if body or stream is not None else []
+        if etag is not None:
+            # Clients keep the response but revalidate it every time; a 304 costs one counter read.
+            self.headers += [('ETag', etag), ('Cache-Control', 'no-cache')]
+        self.headers += list(headers)
+
+
+def json_response(status, payload, etag=None, headers=()):
+    return Response(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), etag=etag, headers=headers)
+
+
+def error_response(status, message, headers=()):
+    return json_response(status, {'error': message}, headers=headers)
+
+
+def _etag(version):
+    return f'"{version}"'
+
+
+def _task_json(row):
+    return {key: row[key] for key in TASK_KEYS}
+
+
+def _ndjson(rows):
+    return "".join(json.dumps(_task_json(row), ensure_ascii=False) + "\n" for row in rows).encode('utf-8')
+
+
+def encode_cursor(cursor):
+    # Cursors are the sort values of the last row; clients get them as an opaque token.
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, terms):
+    # A cursor holds one value per sort term of the requested order, then the task id. Text
+    # terms may be null, like a timestamp column.
+    if not token:
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        raise ApiError(400, "Invalid cursor")
+    types = [CURSOR_TYPES.get(term, (str, type(None))) for term in terms] + [(int,)]
+    if (not isinstance(cursor, list) or len(cursor) != len(types)
+            or not all(type(value) in allowed for value, allowed in zip(cursor, types))):
+        raise ApiError(400, "Invalid cursor for this order and these filters")
+    return tuple(cursor)
+
+
+def _int_param(request, name, default, minimum, maximum):
+    value = request.query.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+    if not minimum <= value <= maximum:
+        raise ApiError(400, f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def _filters(request):
+    # Unknown statuses, deadline filters and orders are refused by db.py with a ValueError.
+    return {name: request.query.get(name) or None for name in ['category', 'status', 'due', 'order']}
+
+
+def _task_ids(body):
+    ids = body.get('ids')
+    if not isinstance(ids, list) or not ids or not all(type(task_id) is int for task_id in ids):
+        raise ApiError(400, "ids must be a non-empty list of task ids")
+    return ids
+
+
+def _check_fields(body, allowed):
+    if not isinstance(body, dict):
+        raise ApiError(400, "Expected a JSON object")
+    unknown = sorted(set(body) - set(allowed))
+    if unknown:
+        raise ApiError(400, f"Unknown field: {unknown[0]}")
+
+
+def _task_fields(body, partial):
+    # The checks the task dialog makes, so a script cannot store what the window would refuse.
+    _check_fields(body, EDITABLE_FIELDS)
+    fields = {}
+    for name in ['title', 'description', 'category', 'status']:
+        if name in body:
+            if not isinstance(body[name], str):
+                raise ApiError(400, f"{name} must be a string")
+            fields[name] = body[name].strip()
+    if not fields.get('title') and (not partial or 'title' in fields):
+        raise ApiError(400, "title is required")
+    if 'category' in fields and not fields['category']:
+        raise ApiError(400, "category must not be empty")
+    if 'status' in fields and fields['status'] not in db.STATUSES:
+        raise ApiError(400, f"status must be one of {', '.join(db.STATUSES)}")
+    if 'due_at' in body:
+        due_at = body['due_at']
+        if due_at is not None:
+            try:
+                due_at = datetime.strptime(due_at, TIME_FORMAT).strftime(TIME_FORMAT)
+            except (TypeError, ValueError):
+                raise ApiError(400, "due_at must be a UTC time like 2025-03-01 09:00:00, or null")
+        fields['due_at'] = due_at
+    if partial and not fields:
+        raise ApiError(400, "Nothing to update")
+    return fields
+
+
+# These run on the writer thread, inside the transaction of the batch they were queued in.
+
+def _add(fields):
+    return db.add_task(fields['title'], fields.get('description', ""), fields.get('category', "عام"),
+                       fields.get('due_at'), fields.get('status', 'pending'))
+
+
+def _create_task(fields):
+    return db.get_task(_add(fields))
+
+
+def _create_tasks(tasks):
+    return [_add(fields) for fields in tasks]
+
+
+def _update_task(task_id, fields):
+    db.update_task(task_id, **fields)
+    return db.get_task(task_id)
+
+
+def _snapshot(func, args):
+    # The change counter and the result are read in one transaction, so the ETag always
+    # describes the data it is sent with.
+    conn = db.get_connection()
+    conn.execute("BEGIN")
+    try:
+        return db.change_counter(), func(*args)
+    finally:
+        conn.execute("COMMIT")
+
+
+async def read_request(reader):
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise ApiError(400, "Malformed request line")
+        headers = {}
+        for _ in range(MAX_HEADERS):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ApiError(400, "Too many headers")
+    except ValueError:
+        # StreamReader refuses lines longer than its buffer limit.
+        raise ApiError(400, "Request line or header too long")
+    if 'transfer-encoding' in headers:
+        raise ApiError(411, "Send the body with a Content-Length")
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise ApiError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise ApiError(413, f"Bodies are limited to {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return Request(method, target, version, headers, body)
+
+
+async def send_response(writer, response, keep_alive):
+    headers = list(response.headers)
+    if response.stream is not None:
+        headers.append(('Transfer-Encoding', 'chunked'))
+    elif response.status not in (204, 304):
+        headers.append(('Content-Length', str(len(response.body))))
+    headers.append(('Connection', 'keep-alive' if keep_alive else 'close'))
+    head = [f"HTTP/1.1 {response.status} {REASONS[response.status]}"] + [f"{name}: {value}" for name, value in headers]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+    if response.stream is None:
+        writer.write(response.body)
+    else:
+        async for chunk in response.stream:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                # Waits for a slow client here, so a large listing is never held in memory.
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+class TaskApi:
+    # Reads run on a small thread pool, each thread with its own db.py connection, so WAL lets them
+    # run beside each other and beside the writer. Writes go to a single writer thread; whatever
+    # is queued while it commits goes into the next transaction together, the way WriteQueue
+    # batches the window's writes, and a failed batch is replayed one command at a time.
+    def __init__(self, readers=READ_THREADS):
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="api-reader")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="api-writer")
+        self._writes = None
+        self._writer_task = None
+        self._routes = [(method, re.compile(pattern), handler) for method, pattern, handler in [
+            ('GET', r'/tasks', self.list_tasks),
+            ('POST', r'/tasks', self.create_tasks),
+            ('PATCH', r'/tasks', self.update_tasks),
+            ('DELETE', r'/tasks', self.delete_tasks),
+            ('GET', r'/tasks/(\d+)', self.get_task),
+            ('PATCH', r'/tasks/(\d+)', self.update_task),
+            ('DELETE', r'/tasks/(\d+)', self.delete_task),
+            ('GET', r'/search', self.search),
+            ('GET', r'/stats', self.stats),
+            ('GET', r'/categories', self.categories),
+        ]]
+
+    def start(self):
+        self._writes = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._run_writer())
+
+    async def close(self):
+        if self._writer_task is not None:
+            self._writes.put_nowait(_STOP)
+            await self._writer_task
+            await asyncio.get_running_loop().run_in_executor(self._writer, db.close_connection)
+        self._writer.shutdown()
+        self._readers.shutdown()
+
+    async def read(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, _snapshot, func, args)
+
+    async def write(self, func, *args):
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((future, func, args))
+        return await future
+
+    async def not_modified(self, request):
+        # The client's copy is still current when its ETag matches the counter; the query is skipped.
+        if 'if-none-match' not in request.headers:
+            return None
+        version = await asyncio.get_running_loop().run_in_executor(self._readers, db.change_counter)
+        if request.has_etag(_etag(version)):
+            return Response(304, etag=_etag(version))
+        return None
+
+    async def _run_writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await self._writes.get()
+            if command is _STOP:
+                return
+            batch = [command]
+            stop = False
+            while len(batch) < MAX_WRITE_BATCH and not self._writes.empty():
+                command = self._writes.get_nowait()
+                if command is _STOP:
+                    stop = True
+                    break
+                batch.append(command)
+            results = await loop.run_in_executor(self._writer, self._execute, batch)
+            for (future, _, _), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            if stop:
+                return
+
+    def _execute(self, batch):
+        try:
+            return db.run_with_retry(self._run_batch, batch)
+        except Exception as e:
+            if len(batch) == 1:
+                return [(False, e)]
+            return [result for command in batch for result in self._execute([command])]
+
+    @staticmethod
+    def _run_batch(batch):
+        with db.transaction():
+            return [(True, func(*args)) for _, func, args in batch]
+
+    async def dispatch(self, request):
+        allowed = []
+        for method, pattern, handler in self._routes:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            if method != request.method:
+                allowed.append(method)
+                continue
+            try:
+                return await handler(request, *(int(group) for group in match.groups()))
+            except ApiError as e:
+                return error_response(e.status, e.message, e.headers)
+            except ValueError as e:
+                return error_response(400, str(e))
+            except db.sqlite3.Error as e:
+                if db.is_busy(e):
+                    return error_response(503, "The database is busy, try again", [('Retry-After', '1')])
+                traceback.print_exc()
+                return error_response(500, "Database error")
+        if allowed:
+            return error_response(405, f"Use {', '.join(allowed)}", [('Allow', ", ".join(allowed))])
+        return error_response(404, "No such endpoint")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except ApiError as e:
+                    # The rest of a refused request cannot be skipped reliably, so the connection ends.
+                    await send_response(writer, error_response(e.status, e.message), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                try:
+                    response = await self.dispatch(request)
+                except Exception:
+                    traceback.print_exc()
+                    response = error_response(500, "Internal error")
+                await send_response(writer, response, request.keep_alive)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            # A stream that fails half way is cut off; the client sees an incomplete response.
+            traceback.print_exc()
+        finally:
+            writer.close()
+
+    async def list_tasks(self, request):
+        filters = _filters(request)
+        terms, _ = db.ordering(filters['order'], filters['due'], filters['category'], filters['status'])
+        cursor = decode_cursor(request.query.get('cursor'), terms)
+        stream = request.wants_ndjson()
+        page_size = STREAM_PAGE_SIZE if stream else _int_param(request, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        cached = await self.not_modified(request)
+        if cached:
+            return cached
+        version, (rows, cursor) = await self.read(
+            db.get_tasks_page, filters['category'], filters['status'], cursor, page_size, filters['due'],
+            filters['order'])
+        if stream:
+            return Response(200, content_type=NDJSON_TYPE, etag=_etag(version),
+                            stream=self._stream_pages(rows, cursor, filters))
+        return json_response(200, {'tasks': [_task_json(row) for row in rows], 'next_cursor': encode_cursor(cursor)},
+                             etag=_etag(version))
+
+    async def _stream_pages(self, rows, cursor, filters):
+        # One keyset page at a time; the ETag is that of the first page, later pages are read as
+        # the client takes them.
+        while True:
+            yield _ndjson(rows)
+            if cursor is None:
+                return
+            _, (rows, cursor) = await self.read(
+                db.get_tasks_page, filters['category'], filters['status'], cursor, STREAM_PAGE_SIZE,
+                filters['due'], filters['order'])
+
+    async def get_task(self, request, task_id):
+        cached = await self.not_modified(request)
+        if cached:
+            return cached
+        version, row = await self.read(db.get_task, task_id)
+        if row is None:
+            raise ApiError(404, "No such task")
+        return json_response(200, _task_json(row), etag=_etag(version))
+
+    async def create_tasks(self, request):
+        body = request.json()
+        if isinstance(body, list):
+            tasks = [_task_fields(item, partial=False) for item in body]
+            return json_response(201, {'ids': await self.write(_create_tasks, tasks)})
+        row = await self.write(_create_task, _task_fields(body, partial=False))
+        return json_response(201, _task_json(row), headers=[('Location', f"/tasks/{row['id']}")])
+
+    async def update_task(self, request, task_id):
+        row = await self.write(_update_task, task_id, _task_fields(request.json(), partial=True))
+        if row is None:
+            raise ApiError(404, "No such task")
+        return json_response(200, _task_json(row))
+
+    async def delete_task(self, request, task_id):
+        if not await self.write(db.delete_tasks_bulk, [task_id]):
+            raise ApiError(404, "No such task")
+        return Response(204)
+
+    async def update_tasks(self, request):
+        body = request.json()
+        _check_fields(body, ['ids', 'category', 'status'])
+        fields = _task_fields({key: body[key] for key in ['category', 'status'] if key in body}, partial=True)
+        task_ids = _task_ids(body)
+        return json_response(200, {'updated': await self.write(db.update_tasks_bulk, task_ids,
+                                                               fields.get('category', ""), fields.get('status', ""))})
+
+    async def delete_tasks(self, request):
+        body = request.json()
+        _check_fields(body, ['ids'])
+        return json_response(200, {'deleted': await self.write(db.delete_tasks_bulk, _task_ids(body))})
+
+    async def search(self, request):
+        query = request.query.get('q', "").strip()
+        if not query:
+            raise ApiError(400, "q is required")
+        filters = _filters(request)
+        limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        offset = _int_param(request, 'offset', 0, 0, sys.maxsize)
+        include_archive = request.query.get('archive') in ('1', 'true')
+        cached = await self.not_modified(request)
+        if cached:
+            return cached
+        version, rows = await self.read(
+            lambda: db.search_tasks(query, filters['category'], filters['status'], limit, offset,
+                                    include_archive=include_archive, due=filters['due'], order=filters['order']))
+        tasks = [dict(_task_json(row), snippet=row['snippet'], archived=bool(row['archived'])) for row in rows]
+        return json_response(200, {'tasks': tasks}, etag=_etag(version))
+
+    async def stats(self, request):
+        cached = await self.not_modified(request)
+        if cached:
+            return cached
+        version, stats = await self.read(db.get_stats)
+        return json_response(200, stats, etag=_etag(version))
+
+    async def categories(self, request):
+        cached = await self.not_modified(request)
+        if cached:
+            return cached
+        version, names = await self.read(db.get_categories)
+        return json_response(200, {'categories': names}, etag=_etag(version))
+
+
+async def serve(host=HOST, port=PORT, readers=READ_THREADS):
+    api = TaskApi(readers)
+    api.start()
+    server = await asyncio.start_server(api.handle_connection, host, port)
+    print(f"Serving {db.DB_PATH} on http://{host}:{port}", file=sys.stderr, flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local JSON API for the task database")
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--host", default=HOST, help="address to listen on (default: %(default)s, this machine only)")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--readers", type=int, default=READ_THREADS,
+                        help="read threads, each with its own connection (default: %(default)s)")
+    parser.add_argument("--busy-timeout", type=int, default=db.BUSY_TIMEOUT_MS,
+                        help="milliseconds to wait for other processes holding the write lock (default: %(default)s)")
+    args = parser.parse_args()
+    db.DB_PATH = args.db
+    db.BUSY_TIMEOUT_MS = args.busy_timeout
+    db.init_db()
+    try:
+        asyncio.run(serve(args.host, args.port, args.readers))
+    except OSError as e:
+        raise SystemExit(f"Cannot listen on {args.host}:{args.port}: {e.strerror}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,261 +1,93 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QLineEdit, QTextEdit, QTableWidget, QTableWidgetItem, 
-                             QComboBox, QLabel, QDialog, QMessageBox, QHeaderView, QFrame,
-                             QScrollArea)
-from PyQt5.QtCore import Qt, QSize, QDate
-from PyQt5.QtGui import QColor, QFont, QIcon, QPixmap
+                             QLineEdit, QTableView, QAbstractItemView,
+                             QComboBox, QLabel, QMessageBox, QHeaderView, QFrame,
+                             QProgressBar, QUndoStack, QMenu, QShortcut, QCheckBox, QProgressDialog)
+from PyQt5.QtCore import Qt, QTimer, QItemSelectionModel, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QFont, QKeySequence
+import time
 import db
+import diagnostics
+import theme
+from theme import StyledButton
+from repository import TaskRepository
+from reminders import ReminderScheduler
+from dashboard import DashboardPanel
+from writer import BackfillRunner, ArchiveRunner
+from workers import BackupWorker
+from undo import (AddTaskCommand, EditTaskCommand, DeleteTaskCommand, BulkUpdateCommand, BulkDeleteCommand,
+                  UNDO_LIMIT)
+from task_model import (TaskTableModel, TaskActionsDelegate, TaskBadgeDelegate, STATUS_LABELS, DUE_LABELS, SORT_COLUMNS,
+                        COLUMN_ID, COLUMN_TITLE, COLUMN_DESCRIPTION, COLUMN_CATEGORY, COLUMN_STATUS, COLUMN_DUE,
+                        COLUMN_CREATED, COLUMN_UPDATED, COLUMN_ACTIONS, format_time)
 
-CATEGORY_COLORS = {
-    "عام": "#3498db",
-    "عمل": "#e74c3c",
-    "دراسة": "#f39c12",
-    "صحة": "#27ae60",
-    "شخصي": "#9b59b6"
-}
-
-STATUS_COLORS = {
-    "pending": "#e74c3c",
-    "in_progress": "#f39c12",
-    "completed": "#27ae60"
-}
-
-
-class StyledButton(QPushButton):
-    def __init__(self, text, style_type="primary"):
-        super().__init__(text)
-        self.style_type = style_type
-        self.apply_style()
-        
-    def apply_style(self):
-        if self.style_type == "primary":
-            self.setStyleSheet("""
-                QPushButton {
-                    background-color: #3498db;
-                    color: white;
-                    border: none;
-                    padding: 8px 16px;
-                    border-radius: 4px;
-                    font-weight: bold;
-                    font-size: 13px;
-                }
-                QPushButton:hover {
-                    background-color: #2980b9;
-                }
-                QPushButton:pressed {
-                    background-color: #1f618d;
-                }
-            """)
-        elif self.style_type == "success":
-            self.setStyleSheet("""
-                QPushButton {
-                    background-color: #27ae60;
-                    color: white;
-                    border: none;
-                    padding: 8px 16px;
-                    border-radius: 4px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #229954;
-                }
-                QPushButton:pressed {
-                    background-color: #1e8449;
-                }
-            """)
-        elif self.style_type == "danger":
-            self.setStyleSheet("""
-                QPushButton {
-                    background-color: #e74c3c;
-                    color: white;
-                    border: none;
-                    padding: 8px 12px;
-                    border-radius: 4px;
-                    font-weight: bold;
-                    font-size: 12px;
-                }
-                QPushButton:hover {
-                    background-color: #c0392b;
-                }
-                QPushButton:pressed {
-                    background-color: #a93226;
-                }
-            """)
-        elif self.style_type == "secondary":
-            self.setStyleSheet("""
-                QPushButton {
-                    background-color: #34495e;
-                    color: white;
-                    border: none;
-                    padding: 8px 12px;
-                    border-radius: 4px;
-                    font-weight: bold;
-                    font-size: 12px;
-                }
-                QPushButton:hover {
-                    background-color: #2c3e50;
-                }
-                QPushButton:pressed {
-                    background-color: #1a252f;
-                }
-            """)
-
-
-class AddTaskDialog(QDialog):
-    def __init__(self, parent=None, task=None):
-        super().__init__(parent)
-        self.task = task
-        self.init_ui()
-        self.apply_styles()
-        
-    def init_ui(self):
-        self.setWindowTitle("إضافة مهمة جديدة" if not self.task else "تعديل المهمة")
-        self.setGeometry(100, 100, 550, 500)
-        self.setStyleSheet("background-color: #ecf0f1;")
-        
-        layout = QVBoxLayout()
-        layout.setSpacing(15)
-        layout.setContentsMargins(20, 20, 20, 20)
-        
-        title_label = QLabel("العنوان:")
-        title_label.setFont(QFont("Arial", 11, QFont.Bold))
-        layout.addWidget(title_label)
-        self.title_input = QLineEdit()
-        self.title_input.setPlaceholderText("أدخل عنوان المهمة...")
-        self.title_input.setMinimumHeight(35)
-        if self.task:
-            self.title_input.setText(self.task['title'])
-        layout.addWidget(self.title_input)
-        
-        desc_label = QLabel("الوصف:")
-        desc_label.setFont(QFont("Arial", 11, QFont.Bold))
-        layout.addWidget(desc_label)
-        self.desc_input = QTextEdit()
-        self.desc_input.setPlaceholderText("أدخل وصف المهمة...")
-        self.desc_input.setMinimumHeight(120)
-        if self.task:
-            self.desc_input.setText(self.task['description'] or "")
-        layout.addWidget(self.desc_input)
-        
-        category_label = QLabel("التصنيف:")
-        category_label.setFont(QFont("Arial", 11, QFont.Bold))
-        layout.addWidget(category_label)
-        self.category_input = QComboBox()
-        self.category_input.addItems(["عام", "عمل", "دراسة", "صحة", "شخصي"])
-        self.category_input.setMinimumHeight(35)
-        categories = db.get_categories()
-        for cat in categories:
-            if cat not in ["عام", "عمل", "دراسة", "صحة", "شخصي"]:
-                self.category_input.addItem(cat)
-        if self.task:
-            self.category_input.setCurrentText(self.task['category'])
-        layout.addWidget(self.category_input)
-        
-        if self.task:
-            status_label = QLabel("الحالة:")
-            status_label.setFont(QFont("Arial", 11, QFont.Bold))
-            layout.addWidget(status_label)
-            self.status_combo = QComboBox()
-            self.status_combo.addItems(["قيد الانتظار", "قيد الإنجاز", "مكتملة"])
-            self.status_combo.setMinimumHeight(35)
-            status_map = {"pending": "قيد الانتظار", "in_progress": "قيد الإنجاز", "completed": "مكتملة"}
-            self.status_combo.setCurrentText(status_map.get(self.task['status'], "قيد الانتظار"))
-            layout.addWidget(self.status_combo)
-        
-        layout.addStretch()
-        
-        button_layout = QHBoxLayout()
-        button_layout.setSpacing(10)
-        save_btn = StyledButton("حفظ المهمة", "success")
-        cancel_btn = StyledButton("إلغاء", "secondary")
-        save_btn.setMinimumHeight(40)
-        cancel_btn.setMinimumHeight(40)
-        save_btn.clicked.connect(self.accept)
-        cancel_btn.clicked.connect(self.reject)
-        button_layout.addWidget(save_btn)
-        button_layout.addWidget(cancel_btn)
-        layout.addLayout(button_layout)
-        
-        self.setLayout(layout)
-        
-    def apply_styles(self):
-        self.title_input.setStyleSheet("""
-            QLineEdit {
-                border: 2px solid #bdc3c7;
-                border-radius: 4px;
-                padding: 8px;
-                font-size: 12px;
-                background-color: white;
-            }
-            QLineEdit:focus {
-                border: 2px solid #3498db;
-            }
-        """)
-        
-        self.desc_input.setStyleSheet("""
-            QTextEdit {
-                border: 2px solid #bdc3c7;
-                border-radius: 4px;
-                padding: 8px;
-                font-size: 12px;
-                background-color: white;
-            }
-            QTextEdit:focus {
-                border: 2px solid #3498db;
-            }
-        """)
-        
-        self.category_input.setStyleSheet("""
-            QComboBox {
-                border: 2px solid #bdc3c7;
-                border-radius: 4px;
-                padding: 6px;
-                font-size: 12px;
-                background-color: white;
-            }
-            QComboBox:focus {
-                border: 2px solid #3498db;
-            }
-        """)
-        
-        if hasattr(self, 'status_combo'):
-            self.status_combo.setStyleSheet("""
-                QComboBox {
-                    border: 2px solid #bdc3c7;
-                    border-radius: 4px;
-                    padding: 6px;
-                    font-size: 12px;
-                    background-color: white;
-                }
-                QComboBox:focus {
-                    border: 2px solid #3498db;
-                }
-            """)
-        
-    def get_data(self):
-        status_reverse_map = {"قيد الانتظار": "pending", "قيد الإنجاز": "in_progress", "مكتملة": "completed"}
-        return {
-            'title': self.title_input.text(),
-            'description': self.desc_input.toPlainText(),
-            'category': self.category_input.currentText(),
-            'status': status_reverse_map.get(getattr(self, 'status_combo', None) and self.status_combo.currentText(), "pending")
-        }
+SEARCH_DEBOUNCE_MS = 250
+MAINTENANCE_DELAY_MS = 5000
+MAINTENANCE_INTERVAL_MS = 60 * 60 * 1000
+MIGRATION_STAGES = {'schema': "تحديث قاعدة البيانات", 'index': "بناء الفهارس", 'backfill': "تحديث قاعدة البيانات"}
+BACKUP_STAGES = {'copy': "نسخ احتياطي", 'compress': "ضغط النسخة", 'restore': "استعادة"}
 
 
 class TaskManagerApp(QMainWindow):
-    def __init__(self):
+    first_page_loaded = pyqtSignal()
+    
+    def __init__(self, store=None):
         super().__init__()
+        self.repository = TaskRepository(self, store=store)
+        self.store = self.repository.store
         self.init_ui()
         self.apply_styles()
+        # Show the window shell first; everything that reads the database starts from the event loop.
+        QTimer.singleShot(0, self.start)
+        
+    def start(self):
+        if self.store.pending_migrations():
+            # The schema is still being upgraded on the writer thread; the tasks load once it matches.
+            self.centralWidget().setEnabled(False)
+            self.backfills.schema_ready.connect(self.on_schema_ready)
+        else:
+            self.load_data()
+        self.start_migrations()
+        
+    def on_schema_ready(self):
+        self.backfills.schema_ready.disconnect(self.on_schema_ready)
+        self.load_data()
+        
+    def load_data(self):
+        self.centralWidget().setEnabled(True)
+        self.repository.writer.completed.connect(self.dashboard.schedule_refresh)
+        self.repository.writer.external_change.connect(self.on_external_change)
+        self.category_filter.blockSignals(True)
+        self.category_filter.addItems(self.store.get_category_names())
+        self.category_filter.blockSignals(False)
+        self.dashboard.refresh()
+        self.model.loading_changed.connect(self.on_loading_changed)
         self.load_tasks()
+        self.reminders.start()
+        # Housekeeping waits until the first page and any migration batches have had the writer.
+        QTimer.singleShot(MAINTENANCE_DELAY_MS, self.run_maintenance)
+        self.maintenance_timer.start()
+        
+    def on_loading_changed(self, loading):
+        if not loading:
+            self.model.loading_changed.disconnect(self.on_loading_changed)
+            self.first_page_loaded.emit()
         
     def init_ui(self):
         self.setWindowTitle("مدير المهام المتقدم")
         self.setGeometry(100, 100, 1400, 750)
         self.setMinimumSize(1000, 600)
         
+        self.undo_stack = QUndoStack(self)
+        self.undo_stack.setUndoLimit(UNDO_LIMIT)
+        undo_action = self.undo_stack.createUndoAction(self, "تراجع")
+        undo_action.setShortcut(QKeySequence.Undo)
+        redo_action = self.undo_stack.createRedoAction(self, "إعادة")
+        redo_action.setShortcuts([QKeySequence.Redo, QKeySequence("Ctrl+Y")])
+        self.addActions([undo_action, redo_action])
+        
         central_widget = QWidget()
+        central_widget.setObjectName("centralWidget")
         self.setCentralWidget(central_widget)
         
         main_layout = QVBoxLayout()
@@ -263,6 +95,7 @@ class TaskManagerApp(QMainWindow):
         main_layout.setSpacing(15)
         
         header_widget = QFrame()
+        header_widget.setObjectName("headerFrame")
         header_layout = QVBoxLayout()
         header_layout.setContentsMargins(20, 15, 20, 15)
         header_layout.setSpacing(10)
@@ -280,10 +113,10 @@ class TaskManagerApp(QMainWindow):
         header_layout.addWidget(subtitle_label)
         
         header_widget.setLayout(header_layout)
-        header_widget.setStyleSheet("background-color: #ecf0f1; border-radius: 8px; border: 1px solid #bdc3c7;")
         main_layout.addWidget(header_widget)
         
         controls_widget = QFrame()
+        controls_widget.setObjectName("controlsFrame")
         controls_layout = QHBoxLayout()
         controls_layout.setContentsMargins(15, 10, 15, 10)
         controls_layout.setSpacing(15)
@@ -294,10 +127,22 @@ class TaskManagerApp(QMainWindow):
         add_btn.clicked.connect(self.add_task)
         controls_layout.addWidget(add_btn)
         
+        self.undo_btn = StyledButton("↶ تراجع", "secondary")
+        self.undo_btn.setEnabled(False)
+        self.undo_btn.clicked.connect(self.undo_stack.undo)
+        self.undo_stack.canUndoChanged.connect(self.undo_btn.setEnabled)
+        self.undo_stack.undoTextChanged.connect(self.undo_btn.setToolTip)
+        controls_layout.addWidget(self.undo_btn)
+        self.redo_btn = StyledButton("↷ إعادة", "secondary")
+        self.redo_btn.setEnabled(False)
+        self.redo_btn.clicked.connect(self.undo_stack.redo)
+        self.undo_stack.canRedoChanged.connect(self.redo_btn.setEnabled)
+        self.undo_stack.redoTextChanged.connect(self.redo_btn.setToolTip)
+        controls_layout.addWidget(self.redo_btn)
+        
         controls_layout.addWidget(QLabel("التصنيف:"))
         self.category_filter = QComboBox()
         self.category_filter.addItem("الكل")
-        self.category_filter.addItems(["عام", "عمل", "دراسة", "صحة", "شخصي"])
         self.category_filter.setMinimumHeight(35)
         self.category_filter.setMinimumWidth(120)
         self.category_filter.currentTextChanged.connect(self.load_tasks)
@@ -312,191 +157,543 @@ class TaskManagerApp(QMainWindow):
         self.status_filter.currentTextChanged.connect(self.load_tasks)
         controls_layout.addWidget(self.status_filter)
         
+        controls_layout.addWidget(QLabel("الموعد:"))
+        self.due_filter = QComboBox()
+        self.due_filter.addItem("الكل")
+        self.due_filter.addItems(DUE_LABELS.values())
+        self.due_filter.setMinimumHeight(35)
+        self.due_filter.setMinimumWidth(120)
+        self.due_filter.currentTextChanged.connect(self.load_tasks)
+        controls_layout.addWidget(self.due_filter)
+        
         controls_layout.addWidget(QLabel("بحث:"))
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("ابحث عن مهمة...")
         self.search_input.setMinimumHeight(35)
         self.search_input.setMaximumWidth(250)
-        self.search_input.textChanged.connect(self.load_tasks)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.load_tasks)
+        self.search_input.textChanged.connect(self.search_timer.start)
         controls_layout.addWidget(self.search_input)
         
+        self.archive_check = QCheckBox("يشمل الأرشيف")
+        self.archive_check.setToolTip("البحث في المهام المكتملة المؤرشفة أيضاً")
+        self.archive_check.toggled.connect(self.load_tasks)
+        controls_layout.addWidget(self.archive_check)
+        
         controls_layout.addStretch()
         
+        self.backup_btn = StyledButton("النسخ الاحتياطية", "secondary")
+        self.backup_btn.clicked.connect(self.show_backups)
+        self.backup_btn.setVisible(self.store.snapshots and db.DB_PATH != ":memory:")
+        controls_layout.addWidget(self.backup_btn)
+        
         controls_widget.setLayout(controls_layout)
-        controls_widget.setStyleSheet("background-color: #fff; border-radius: 8px; border: 1px solid #ecf0f1;")
         main_layout.addWidget(controls_widget)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["#", "العنوان", "الوصف", "التصنيف", "الحالة", "الإجراءات"])
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.dashboard = DashboardPanel(self.store)
+        main_layout.addWidget(self.dashboard)
+        
+        self.repository.write_failed.connect(
+            lambda message: QMessageBox.warning(self, "خطأ", f"تعذر حفظ التغييرات وتم التراجع عنها:\n{message}"))
+        self.backfills = BackfillRunner(self.repository.writer, self)
+        self.backfills.progress.connect(self.on_migration_progress)
+        self.backfills.finished.connect(self.on_migrations_finished)
+        self.backfills.failed.connect(self.on_migrations_failed)
+        self.migration_progress = None
+        self.archiver = ArchiveRunner(self.repository.writer, self)
+        self.archiver.finished.connect(self.on_archiving_finished)
+        self.archiver.failed.connect(
+            lambda message: self.statusBar().showMessage(f"تعذرت أرشفة المهام المكتملة: {message}", 10000))
+        self.reminders = ReminderScheduler(self.repository, self)
+        self.reminders.reminders_due.connect(self.on_reminders_due)
+        self.model = TaskTableModel(self.repository, self)
+        self.model.query_failed.connect(lambda message: self.statusBar().showMessage(f"تعذر تحميل المهام: {message}", 5000))
+        self.actions_delegate = TaskActionsDelegate(self)
+        self.actions_delegate.edit_requested.connect(self.edit_task)
+        self.actions_delegate.delete_requested.connect(self.delete_task)
+        
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setItemDelegateForColumn(COLUMN_ACTIONS, self.actions_delegate)
+        self.badge_delegate = TaskBadgeDelegate(self)
+        self.table.setItemDelegateForColumn(COLUMN_CATEGORY, self.badge_delegate)
+        self.table.setItemDelegateForColumn(COLUMN_STATUS, self.badge_delegate)
+        self.table.horizontalHeader().setSectionResizeMode(COLUMN_TITLE, QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(COLUMN_DESCRIPTION, QHeaderView.Stretch)
+        self.table.setColumnWidth(COLUMN_ID, 60)
+        self.table.setColumnWidth(COLUMN_DUE, 130)
+        self.table.setColumnWidth(COLUMN_CREATED, 130)
+        self.table.setColumnWidth(COLUMN_UPDATED, 130)
+        self.table.setColumnWidth(COLUMN_ACTIONS, 90)
+        # Sorting happens in SQL (TaskTableModel.set_order), not in the view.
+        self.table.horizontalHeader().setSectionsClickable(True)
+        self.table.horizontalHeader().setSortIndicatorShown(True)
+        self.table.horizontalHeader().sortIndicatorChanged.connect(self.on_sort_changed)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(36)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setAlternatingRowColors(True)
         self.table.setMinimumHeight(400)
+        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_task_menu)
+        self.table.selectionModel().selectionChanged.connect(self.on_selection_changed)
+        QShortcut(QKeySequence.Delete, self.table, self.delete_selected)
+        if diagnostics.enabled():
+            QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.show_diagnostics)
         main_layout.addWidget(self.table)
         
+        pager_layout = QHBoxLayout()
+        pager_layout.setSpacing(10)
+        pager_layout.addStretch()
+        self.first_page_btn = StyledButton("« الأولى", "secondary")
+        self.first_page_btn.clicked.connect(self.model.first_page)
+        pager_layout.addWidget(self.first_page_btn)
+        self.prev_page_btn = StyledButton("‹ السابق", "secondary")
+        self.prev_page_btn.clicked.connect(self.model.previous_page)
+        pager_layout.addWidget(self.prev_page_btn)
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignCenter)
+        self.page_label.setMinimumWidth(80)
+        pager_layout.addWidget(self.page_label)
+        self.next_page_btn = StyledButton("التالي ›", "secondary")
+        self.next_page_btn.clicked.connect(self.model.next_page)
+        pager_layout.addWidget(self.next_page_btn)
+        pager_layout.addStretch()
+        main_layout.addLayout(pager_layout)
+        self.model.page_changed.connect(self.update_pager)
+        self.model.modelReset.connect(self.table.scrollToTop)
+        self.model.task_located.connect(self.on_task_located)
+        self.update_pager(1, False, False)
+        self.show_sort_indicator()
+        
         central_widget.setLayout(main_layout)
-        central_widget.setStyleSheet("background-color: #f8f9fa;")
+        
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.setInterval(MAINTENANCE_INTERVAL_MS)
+        self.maintenance_timer.timeout.connect(self.run_maintenance)
+        # Snapshots run one at a time on their own thread, never on the query or writer threads.
+        self.backup_pool = QThreadPool(self)
+        self.backup_pool.setMaxThreadCount(1)
+        self.backup_worker = None
+        self.backup_barrier = None
+        self.repository.writer.completed.connect(self.on_write_completed)
+        self.backup_dialog = None
+        self.backup_progress = None
         
     def apply_styles(self):
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #f8f9fa;
-            }
-            QTableWidget {
-                border: 1px solid #ecf0f1;
-                border-radius: 6px;
-                background-color: white;
-                alternate-background-color: #f8f9fa;
-                gridline-color: #ecf0f1;
-            }
-            QTableWidget::item {
-                padding: 5px;
-                border: none;
-            }
-            QTableWidget::item:selected {
-                background-color: #3498db;
-                color: white;
-            }
-            QHeaderView::section {
-                background-color: #34495e;
-                color: white;
-                padding: 8px;
-                border: none;
-                font-weight: bold;
-            }
-            QComboBox {
-                border: 2px solid #bdc3c7;
-                border-radius: 4px;
-                padding: 4px;
-                background-color: white;
-            }
-            QComboBox:focus {
-                border: 2px solid #3498db;
-            }
-            QLineEdit {
-                border: 2px solid #bdc3c7;
-                border-radius: 4px;
-                padding: 6px;
-                background-color: white;
-            }
-            QLineEdit:focus {
-                border: 2px solid #3498db;
-            }
-        """)
+        theme.apply_theme()
+        
+    def closeEvent(self, event):
+        self.maintenance_timer.stop()
+        if self.backup_worker is not None:
+            self.backup_worker.cancel()
+        self.backup_pool.waitForDone()
+        self.reminders.stop()
+        self.archiver.stop()
+        self.backfills.stop()
+        self.remove_migration_progress()
+        self.repository.close()
+        super().closeEvent(event)
+        
+    def on_external_change(self):
+        # Another process committed: re-read what is on screen without resetting the view.
+        self.repository.invalidate()
+        self.store.invalidate_categories()
+        known = {self.category_filter.itemText(i) for i in range(self.category_filter.count())}
+        self.category_filter.addItems([name for name in self.store.get_category_names() if name not in known])
+        self.model.sync()
+        self.reminders.reload()
+        self.dashboard.schedule_refresh()
+        
+    def on_reminders_due(self, tasks):
+        if len(tasks) == 1:
+            message = f"حان موعد «{tasks[0].title}»"
+        else:
+            message = f"حان موعد {len(tasks)} مهام: " + "، ".join(f"«{task.title}»" for task in tasks[:3])
+        self.statusBar().showMessage(message, 30000)
+        QApplication.alert(self)
+        # Tasks just moved from due soon to overdue.
+        if self.due_filter.currentIndex() > 0:
+            self.model.sync()
+        
+    def start_migrations(self):
+        if not (self.store.pending_migrations() or self.store.pending_indexes() or self.store.pending_backfills()):
+            return
+        if self.migration_progress is None:
+            self.migration_progress = QProgressBar()
+            self.migration_progress.setMaximumWidth(250)
+            self.migration_progress.setFormat("تحديث قاعدة البيانات %p%")
+            self.statusBar().addPermanentWidget(self.migration_progress)
+        self.backfills.start()
+        
+    def on_migration_progress(self, stage, position, target):
+        self.migration_progress.setFormat(f"{MIGRATION_STAGES[stage]} %p%")
+        self.migration_progress.setMaximum(target)
+        self.migration_progress.setValue(position)
+        
+    def remove_migration_progress(self):
+        if self.migration_progress is not None:
+            self.statusBar().removeWidget(self.migration_progress)
+            self.migration_progress = None
+        
+    def on_migrations_finished(self):
+        self.remove_migration_progress()
+        self.statusBar().showMessage("اكتمل تحديث قاعدة البيانات", 5000)
+        self.model.refresh()
+        
+    def on_migrations_failed(self, message):
+        self.remove_migration_progress()
+        self.statusBar().showMessage(f"تعذر تحديث قاعدة البيانات، ستتم المحاولة عند التشغيل التالي: {message}", 10000)
+        
+    def update_pager(self, page, has_previous, has_next):
+        self.page_label.setText(f"صفحة {page}")
+        self.first_page_btn.setEnabled(has_previous)
+        self.prev_page_btn.setEnabled(has_previous)
+        self.next_page_btn.setEnabled(has_next)
+        
+    def show_sort_indicator(self):
+        # Mirrors the model's order; the default one depends on the filters.
+        order = self.model.order()
+        if order is not None:
+            key, _, direction = order.rpartition('_')
+            column = next(column for column, sort in SORT_COLUMNS.items() if sort == key)
+            indicator = column, Qt.DescendingOrder if direction == 'desc' else Qt.AscendingOrder
+        elif self.search_input.text().strip():
+            indicator = -1, Qt.DescendingOrder
+        elif self.due_filter.currentIndex() > 0:
+            indicator = COLUMN_DUE, Qt.AscendingOrder
+        else:
+            indicator = COLUMN_CREATED, Qt.DescendingOrder
+        header = self.table.horizontalHeader()
+        header.blockSignals(True)
+        header.setSortIndicator(*indicator)
+        header.blockSignals(False)
+        
+    def on_sort_changed(self, column, order):
+        key = SORT_COLUMNS.get(column)
+        if key is None:
+            self.show_sort_indicator()
+            return
+        # The selected task stays in view: the model opens the page it is on in the new order.
+        current = self.table.selectionModel().currentIndex()
+        anchor = None
+        if current.isValid() and self.table.selectionModel().isRowSelected(current.row(), current.parent()):
+            anchor = self.model.task_at(current.row()).id
+        self.model.set_order(f"{key}_{'asc' if order == Qt.AscendingOrder else 'desc'}", anchor)
+        
+    def on_task_located(self, row):
+        index = self.model.index(row, COLUMN_TITLE)
+        self.table.selectionModel().setCurrentIndex(index, QItemSelectionModel.ClearAndSelect | QItemSelectionModel.Rows)
+        self.table.scrollTo(index, QAbstractItemView.PositionAtCenter)
         
     def load_tasks(self):
-        self.table.setRowCount(0)
-        
+        started = time.perf_counter()
+        self.search_timer.stop()
         category_filter = self.category_filter.currentText()
         status_filter = self.status_filter.currentText()
-        search_text = self.search_input.text().lower()
+        search_text = self.search_input.text().strip()
         
         status_map_reverse = {"قيد الانتظار": "pending", "قيد الإنجاز": "in_progress", "مكتملة": "completed"}
-        status_filter_db = status_map_reverse.get(status_filter, None)
-        
-        if category_filter == "الكل" and (status_filter == "الكل" or not status_filter):
-            tasks = db.get_all_tasks()
-        elif category_filter != "الكل" and (status_filter == "الكل" or not status_filter):
-            tasks = db.get_tasks_by_category(category_filter)
-        elif category_filter == "الكل" and status_filter != "الكل":
-            tasks = db.get_tasks_by_status(status_filter_db)
-        else:
-            all_tasks = db.get_all_tasks()
-            tasks = [t for t in all_tasks if t['category'] == category_filter and t['status'] == status_filter_db]
-        
-        if search_text:
-            tasks = [t for t in tasks if search_text in t['title'].lower() or search_text in (t['description'] or "").lower()]
-        
-        status_map = {"pending": "قيد الانتظار", "in_progress": "قيد الإنجاز", "completed": "مكتملة"}
-        
-        for i, task in enumerate(tasks):
-            self.table.insertRow(i)
-            
-            id_item = QTableWidgetItem(str(task['id']))
-            id_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(i, 0, id_item)
-            
-            self.table.setItem(i, 1, QTableWidgetItem(task['title']))
-            
-            desc = task['description'] or ""
-            if len(desc) > 60:
-                desc = desc[:57] + "..."
-            self.table.setItem(i, 2, QTableWidgetItem(desc))
-            
-            category_item = QTableWidgetItem(task['category'])
-            category_color = CATEGORY_COLORS.get(task['category'], "#95a5a6")
-            category_item.setBackground(QColor(category_color))
-            category_item.setForeground(QColor("white"))
-            category_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(i, 3, category_item)
-            
-            status_text = status_map.get(task['status'], "قيد الانتظار")
-            status_item = QTableWidgetItem(status_text)
-            status_color = STATUS_COLORS.get(task['status'], "#95a5a6")
-            status_item.setBackground(QColor(status_color))
-            status_item.setForeground(QColor("white"))
-            status_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(i, 4, status_item)
-            
-            actions_layout = QHBoxLayout()
-            actions_layout.setContentsMargins(2, 2, 2, 2)
-            actions_layout.setSpacing(5)
-            actions_widget = QWidget()
-            
-            edit_btn = StyledButton("✎", "primary")
-            edit_btn.setMaximumWidth(35)
-            delete_btn = StyledButton("✕", "danger")
-            delete_btn.setMaximumWidth(35)
-            
-            edit_btn.clicked.connect(lambda checked, tid=task['id']: self.edit_task(tid))
-            delete_btn.clicked.connect(lambda checked, tid=task['id']: self.delete_task(tid))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            actions_layout.addStretch()
-            actions_widget.setLayout(actions_layout)
-            
-            self.table.setCellWidget(i, 5, actions_widget)
-            
-            if task['status'] == 'completed':
-                for j in range(6):
-                    item = self.table.item(i, j)
-                    if item:
-                        font = item.font()
-                        font.setStrikeOut(True)
-                        item.setFont(font)
-        
-        self.table.resizeRowsToContents()
+        due_map_reverse = {label: due for due, label in DUE_LABELS.items()}
+        
+        self.model.set_filters(
+            category=category_filter if category_filter != "الكل" else None,
+            status=status_map_reverse.get(status_filter, None),
+            text=search_text or None,
+            include_archive=self.archive_check.isChecked(),
+            due=due_map_reverse.get(self.due_filter.currentText())
+        )
+        self.show_sort_indicator()
+        diagnostics.record("load.request", (time.perf_counter() - started) * 1000)
         
     def add_task(self):
-        dialog = AddTaskDialog(self)
+        from task_dialog import AddTaskDialog
+        dialog = AddTaskDialog(self.store.get_category_names(), self)
         if dialog.exec_():
             data = dialog.get_data()
             if data['title'].strip():
-                db.add_task(data['title'], data['description'], data['category'])
-                self.load_tasks()
+                self.undo_stack.push(AddTaskCommand(self.repository, data['title'], data['description'], data['category'],
+                                                    data['due_at']))
             else:
                 QMessageBox.warning(self, "تنبيه", "يجب إدخال عنوان المهمة")
     
     def edit_task(self, task_id):
-        tasks = db.get_all_tasks()
-        task = next((t for t in tasks if t['id'] == task_id), None)
+        if self.model.is_archived(task_id):
+            self.offer_unarchive(task_id)
+            return
+        task = self.repository.get_task(task_id)
         
         if task:
-            dialog = AddTaskDialog(self, task)
+            from task_dialog import AddTaskDialog
+            dialog = AddTaskDialog(self.store.get_category_names(), self, task)
             if dialog.exec_():
                 data = dialog.get_data()
                 if data['title'].strip():
-                    db.update_task(task_id, data['title'], data['description'], data['category'], data['status'])
-                    self.load_tasks()
+                    edited = task._replace(title=data['title'], description=data['description'],
+                                           category=data['category'], status=data['status'], due_at=data['due_at'])
+                    if edited != task:
+                        self.undo_stack.push(EditTaskCommand(self.repository, task, edited))
                 else:
                     QMessageBox.warning(self, "تنبيه", "يجب إدخال عنوان المهمة")
     
     def delete_task(self, task_id):
-        reply = QMessageBox.question(self, "تأكيد", "هل تريد حذف هذه المهمة بشكل نهائي؟", 
+        if self.model.is_archived(task_id):
+            self.offer_unarchive(task_id)
+            return
+        reply = QMessageBox.question(self, "تأكيد", "هل تريد حذف هذه المهمة؟ يمكنك التراجع عن الحذف بـ Ctrl+Z", 
+                                     QMessageBox.Yes | QMessageBox.No)
+        task = self.repository.get_task(task_id)
+        if reply == QMessageBox.Yes and task:
+            self.undo_stack.push(DeleteTaskCommand(self.repository, task))
+    
+    def show_task_menu(self, pos):
+        index = self.table.indexAt(pos)
+        if not index.isValid():
+            return
+        selected = self.selected_tasks()
+        if len(selected) > 1 and self.table.selectionModel().isRowSelected(index.row(), index.parent()):
+            self.show_selection_menu(selected, pos)
+            return
+        task = self.model.task_at(index.row())
+        menu = QMenu(self)
+        if self.model.is_archived(task.id):
+            menu.addAction("استعادة من الأرشيف", lambda: self.repository.unarchive_tasks([task]))
+            menu.addAction("سجل التغييرات", lambda: self.show_history(task.id))
+            menu.exec_(self.table.viewport().mapToGlobal(pos))
+            return
+        menu.addAction("تعديل", lambda: self.edit_task(task.id))
+        menu.addAction("سجل التغييرات", lambda: self.show_history(task.id))
+        menu.addSeparator()
+        menu.addAction("حذف", lambda: self.delete_task(task.id))
+        menu.exec_(self.table.viewport().mapToGlobal(pos))
+    
+    def show_selection_menu(self, tasks, pos):
+        menu = QMenu(self)
+        archived = [task for task in tasks if self.model.is_archived(task.id)]
+        if archived:
+            menu.addAction(f"استعادة {len(archived)} مهمة من الأرشيف", lambda: self.repository.unarchive_tasks(archived))
+            tasks = [task for task in tasks if not self.model.is_archived(task.id)]
+            if not tasks:
+                menu.exec_(self.table.viewport().mapToGlobal(pos))
+                return
+            menu.addSeparator()
+        status_menu = menu.addMenu("تعيين الحالة")
+        for status, label in STATUS_LABELS.items():
+            status_menu.addAction(label, lambda status=status: self.update_selected(tasks, status=status))
+        category_menu = menu.addMenu("نقل إلى التصنيف")
+        for category in self.store.get_category_names():
+            category_menu.addAction(category, lambda category=category: self.update_selected(tasks, category=category))
+        menu.addSeparator()
+        menu.addAction(f"حذف {len(tasks)} مهمة", self.delete_selected)
+        menu.exec_(self.table.viewport().mapToGlobal(pos))
+    
+    def selected_tasks(self):
+        return [self.model.task_at(index.row()) for index in self.table.selectionModel().selectedRows()]
+    
+    def selected_live_tasks(self):
+        return [task for task in self.selected_tasks() if not self.model.is_archived(task.id)]
+    
+    def on_selection_changed(self):
+        count = len(self.table.selectionModel().selectedRows())
+        if count > 1:
+            self.statusBar().showMessage(f"{count} مهمة محددة")
+        else:
+            self.statusBar().clearMessage()
+    
+    def update_selected(self, tasks, category="", status=""):
+        # One UPDATE for the whole selection, one view update, one undo step.
+        self.undo_stack.push(BulkUpdateCommand(self.repository, tasks, category, status))
+    
+    def delete_selected(self):
+        tasks = self.selected_live_tasks()
+        if len(tasks) == 1:
+            self.delete_task(tasks[0].id)
+            return
+        if not tasks:
+            return
+        reply = QMessageBox.question(self, "تأكيد", f"هل تريد حذف {len(tasks)} مهمة؟ يمكنك التراجع عن الحذف بـ Ctrl+Z",
                                      QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            db.delete_task(task_id)
-            self.load_tasks()
+            self.undo_stack.push(BulkDeleteCommand(self.repository, tasks))
+    
+    def show_history(self, task_id):
+        task = self.repository.get_task(task_id)
+        if task:
+            from history_dialog import HistoryDialog
+            HistoryDialog(task, self.store, self).exec_()
+    
+    def show_diagnostics(self):
+        # Hidden panel, only there when the app was started with --diagnostics.
+        if getattr(self, 'diagnostics_dialog', None) is None:
+            from diagnostics_dialog import DiagnosticsDialog
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+    
+    def offer_unarchive(self, task_id):
+        reply = QMessageBox.question(self, "مهمة مؤرشفة", "هذه المهمة في الأرشيف. هل تريد استعادتها لتعديلها؟",
+                                     QMessageBox.Yes | QMessageBox.No)
+        task = self.repository.get_task(task_id)
+        if reply == QMessageBox.Yes and task:
+            self.repository.unarchive_tasks([task])
+    
+    def run_maintenance(self):
+        # Both run between user writes on the writer thread, one bounded batch at a time.
+        self.repository.writer.submit(self.store.compact_history)
+        self.archiver.start()
+        if not self.store.snapshots:
+            return
+        import backup
+        if self.backup_worker is None and backup.snapshot_due():
+            self.start_backup()
+    
+    def on_archiving_finished(self, archived):
+        if not archived:
+            return
+        self.statusBar().showMessage(f"تمت أرشفة {archived} مهمة مكتملة", 5000)
+        self.model.sync()
+        self.dashboard.schedule_refresh()
+    
+    def show_backups(self):
+        if self.backup_dialog is None:
+            from backup_dialog import BackupDialog
+            self.backup_dialog = BackupDialog(self)
+            self.backup_dialog.backup_requested.connect(self.start_backup)
+            self.backup_dialog.restore_requested.connect(self.restore_backup)
+        self.backup_dialog.refresh()
+        self.backup_dialog.set_busy(self.backup_worker is not None)
+        self.backup_dialog.show()
+        self.backup_dialog.raise_()
+    
+    def start_backup(self, compress=None):
+        # The copy reads one snapshot of the database while the app keeps reading and writing.
+        if self.backup_worker is not None:
+            return
+        import backup
+        self.backup_progress = QProgressBar()
+        self.backup_progress.setMaximumWidth(250)
+        self.statusBar().addPermanentWidget(self.backup_progress)
+        worker = BackupWorker(backup.create_snapshot, compress=compress)
+        worker.signals.progress.connect(self.on_backup_progress)
+        worker.signals.finished.connect(self.on_backup_finished)
+        worker.signals.cancelled.connect(self.on_backup_done)
+        worker.signals.failed.connect(self.on_backup_failed)
+        self.run_backup_worker(worker)
+    
+    def run_backup_worker(self, worker, after_writes=False):
+        self.backup_worker = worker
+        if self.backup_dialog is not None:
+            self.backup_dialog.set_busy(True)
+        if after_writes:
+            # The worker starts once the writer reaches this no-op, i.e. after everything queued
+            # before it is saved, without the window waiting for it.
+            self.backup_barrier = self.repository.writer.submit(lambda: None)
+        else:
+            self.backup_pool.start(worker)
+    
+    def on_write_completed(self, token, _):
+        if token == self.backup_barrier:
+            self.backup_barrier = None
+            self.backup_pool.start(self.backup_worker)
+    
+    def on_backup_progress(self, stage, done, total):
+        self.backup_progress.setFormat(f"{BACKUP_STAGES[stage]} %p%")
+        self.backup_progress.setMaximum(total)
+        self.backup_progress.setValue(done)
+    
+    def on_backup_done(self):
+        self.backup_worker = None
+        if self.backup_progress is not None:
+            self.statusBar().removeWidget(self.backup_progress)
+            self.backup_progress = None
+        if self.backup_dialog is not None:
+            self.backup_dialog.refresh()
+            self.backup_dialog.set_busy(False)
+    
+    def on_backup_finished(self, snapshot):
+        from backup import format_size
+        self.on_backup_done()
+        self.statusBar().showMessage(f"تم حفظ نسخة احتياطية ({format_size(snapshot.size)})", 5000)
+    
+    def on_backup_failed(self, message):
+        self.on_backup_done()
+        self.statusBar().showMessage(f"تعذر إنشاء النسخة الاحتياطية: {message}", 10000)
+    
+    def restore_backup(self, snapshot):
+        if self.backup_worker is not None:
+            return
+        reply = QMessageBox.question(self, "استعادة نسخة احتياطية",
+                                     f"ستحل النسخة المحفوظة في {format_time(snapshot.created_at)} محل كل المهام الحالية. "
+                                     "ستُحفظ الحالة الحالية كنسخة جديدة قبل الاستعادة. هل تريد المتابعة؟",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        # Nothing of ours may write while the files are replaced: queued edits are saved first,
+        # and archiving and migrations stop between batches.
+        self.archiver.stop()
+        self.backfills.stop()
+        self.remove_migration_progress()
+        self.restore_dialog = QProgressDialog("جارٍ حفظ الحالة الحالية...", "إلغاء", 0, 0, self)
+        self.restore_dialog.setWindowTitle("استعادة نسخة احتياطية")
+        self.restore_dialog.setWindowModality(Qt.WindowModal)
+        self.restore_dialog.setMinimumDuration(0)
+        self.restore_dialog.setAutoClose(False)
+        self.restore_dialog.setAutoReset(False)
+        import backup
+        worker = BackupWorker(backup.restore_snapshot, snapshot)
+        self.restore_dialog.canceled.connect(worker.cancel)
+        worker.signals.progress.connect(self.on_restore_progress)
+        worker.signals.finished.connect(self.on_restore_finished)
+        worker.signals.cancelled.connect(self.on_restore_cancelled)
+        worker.signals.failed.connect(self.on_restore_failed)
+        self.run_backup_worker(worker, after_writes=True)
+        self.restore_dialog.show()
+    
+    def on_restore_progress(self, stage, done, total):
+        if stage == 'restore':
+            self.restore_dialog.setLabelText("جارٍ استعادة النسخة...")
+        self.restore_dialog.setMaximum(total)
+        self.restore_dialog.setValue(done)
+    
+    def close_restore_dialog(self):
+        self.on_backup_done()
+        self.restore_dialog.close()
+        self.restore_dialog.deleteLater()
+        self.restore_dialog = None
+        # Resumes the migrations stopped for the restore, or runs those of an older snapshot.
+        self.start_migrations()
+    
+    def on_restore_finished(self, aside):
+        self.close_restore_dialog()
+        # Undo entries and cached tasks describe the replaced data.
+        self.undo_stack.clear()
+        self.repository.invalidate()
+        self.store.invalidate_categories()
+        category = self.category_filter.currentText()
+        self.category_filter.blockSignals(True)
+        self.category_filter.clear()
+        self.category_filter.addItem("الكل")
+        self.category_filter.addItems(self.store.get_category_names())
+        self.category_filter.setCurrentIndex(max(0, self.category_filter.findText(category)))
+        self.category_filter.blockSignals(False)
+        self.load_tasks()
+        self.reminders.reload()
+        self.dashboard.schedule_refresh()
+        self.statusBar().showMessage("تمت استعادة النسخة الاحتياطية", 5000)
+        if aside:
+            # The snapshot predates the archive, so the archived tasks are only in the set-aside copy.
+            QMessageBox.information(self, "استعادة نسخة احتياطية",
+                                    f"لا تحتوي النسخة على أرشيف، وحُفظ الأرشيف السابق في:\n{aside}")
+    
+    def on_restore_cancelled(self):
+        self.close_restore_dialog()
+        self.statusBar().showMessage("أُلغيت الاستعادة ولم تتغير المهام", 5000)
+    
+    def on_restore_failed(self, message):
+        self.close_restore_dialog()
+        QMessageBox.warning(self, "خطأ", f"تعذرت استعادة النسخة الاحتياطية، ولم تتغير المهام:\n{message}")
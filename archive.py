@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import time
+import db
+
+
+def file_size_mb(path):
+    total = 0
+    for suffix in ("", "-wal"):
+        if os.path.exists(path + suffix):
+            total += os.path.getsize(path + suffix)
+    return total / (1024 * 1024)
+
+
+def archive(args):
+    start = time.perf_counter()
+
+    def progress(count):
+        sys.stderr.write(f"\rArchived: {count} tasks")
+        sys.stderr.flush()
+
+    count = db.archive_tasks(args.older_than, args.batch_size, progress)
+    sys.stderr.write(f"\rArchived: {count} tasks in {time.perf_counter() - start:.1f} s\n")
+    while db.vacuum_step():
+        pass
+    report()
+
+
+def restore(args):
+    count = db.unarchive_tasks(args.ids)
+    print(f"Restored {count} of {len(args.ids)} tasks")
+
+
+def vacuum(args):
+    before = file_size_mb(db.DB_PATH)
+    start = time.perf_counter()
+    db.vacuum()
+    print(f"VACUUM took {time.perf_counter() - start:.1f} s, {before:.1f} MB -> {file_size_mb(db.DB_PATH):.1f} MB")
+
+
+def report(args=None):
+    tasks = db.get_connection().execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+    print(f"{db.DB_PATH}: {tasks} tasks, {file_size_mb(db.DB_PATH):.1f} MB")
+    print(f"{db.archive_path()}: {db.count_archived()} tasks, {file_size_mb(db.archive_path()):.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old completed tasks to the archive database and back")
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--archive", help="archive file (default: <db>_archive.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = subparsers.add_parser("run", help="archive tasks completed more than --older-than days ago")
+    archive_parser.add_argument("--older-than", type=int, default=db.ARCHIVE_AFTER_DAYS, metavar="DAYS")
+    archive_parser.add_argument("--batch-size", type=int, default=db.ARCHIVE_BATCH_SIZE)
+    archive_parser.set_defaults(handler=archive)
+
+    restore_parser = subparsers.add_parser("restore", help="move archived tasks back by id")
+    restore_parser.add_argument("ids", type=int, nargs="+")
+    restore_parser.set_defaults(handler=restore)
+
+    vacuum_parser = subparsers.add_parser(
+        "vacuum", help="rebuild the main database once, enabling incremental vacuum on older files")
+    vacuum_parser.set_defaults(handler=vacuum)
+
+    status_parser = subparsers.add_parser("status", help="show task counts and file sizes")
+    status_parser.set_defaults(handler=report)
+
+    args = parser.parse_args()
+    db.DB_PATH = args.db
+    db.ARCHIVE_PATH = args.archive
+    db.init_db()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+import argparse
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+import db
+
+# Snapshots go to BACKUP_DIR (by default tasks_backups next to DB_PATH). One is taken when the
+# newest is INTERVAL_HOURS old, and only the newest KEEP are kept.
+BACKUP_DIR = None
+INTERVAL_HOURS = 24
+KEEP = 7
+COMPRESS = True
+COMPRESS_LEVEL = 1
+# Pages copied per backup step (4 MB at the default page size) and the pause after each step.
+STEP_PAGES = 1024
+STEP_PAUSE = 0.005
+CHUNK_BYTES = 1024 * 1024
+
+STAMP_FORMAT = "%Y%m%d-%H%M%S"
+SCHEMAS = ['main', 'archive']
+PARTIAL = ".partial"
+
+Snapshot = namedtuple('Snapshot', 'stamp created_at files size compressed archived')
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+def backup_dir():
+    if BACKUP_DIR:
+        return BACKUP_DIR
+    if db.DB_PATH == ":memory:":
+        raise ValueError("An in-memory database has no backups")
+    root, _ = os.path.splitext(os.path.abspath(db.DB_PATH))
+    return f"{root}_backups"
+
+
+def _stem():
+    return os.path.splitext(os.path.basename(db.DB_PATH))[0]
+
+
+def _file_name(stamp, schema, compressed):
+    suffix = "_archive" if schema == 'archive' else ""
+    return f"{_stem()}-{stamp}{suffix}.db" + (".gz" if compressed else "")
+
+
+def list_snapshots():
+    # Newest first. A snapshot is the main file plus the archive file of the same stamp, when it has one;
+    # `archived` records which, so a restore knows whether the live archive belongs with it.
+    directory = backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(re.escape(_stem()) + r"-(\d{8}-\d{6})(_archive)?\.db(\.gz)?")
+    files = {}
+    for name in os.listdir(directory):
+        match = pattern.fullmatch(name)
+        if match:
+            files.setdefault(match.group(1), {})['archive' if match.group(2) else 'main'] = os.path.join(directory, name)
+    snapshots = []
+    for stamp, paths in files.items():
+        if 'main' not in paths:
+            continue
+        created_at = datetime.strptime(stamp, STAMP_FORMAT).strftime("%Y-%m-%d %H:%M:%S")
+        snapshots.append(Snapshot(stamp, created_at, paths, sum(os.path.getsize(path) for path in paths.values()),
+                                  paths['main'].endswith(".gz"), 'archive' in paths))
+    return sorted(snapshots, reverse=True)
+
+
+def find_snapshot(stamp):
+    for snapshot in list_snapshots():
+        if snapshot.stamp == stamp:
+            return snapshot
+    raise ValueError(f"No snapshot {stamp} in {backup_dir()}")
+
+
+def snapshot_due(interval_hours=None):
+    interval_hours = INTERVAL_HOURS if interval_hours is None else interval_hours
+    if interval_hours <= 0 or db.DB_PATH == ":memory:":
+        return False
+    snapshots = list_snapshots()
+    if not snapshots:
+        return True
+    taken = datetime.strptime(snapshots[0].stamp, STAMP_FORMAT)
+    return datetime.utcnow() - taken >= timedelta(hours=interval_hours)
+
+
+def prune_snapshots(keep=None):
+    keep = KEEP if keep is None else keep
+    removed = 0
+    for snapshot in list_snapshots()[keep:]:
+        for path in snapshot.files.values():
+            os.remove(path)
+        removed += 1
+    return removed
+
+
+def _remove_partials(directory):
+    # Left behind by a backup that was cancelled or crashed.
+    for name in os.listdir(directory):
+        if name.startswith(_stem() + "-") and name.endswith(PARTIAL):
+            os.remove(os.path.join(directory, name))
+
+
+def _free_stamp(directory):
+    # Stamps have a one second resolution; a second snapshot within the same second waits for the next.
+    while True:
+        stamp = datetime.utcnow().strftime(STAMP_FORMAT)
+        if not any(os.path.exists(os.path.join(directory, _file_name(stamp, 'main', compressed)))
+                   for compressed in (False, True)):
+            return stamp
+        time.sleep(0.1)
+
+
+def _step(progress, cancelled, pause, stage, offset, total):
+    def step(status, remaining, pages):
+        # After the last step the copy has committed, so there is nothing left to cancel or wait for.
+        if remaining and cancelled and cancelled():
+            raise BackupCancelled()
+        if progress:
+            progress(stage, offset + pages - remaining, total)
+        if remaining:
+            # Lets the GUI thread and the writers run between steps.
+            time.sleep(pause)
+    return step
+
+
+def _copy_pages(targets, pages, pause, progress, cancelled):
+    # Every step reads from the snapshot of one read transaction. Writers carry on meanwhile (WAL),
+    # and the copy never restarts; without the transaction each commit elsewhere would restart it.
+    conn = db.get_connection()
+    conn.execute("BEGIN")
+    try:
+        counts = {schema: conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0] for schema in targets}
+        total = sum(counts.values())
+        done = 0
+        for schema, path in targets.items():
+            target = sqlite3.connect(path)
+            try:
+                conn.backup(target, pages=pages, name=schema,
+                            progress=_step(progress, cancelled, pause, 'copy', done, total))
+                # A plain rollback journal file, so the snapshot opens anywhere without -wal/-shm files.
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+            done += counts[schema]
+    finally:
+        conn.execute("ROLLBACK")
+
+
+def _compress(paths, pause, progress, cancelled):
+    total = sum(os.path.getsize(source) for source, _ in paths)
+    done = 0
+    for source, target in paths:
+        with open(source, 'rb') as f, gzip.open(target, 'wb', compresslevel=COMPRESS_LEVEL) as out:
+            while True:
+                chunk = f.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                out.write(chunk)
+                done += len(chunk)
+                if cancelled and cancelled():
+                    raise BackupCancelled()
+                if progress:
+                    progress('compress', done, total)
+                time.sleep(pause)
+        os.remove(source)
+
+
+def create_snapshot(compress=None, pages=None, pause=None, progress=None, cancelled=None, keep=None):
+    # Copies the main and archive databases with the SQLite backup API, `pages` pages per step,
+    # then gzips them. Files are written as .partial and renamed once complete.
+    compress = COMPRESS if compress is None else compress
+    pages = STEP_PAGES if pages is None else pages
+    pause = STEP_PAUSE if pause is None else pause
+    directory = backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    _remove_partials(directory)
+    stamp = _free_stamp(directory)
+    copies = {schema: os.path.join(directory, _file_name(stamp, schema, False) + PARTIAL) for schema in SCHEMAS}
+    finals = {schema: os.path.join(directory, _file_name(stamp, schema, compress)) for schema in SCHEMAS}
+    try:
+        _copy_pages(copies, pages, pause, progress, cancelled)
+        if compress:
+            _compress([(copies[schema], finals[schema] + PARTIAL) for schema in SCHEMAS], pause, progress, cancelled)
+            copies = {schema: finals[schema] + PARTIAL for schema in SCHEMAS}
+        # The archive file goes first: a main file on its own is a complete snapshot.
+        for schema in reversed(SCHEMAS):
+            os.replace(copies[schema], finals[schema])
+    except BaseException:
+        _remove_partials(directory)
+        raise
+    if keep != 0:
+        prune_snapshots(keep)
+    return find_snapshot(stamp)
+
+
+def _open_snapshot_file(path, directory):
+    if not path.endswith(".gz"):
+        return sqlite3.connect(path)
+    copy = os.path.join(directory, os.path.basename(path)[:-3])
+    with gzip.open(path, 'rb') as f, open(copy, 'wb') as out:
+        shutil.copyfileobj(f, out, CHUNK_BYTES)
+    return sqlite3.connect(copy)
+
+
+def _set_aside_archive(pages, pause, cancelled):
+    path = os.path.join(backup_dir(), f"{_stem()}-{datetime.utcnow().strftime(STAMP_FORMAT)}-replaced_archive.db")
+    target = sqlite3.connect(path)
+    try:
+        db.get_connection().backup(target, pages=pages, name='archive',
+                                   progress=_step(None, cancelled, pause, 'restore', 0, 0))
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+    return path
+
+
+def _restore_file(source, path, pages, progress):
+    target = sqlite3.connect(path, timeout=db.BUSY_TIMEOUT_MS / 1000)
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    finally:
+        target.close()
+
+
+def restore_snapshot(snapshot, pages=None, pause=None, progress=None, cancelled=None, save_current=True):
+    # Copies a snapshot back over the live files with the backup API. Each file is copied in one
+    # write transaction that commits with its last step. The archive is copied in full while the
+    # main file still has its last step to go, so cancelling or failing at any step rolls both
+    # back, and the two commits follow each other directly. Until then other connections, in this
+    # process or others, see the old tasks in both files. SQLite does not commit two WAL files as
+    # one, so a read in the main file's last step can still see the restored archive next to the
+    # old main file. Returns where the live archive was set aside when the snapshot has none,
+    # otherwise None.
+    pages = STEP_PAGES if pages is None else pages
+    pause = STEP_PAUSE if pause is None else pause
+    with tempfile.TemporaryDirectory(dir=backup_dir()) as directory:
+        sources = {schema: _open_snapshot_file(snapshot.files[schema], directory)
+                   for schema in SCHEMAS if schema in snapshot.files}
+        try:
+            version = sources['main'].execute('PRAGMA user_version').fetchone()[0]
+            if version > db.SCHEMA_VERSION:
+                raise ValueError(f"Snapshot {snapshot.stamp} has schema version {version}, "
+                                 f"newer than this application ({db.SCHEMA_VERSION})")
+            # The state being replaced is saved first, so a restore can itself be undone.
+            if save_current:
+                create_snapshot(pages=pages, pause=pause, progress=progress, cancelled=cancelled, keep=0)
+            counter = db.change_counter()
+            aside = None
+            if not snapshot.archived:
+                # Archived tasks newer than the snapshot would sit next to a main file that predates them.
+                # The live archive is set aside and replaced by an empty one.
+                aside = _set_aside_archive(pages, pause, cancelled)
+                sources['archive'] = sqlite3.connect(':memory:')
+            counts = {schema: source.execute('PRAGMA page_count').fetchone()[0] for schema, source in sources.items()}
+            total = sum(counts.values())
+            # At least two steps for the main file, so there is a last one to come after the archive.
+            main_pages = pages if 0 < pages < counts['main'] else max(1, counts['main'] - 1)
+            main_step = _step(progress, cancelled, pause, 'restore', 0, total)
+            archive_step = _step(progress, cancelled, pause, 'restore', counts['main'], total)
+            archived = []
+
+            def step(status, remaining, page_count):
+                if not remaining or archived:
+                    return
+                main_step(status, remaining, page_count)
+                if remaining <= main_pages:
+                    _restore_file(sources['archive'], db.archive_path(), pages, archive_step)
+                    archived.append(True)
+
+            _restore_file(sources['main'], db.DB_PATH, main_pages, step)
+            if not archived:
+                # A one-page main file is copied in a single step, leaving no step to restore the archive in.
+                _restore_file(sources['archive'], db.archive_path(), pages, archive_step)
+        finally:
+            for source in sources.values():
+                source.close()
+    db.invalidate_categories()
+    # An older snapshot is migrated like any older database. The change counter continues from
+    # where the replaced data left it, so no ETag handed out before the restore is reused.
+    db.init_db()
+    with db.transaction() as conn:
+        conn.execute('UPDATE change_counter SET value = MAX(value, ?) + 1 WHERE id = 0', (counter,))
+    return aside
+
+
+def _print_progress(stage, done, total):
+    sys.stderr.write(f"\r{stage}: {done * 100 // max(total, 1)}%")
+    sys.stderr.flush()
+
+
+def format_size(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def create(args):
+    start = time.perf_counter()
+    snapshot = create_snapshot(compress=not args.no_compress, pages=args.pages, pause=args.pause,
+                               progress=_print_progress, keep=args.keep)
+    sys.stderr.write("\n")
+    print(f"{snapshot.stamp}: {format_size(snapshot.size)} in {time.perf_counter() - start:.1f} s")
+
+
+def show(args):
+    print(backup_dir())
+    for snapshot in list_snapshots():
+        print(f"{snapshot.stamp}  {snapshot.created_at} UTC  {format_size(snapshot.size):>10}"
+              f"  {'gzip' if snapshot.compressed else ''}")
+
+
+def restore(args):
+    start = time.perf_counter()
+    aside = restore_snapshot(find_snapshot(args.stamp), pages=args.pages, pause=args.pause, progress=_print_progress,
+                             save_current=not args.no_save)
+    sys.stderr.write("\n")
+    print(f"Restored {args.stamp} in {time.perf_counter() - start:.1f} s")
+    if aside:
+        print(f"The snapshot has no archive; the archive it replaced is in {aside}")
+
+
+def prune(args):
+    print(f"Removed {prune_snapshots(args.keep)} snapshots")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online snapshots of the task database and restore from them")
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--dir", help="snapshot directory (default: <db>_backups)")
+    parser.add_argument("--pages", type=int, default=STEP_PAGES, help="pages copied per step (default: %(default)s)")
+    parser.add_argument("--pause", type=float, default=STEP_PAUSE,
+                        help="seconds to sleep between steps (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="take a snapshot while the database is in use")
+    create_parser.add_argument("--no-compress", action="store_true", help="keep the snapshot as plain .db files")
+    create_parser.add_argument("--keep", type=int, default=KEEP, help="snapshots to keep, 0 for all (default: %(default)s)")
+    create_parser.set_defaults(handler=create)
+
+    list_parser = subparsers.add_parser("list", help="list snapshots, newest first")
+    list_parser.set_defaults(handler=show)
+
+    restore_parser = subparsers.add_parser("restore", help="replace the database with a snapshot")
+    restore_parser.add_argument("stamp", help="snapshot name from `list`, e.g. 20250301-090000")
+    restore_parser.add_argument("--no-save", action="store_true", help="do not snapshot the current state first")
+    restore_parser.set_defaults(handler=restore)
+
+    prune_parser = subparsers.add_parser("prune", help="delete all but the newest snapshots")
+    prune_parser.add_argument("--keep", type=int, default=KEEP)
+    prune_parser.set_defaults(handler=prune)
+
+    args = parser.parse_args()
+    global BACKUP_DIR
+    db.DB_PATH = args.db
+    BACKUP_DIR = args.dir
+    db.init_db()
+    try:
+        args.handler(args)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == '__main__':
+    main()
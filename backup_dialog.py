@@ -0,0 +1,96 @@
+from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QDialog, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView, QCheckBox)
+from PyQt5.QtCore import Qt, pyqtSignal
+import backup
+from theme import StyledButton
+from task_model import format_time
+
+HEADERS = ["الوقت", "الحجم", "مضغوطة"]
+
+
+class BackupDialog(QDialog):
+    backup_requested = pyqtSignal(bool)
+    restore_requested = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.snapshots = []
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        self.setWindowTitle("النسخ الاحتياطية")
+        self.setGeometry(100, 100, 600, 450)
+        self.setObjectName("taskDialog")
+
+        layout = QVBoxLayout()
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        if backup.INTERVAL_HOURS > 0:
+            schedule = f"نسخة تلقائية كل {backup.INTERVAL_HOURS} ساعة، ويُحتفظ بآخر {backup.KEEP} نسخ"
+        else:
+            schedule = "النسخ التلقائي متوقف"
+        info_label = QLabel(f"{schedule}\n{backup.backup_dir()}")
+        info_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(info_label)
+
+        self.table = QTableWidget(0, len(HEADERS))
+        self.table.setHorizontalHeaderLabels(HEADERS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.itemSelectionChanged.connect(self.on_selection_changed)
+        layout.addWidget(self.table)
+
+        self.compress_check = QCheckBox("ضغط النسخ")
+        self.compress_check.setChecked(backup.COMPRESS)
+        self.compress_check.setToolTip("أصغر بعدة مرات، وتستغرق وقتاً أطول قليلاً")
+        layout.addWidget(self.compress_check)
+
+        button_layout = QHBoxLayout()
+        self.backup_btn = StyledButton("نسخة احتياطية الآن", "primary")
+        self.backup_btn.setMinimumHeight(40)
+        self.backup_btn.clicked.connect(lambda: self.backup_requested.emit(self.compress_check.isChecked()))
+        button_layout.addWidget(self.backup_btn)
+        self.restore_btn = StyledButton("استعادة", "danger")
+        self.restore_btn.setMinimumHeight(40)
+        self.restore_btn.setEnabled(False)
+        self.restore_btn.clicked.connect(self.request_restore)
+        button_layout.addWidget(self.restore_btn)
+        button_layout.addStretch()
+        close_btn = StyledButton("إغلاق", "secondary")
+        close_btn.setMinimumHeight(40)
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+    def refresh(self):
+        self.snapshots = backup.list_snapshots()
+        self.table.setRowCount(len(self.snapshots))
+        for row, snapshot in enumerate(self.snapshots):
+            self.table.setItem(row, 0, QTableWidgetItem(format_time(snapshot.created_at)))
+            size_item = QTableWidgetItem(backup.format_size(snapshot.size))
+            size_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            self.table.setItem(row, 1, size_item)
+            self.table.setItem(row, 2, QTableWidgetItem("نعم" if snapshot.compressed else "لا"))
+        self.on_selection_changed()
+
+    def set_busy(self, busy):
+        # One backup or restore at a time.
+        self.backup_btn.setEnabled(not busy)
+        self.on_selection_changed(busy)
+
+    def on_selection_changed(self, busy=None):
+        busy = not self.backup_btn.isEnabled() if busy is None else busy
+        self.restore_btn.setEnabled(not busy and bool(self.table.selectionModel().selectedRows()))
+
+    def request_restore(self):
+        rows = self.table.selectionModel().selectedRows()
+        if rows:
+            self.restore_requested.emit(self.snapshots[rows[0].row()])
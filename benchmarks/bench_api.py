@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import db
+from seed import seed_database, CATEGORIES, STATUSES
+
+
+class Client:
+    # A bare HTTP/1.1 keep-alive client, so the numbers are the server's and not a library's.
+    def __init__(self, port):
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=()):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        data = json.dumps(body).encode('utf-8') if body is not None else b""
+        head = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(data)}"]
+        head += [f"{name}: {value}" for name, value in headers]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + data)
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int(await self.reader.readline(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            payload = b"".join(chunks)
+        else:
+            payload = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+        return status, response_headers, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def scenario_request(name, rng, state):
+    # (method, path, body, headers) for one request of a scenario.
+    if name == 'list':
+        return 'GET', f"/tasks?limit=50&category={quote(rng.choice(CATEGORIES))}", None, ()
+    if name == 'revalidate':
+        return 'GET', "/tasks?limit=50", None, [('If-None-Match', state.get('etag', '"0"'))]
+    if name == 'get':
+        return 'GET', f"/tasks/{rng.randint(1, state['tasks'])}", None, ()
+    if name == 'search':
+        return 'GET', f"/search?q={rng.choice(['meeting', 'report', 'project', 'client'])}&limit=20", None, ()
+    if name == 'create':
+        return 'POST', "/tasks", {'title': f"load {rng.random()}", 'category': rng.choice(CATEGORIES)}, ()
+    if name == 'update':
+        return 'PATCH', f"/tasks/{rng.randint(1, state['tasks'])}", {'status': rng.choice(STATUSES)}, ()
+    if name == 'mixed':
+        # Pollers revalidating while one request in ten writes: each write costs the pollers a full read.
+        return scenario_request('update' if rng.random() < 0.1 else 'revalidate', rng, state)
+    raise ValueError(name)
+
+
+async def run_connection(port, name, deadline, seed, state, latencies, statuses):
+    rng = random.Random(seed)
+    client = Client(port)
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body, headers = scenario_request(name, rng, state)
+            start = time.perf_counter()
+            status, response_headers, _ = await client.request(method, path, body, headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+            if 'etag' in response_headers and method == 'GET' and path.startswith("/tasks?"):
+                state['etag'] = response_headers['etag']
+    finally:
+        client.close()
+
+
+async def run_client(port, name, connections, duration, seed, state):
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(run_connection(port, name, deadline, seed * 1000 + i, state, latencies, statuses)
+                           for i in range(connections)))
+    return latencies, statuses
+
+
+def client_process(args):
+    port, name, connections, duration, seed, state = args
+    return asyncio.run(run_client(port, name, connections, duration, seed, dict(state)))
+
+
+async def stream_all(port):
+    client = Client(port)
+    start = time.perf_counter()
+    status, _, payload = await client.request('GET', "/tasks?format=ndjson")
+    elapsed = time.perf_counter() - start
+    client.close()
+    return status, payload.count(b"\n"), elapsed
+
+
+async def current_etag(port):
+    client = Client(port)
+    _, headers, _ = await client.request('GET', "/tasks?limit=50")
+    client.close()
+    return headers['etag']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(path, port, readers):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "api.py"), "--db", path, "--port", str(port),
+                               "--readers", str(readers)], stderr=subprocess.PIPE, text=True)
+    # api.py says where it listens once the socket is open.
+    line = server.stderr.readline()
+    if not line.startswith("Serving"):
+        server.kill()
+        raise SystemExit(f"api.py did not start: {line}{server.stderr.read()}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for api.py: requests per second per endpoint")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--clients", type=int, default=2, help="client processes")
+    parser.add_argument("--connections", type=int, default=16, help="keep-alive connections per client process")
+    parser.add_argument("--readers", type=int, default=4, help="api.py read threads")
+    parser.add_argument("--scenarios", default="list,revalidate,get,search,create,update,mixed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        db.close_connection()
+        port = free_port()
+        server = start_server(path, port, args.readers)
+        try:
+            stream_status, streamed, stream_seconds = asyncio.run(stream_all(port))
+            results = []
+            with multiprocessing.Pool(args.clients) as pool:
+                for name in args.scenarios.split(","):
+                    state = {'tasks': args.tasks, 'etag': asyncio.run(current_etag(port))}
+                    start = time.perf_counter()
+                    runs = pool.map(client_process, [(port, name, args.connections, args.duration, seed, state)
+                                                     for seed in range(args.clients)])
+                    elapsed = time.perf_counter() - start
+                    latencies = sorted(value for run_latencies, _ in runs for value in run_latencies)
+                    statuses = sum((run_statuses for _, run_statuses in runs), Counter())
+                    results.append((name, latencies, statuses, elapsed))
+        finally:
+            server.terminate()
+            server.wait()
+
+    connections = args.clients * args.connections
+    print(f"{args.tasks} tasks, {connections} connections from {args.clients} processes, "
+          f"{args.readers} read threads, {args.duration:.0f} s per scenario\n")
+    print(f"{'scenario':<12}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}  statuses")
+    for name, latencies, statuses, elapsed in results:
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+        print(f"{name:<12}{len(latencies):>10}{len(latencies) / elapsed:>10.0f}"
+              f"{statistics.median(latencies) if latencies else 0:>10.2f}{p99:>10.2f}  "
+              + " ".join(f"{status}x{count}" for status, count in sorted(statuses.items())))
+    print(f"\nNDJSON stream of every task: {streamed} rows in {stream_seconds:.2f} s "
+          f"({streamed / stream_seconds:,.0f} rows/s, status {stream_status})")
+    if stream_status != 200 or any(status >= 500 for _, _, statuses, _ in results for status in statuses):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
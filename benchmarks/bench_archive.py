@@ -0,0 +1,75 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from seed import seed_database
+
+QUERIES = [
+    ("get_tasks_page", lambda: db.get_tasks_page(page_size=100)),
+    ("get_tasks_page completed", lambda: db.get_tasks_page(status='completed', page_size=100)),
+    ("search_tasks", lambda: db.search_tasks("اجتماع", limit=200)),
+    ("search_tasks + archive", lambda: db.search_tasks("اجتماع", limit=200, include_archive=True)),
+    ("get_stats", db.get_stats),
+]
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main_size_mb():
+    conn = db.get_connection()
+    conn.execute('PRAGMA main.wal_checkpoint(TRUNCATE)')
+    page_size = conn.execute('PRAGMA main.page_size').fetchone()[0]
+    return conn.execute('PRAGMA main.page_count').fetchone()[0] * page_size / (1024 * 1024)
+
+
+def measure(repeat):
+    return {name: median_ms(query, repeat) for name, query in QUERIES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot table size and query latency before and after archiving")
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--older-than", type=int, default=30, metavar="DAYS")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        # Seeded tasks are all "updated" now; date completed ones back to when they were created.
+        with db.transaction() as conn:
+            conn.execute(f'UPDATE tasks SET updated_at = created_at WHERE status = {db.COMPLETED}')
+        size_before = main_size_mb()
+        before = measure(args.repeat)
+
+        start = time.perf_counter()
+        archived = db.archive_tasks(args.older_than)
+        archive_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        while db.vacuum_step():
+            pass
+        vacuum_ms = (time.perf_counter() - start) * 1000
+        size_after = main_size_mb()
+        after = measure(args.repeat)
+        db.close_connection()
+
+    print(f"{args.tasks} tasks, {archived} archived in {archive_ms:.0f} ms, index merge and vacuum {vacuum_ms:.0f} ms")
+    print(f"main database {size_before:.1f} MB -> {size_after:.1f} MB\n")
+    print(f"{'query':<32}{'before ms':>12}{'after ms':>12}")
+    for name, _ in QUERIES:
+        print(f"{name:<32}{before[name]:>12.2f}{after[name]:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backup
+import db
+from seed import seed_database, CATEGORIES
+
+
+class Load:
+    # A reader paging through tasks and a writer editing them, as the GUI and API do, each
+    # recording how long every call took while the operation under test runs.
+    def __init__(self, interval):
+        self.interval = interval
+        self.reads = []
+        self.writes = []
+        self.failures = 0
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._run, args=(self._read, self.reads)),
+                         threading.Thread(target=self._run, args=(self._write, self.writes))]
+
+    def _read(self, i):
+        db.get_tasks_page(category=CATEGORIES[i % len(CATEGORIES)], page_size=100)
+
+    def _write(self, i):
+        db.update_task(i % 1000 + 1, description=f"edit {i}")
+
+    def _run(self, call, timings):
+        i = 0
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                call(i)
+            except db.sqlite3.OperationalError:
+                self.failures += 1
+            timings.append((time.perf_counter() - start) * 1000)
+            i += 1
+            time.sleep(self.interval)
+        db.close_connection()
+
+    def __enter__(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def summary(timings):
+    timings = sorted(timings)
+    if not timings:
+        return "—"
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return f"{statistics.median(timings):6.2f} {p99:7.2f} {timings[-1]:8.1f}"
+
+
+def run(name, operation, interval, results):
+    with Load(interval) as load:
+        start = time.perf_counter()
+        result = operation()
+        elapsed = time.perf_counter() - start
+    results.append((name, elapsed, result, load))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Foreground query latency while a snapshot is taken or restored")
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds of load with nothing else running")
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between foreground calls")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        db.get_connection().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size = os.path.getsize(db.DB_PATH) / (1024 * 1024)
+        run("idle", lambda: time.sleep(args.idle), args.interval, results)
+        run("stepped backup", lambda: backup.create_snapshot(compress=False, keep=0), args.interval, results)
+        run("stepped backup + gzip", lambda: backup.create_snapshot(compress=True, keep=0), args.interval, results)
+        # The whole database in one step, as Connection.backup does by default.
+        snapshot = run("one-step backup", lambda: backup.create_snapshot(compress=False, pages=-1, pause=0, keep=0),
+                       args.interval, results)
+        run("restore", lambda: backup.restore_snapshot(snapshot, save_current=False), args.interval, results)
+        db.close_connection()
+
+    print(f"{args.tasks} tasks, {size:.1f} MB database, one read and one write every {args.interval * 1000:.0f} ms\n")
+    print(f"{'operation':<24}{'seconds':>8}{'size MB':>9}   {'read p50/p99/max ms':<24}"
+          f"{'write p50/p99/max ms':<24}failed")
+    for name, elapsed, result, load in results:
+        snapshot_size = f"{result.size / (1024 * 1024):.1f}" if isinstance(result, backup.Snapshot) else ""
+        print(f"{name:<24}{elapsed:>8.2f}{snapshot_size:>9}   {summary(load.reads):<24}{summary(load.writes):<24}"
+              f"{load.failures}")
+
+
+if __name__ == '__main__':
+    main()
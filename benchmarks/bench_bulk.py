@@ -0,0 +1,42 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from seed import seed_database
+
+
+def timed_ms(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row writes against the json_each bulk statements")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--selected", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        first = list(range(1, args.selected + 1))
+        second = list(range(args.selected + 1, 2 * args.selected + 1))
+        results = [
+            ("status, one update_task per row", timed_ms(lambda: [db.update_task(i, status='completed') for i in first])),
+            ("status, update_tasks_bulk", timed_ms(lambda: db.update_tasks_bulk(second, status='completed'))),
+            ("delete, one delete_task per row", timed_ms(lambda: [db.delete_task(i) for i in first])),
+            ("delete, delete_tasks_bulk", timed_ms(lambda: db.delete_tasks_bulk(second))),
+        ]
+        db.close_connection()
+
+    print(f"{args.selected} of {args.tasks} tasks\n")
+    for name, elapsed in results:
+        print(f"{name:<40}{elapsed:>12.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
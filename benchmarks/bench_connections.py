@@ -0,0 +1,104 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+
+def legacy_add_task(title, description="", category="عام"):
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO tasks (title, description, category_id)
+        VALUES (?, ?, (SELECT id FROM categories WHERE name = ?))
+    ''', (title, description, category))
+    conn.commit()
+    task_id = cursor.lastrowid
+    conn.close()
+    return task_id
+
+
+def legacy_update_task(task_id, status):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                 (db.STATUS_CODES[status], task_id))
+    conn.commit()
+    conn.close()
+
+
+def legacy_get_tasks_by_status(status):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    tasks = conn.execute('SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC LIMIT 50',
+                         (db.STATUS_CODES[status],)).fetchall()
+    conn.close()
+    return tasks
+
+
+def managed_get_tasks_by_status(status):
+    return db.get_connection().execute(
+        'SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC LIMIT 50', (db.STATUS_CODES[status],)).fetchall()
+
+
+def fresh_database(directory, name):
+    db.close_connection()
+    db.DB_PATH = os.path.join(directory, name)
+    db.init_db()
+
+
+def rate(func, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-call connections with the shared connection manager")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        fresh_database(directory, "legacy.db")
+        db.close_connection()
+        # The legacy path never switched the file to WAL, so measure it on a rollback journal.
+        conn = sqlite3.connect(db.DB_PATH)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+        results.append(("add_task", "before",
+                        rate(lambda i: legacy_add_task(f"task {i}", "benchmark"), args.calls)))
+        results.append(("update_task", "before",
+                        rate(lambda i: legacy_update_task(i + 1, "completed"), args.calls)))
+        results.append(("get_tasks_by_status", "before",
+                        rate(lambda i: legacy_get_tasks_by_status("completed"), args.calls)))
+
+        fresh_database(directory, "managed.db")
+        results.append(("add_task", "after",
+                        rate(lambda i: db.add_task(f"task {i}", "benchmark"), args.calls)))
+        results.append(("update_task", "after",
+                        rate(lambda i: db.update_task(i + 1, status="completed"), args.calls)))
+        results.append(("get_tasks_by_status", "after",
+                        rate(lambda i: managed_get_tasks_by_status("completed"), args.calls)))
+
+        start = time.perf_counter()
+        for i in range(0, args.calls, 100):
+            with db.transaction():
+                for j in range(100):
+                    db.add_task(f"task {i + j}", "benchmark")
+        elapsed = time.perf_counter() - start
+        results.append(("add_task x100 in transaction()", "after", args.calls / elapsed))
+        db.close_connection()
+
+    print(f"{'operation':<32}{'mode':<8}{'calls/s':>12}")
+    for name, mode, calls_per_second in results:
+        print(f"{name:<32}{mode:<8}{calls_per_second:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from seed import seed_database, STATUSES
+
+HISTORY_TRIGGERS = ['task_history_update', 'task_history_delete', 'task_history_restore']
+
+
+def run_updates(task_ids, count, seed):
+    rng = random.Random(seed)
+    conn = db.get_connection()
+    start = time.perf_counter()
+    with db.transaction():
+        for i in range(count):
+            conn.execute('UPDATE tasks SET title = ?, status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                         (f"history benchmark {i}", db.STATUS_CODES[rng.choice(STATUSES)], rng.choice(task_ids)))
+    return (time.perf_counter() - start) * 1000
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def history_size_kb():
+    try:
+        size = db.get_connection().execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = 'task_history' OR name LIKE 'idx_task_history_%'").fetchone()[0]
+    except db.sqlite3.OperationalError:
+        return 0.0
+    return (size or 0) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of the task history log: writes, reads and compaction")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--updates", type=int, default=100000)
+    parser.add_argument("--hot-tasks", type=int, default=500, help="tasks that receive all the updates")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        conn = db.get_connection()
+        task_ids = random.Random(1).sample(range(1, args.tasks + 1), args.hot_tasks)
+
+        logged = run_updates(task_ids, args.updates, seed=2)
+        rows = conn.execute('SELECT COUNT(*) FROM task_history').fetchone()[0]
+        size_before = history_size_kb()
+        read = median_ms(lambda: db.get_task_history(random.choice(task_ids)), args.repeat)
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT id FROM task_history WHERE task_id = ? ORDER BY id DESC',
+                            (task_ids[0],)).fetchone()[3]
+
+        start = time.perf_counter()
+        batches = []
+        after = 0
+        while True:
+            batch_start = time.perf_counter()
+            _, after = db.compact_history(after=after)
+            batches.append((time.perf_counter() - batch_start) * 1000)
+            if not after:
+                break
+        compact_ms = (time.perf_counter() - start) * 1000
+        compacted_rows = conn.execute('SELECT COUNT(*) FROM task_history').fetchone()[0]
+        size_after = history_size_kb()
+        compacted_read = median_ms(lambda: db.get_task_history(random.choice(task_ids)), args.repeat)
+
+        with db.transaction():
+            for trigger in HISTORY_TRIGGERS:
+                conn.execute(f'DROP TRIGGER {trigger}')
+        unlogged = run_updates(task_ids, args.updates, seed=2)
+        db.close_connection()
+
+    print(f"{args.tasks} tasks, {args.updates} updates spread over {args.hot_tasks} tasks\n")
+    print(f"{'updates without history':<40}{unlogged:>12.0f} ms")
+    print(f"{'updates with history':<40}{logged:>12.0f} ms  ({logged / unlogged:.2f}x)")
+    print(f"{'history rows':<40}{rows:>12}")
+    print(f"{'history size':<40}{size_before:>12.0f} KB")
+    print(f"{'get_task_history (median)':<40}{read:>12.3f} ms  [{plan}]")
+    print(f"{'compact_history':<40}{compact_ms:>12.0f} ms in {len(batches)} batches "
+          f"(slowest {max(batches):.0f} ms)")
+    print(f"{'history rows after compaction':<40}{compacted_rows:>12}")
+    print(f"{'history size after compaction':<40}{size_after:>12.0f} KB")
+    print(f"{'get_task_history after compaction':<40}{compacted_read:>12.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PyQt5.QtCore import Qt
+import db
+from seed import seed_database
+from writer import WriteQueue
+
+WRITE_INTERVAL = 0.01
+
+
+def drop_search_index(path):
+    # Rewind the database to before the search index migration so init_db() schedules its backfill.
+    db.close_connection()
+    db.DB_PATH = path
+    conn = db.get_connection()
+    conn.execute('DROP TABLE tasks_fts')
+    conn.execute('PRAGMA user_version = 3')
+    db.close_connection()
+    # Step by step, as the app does; init_db() would run the backfill before returning.
+    for version in db.pending_migrations():
+        db.apply_migration(version)
+
+
+def write_latencies(stop, latencies, failures):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            task_id = db.add_task("migration benchmark", "", "عام")
+        except sqlite3.OperationalError:
+            # The write waited out the busy timeout behind the migration.
+            failures.append((time.perf_counter() - start) * 1000)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.delete_task(task_id)
+        time.sleep(WRITE_INTERVAL)
+    db.close_connection()
+
+
+def summarize(elapsed, latencies, failures):
+    latencies.sort()
+    return {
+        'seconds': elapsed,
+        'writes': len(latencies),
+        'failed': len(failures),
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p99': latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        'max': max(latencies + failures),
+    }
+
+
+def measure_thread(path, batch_size):
+    drop_search_index(path)
+    latencies = []
+    failures = []
+    stop = threading.Event()
+    writer = threading.Thread(target=write_latencies, args=(stop, latencies, failures))
+    writer.start()
+    start = time.perf_counter()
+    db.run_backfills(batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    writer.join()
+    return summarize(elapsed, latencies, failures)
+
+
+def measure_queue(path, batch_size):
+    # What the app does: batches go through the write-behind queue one at a time, between user writes.
+    drop_search_index(path)
+    latencies = []
+    backfills = [list(row) for row in db.pending_backfills()]
+    current = [None]
+    done = threading.Event()
+    queue = WriteQueue()
+
+    def submit_next():
+        if not backfills:
+            done.set()
+            return
+        version, position, target = backfills[0]
+        current[0] = queue.submit(db.backfill_batch, version, position, target, batch_size)
+
+    def on_completed(token, position):
+        if token != current[0]:
+            return
+        backfills[0][1] = position
+        if position >= backfills[0][2]:
+            backfills.pop(0)
+        submit_next()
+
+    def timed_write(start):
+        task_id = db.add_task("migration benchmark", "", "عام")
+        db.delete_task(task_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    queue.completed.connect(on_completed, Qt.DirectConnection)
+    start = time.perf_counter()
+    submit_next()
+    while not done.is_set():
+        queue.submit(timed_write, time.perf_counter())
+        time.sleep(WRITE_INTERVAL)
+    elapsed = time.perf_counter() - start
+    queue.stop()
+    return summarize(elapsed, latencies, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write latency while the search index backfill runs")
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=db.BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        results = [
+            ("one transaction", measure_thread(path, args.tasks)),
+            ("batches, own thread", measure_thread(path, args.batch_size)),
+            ("batches, write queue", measure_queue(path, args.batch_size)),
+        ]
+        db.close_connection()
+
+    print(f"{args.tasks} tasks, one add_task every {WRITE_INTERVAL * 1000:.0f} ms during the backfill\n")
+    print(f"{'backfill':<24}{'seconds':>10}{'writes':>8}{'failed':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, result in results:
+        print(f"{name:<24}{result['seconds']:>10.1f}{result['writes']:>8}{result['failed']:>8}"
+              f"{result['p50']:>10.2f}{result['p99']:>10.2f}{result['max']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
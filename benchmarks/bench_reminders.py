@@ -0,0 +1,113 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from seed import seed_database
+
+SCAN_QUERY = f'''
+    SELECT t.id, t.due_at FROM tasks t NOT INDEXED
+    WHERE t.due_at IS NOT NULL AND t.status != {db.COMPLETED} AND t.due_at > datetime('now')
+    ORDER BY t.due_at, t.id LIMIT {db.REMINDER_BATCH_SIZE}
+'''
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def query_timings(repeat):
+    return [
+        ("get_upcoming_due (idx_tasks_due)", median_ms(db.get_upcoming_due, repeat)),
+        ("same query, full table scan", median_ms(lambda: db.get_connection().execute(SCAN_QUERY).fetchall(), repeat)),
+        ("get_tasks_page overdue", median_ms(lambda: db.get_tasks_page(due='overdue', page_size=100), repeat)),
+        ("get_tasks_page due_soon", median_ms(lambda: db.get_tasks_page(due='due_soon', page_size=100), repeat)),
+    ]
+
+
+def scheduler_timings(changes):
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from repository import TaskRepository
+    from reminders import ReminderScheduler
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    repository = TaskRepository()
+    scheduler = ReminderScheduler(repository)
+
+    start = time.perf_counter()
+    scheduler.start()
+    loop = QEventLoop()
+    while scheduler._loading:
+        QTimer.singleShot(1, loop.quit)
+        loop.exec_()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    # Deadline edits as the repository reports them, straight to the scheduler.
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    task_ids = [row['id'] for row in db.get_upcoming_due(limit=changes)]
+    tasks = [repository.get_task(task_id) for task_id in task_ids]
+    edits = [task._replace(due_at=(now + timedelta(minutes=rng.randint(1, 30 * 24 * 60))).strftime(
+        "%Y-%m-%d %H:%M:%S")) for task in tasks for _ in range(max(1, changes // max(len(tasks), 1)))][:changes]
+    start = time.perf_counter()
+    for task in edits:
+        repository.task_updated.emit(task)
+    change_us = (time.perf_counter() - start) * 1e6 / max(len(edits), 1)
+    pending, heap = scheduler.pending(), len(scheduler._heap)
+    scheduler.stop()
+    repository.close()
+
+    # What the scheduler replaces: one started QTimer per open deadline.
+    open_deadlines = db.get_connection().execute(
+        f"SELECT COUNT(*) FROM tasks WHERE due_at > datetime('now') AND status != {db.COMPLETED}").fetchone()[0]
+    start = time.perf_counter()
+    timers = []
+    for i in range(open_deadlines):
+        timer = QTimer()
+        timer.setSingleShot(True)
+        timer.start(3600 * 1000 + i)
+        timers.append(timer)
+    timers_ms = (time.perf_counter() - start) * 1000
+    for timer in timers:
+        timer.stop()
+    app.processEvents()
+    return load_ms, change_us, len(edits), pending, heap, open_deadlines, timers_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Due date queries and the reminder scheduler")
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--changes", type=int, default=10000, help="deadline edits fed to the scheduler")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        queries = query_timings(args.repeat)
+        load_ms, change_us, edits, pending, heap, open_deadlines, timers_ms = scheduler_timings(args.changes)
+        db.close_connection()
+
+    print(f"{args.tasks} tasks, {open_deadlines} open future deadlines, median of {args.repeat} runs\n")
+    for name, ms in queries:
+        print(f"{name:<48}{ms:>10.2f} ms")
+    print()
+    print(f"{f'scheduler first load ({db.REMINDER_BATCH_SIZE} deadlines)':<48}{load_ms:>10.2f} ms")
+    print(f"{f'scheduler, per deadline edit ({edits} edits)':<48}{change_us:>10.2f} us")
+    print(f"{'tracked deadlines / heap entries afterwards':<48}{f'{pending} / {heap}':>10}")
+    print(f"{f'one QTimer per open deadline ({open_deadlines})':<48}{timers_ms:>10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
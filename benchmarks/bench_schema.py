@@ -0,0 +1,162 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from seed import generate_tasks
+
+LEGACY_SCHEMA = [
+    '''
+    CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        category TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX idx_tasks_created ON tasks (created_at)',
+    'CREATE INDEX idx_tasks_category_created ON tasks (category, created_at)',
+    'CREATE INDEX idx_tasks_status_created ON tasks (status, created_at)',
+    'CREATE INDEX idx_tasks_category_status_created ON tasks (category, status, created_at)',
+]
+
+LEGACY_FILTERS = [
+    ("category", "SELECT * FROM tasks WHERE category = ? ORDER BY created_at DESC LIMIT 100", ("عمل",)),
+    ("status", "SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC LIMIT 100", ("completed",)),
+    ("category + status",
+     "SELECT * FROM tasks WHERE category = ? AND status = ? ORDER BY created_at DESC LIMIT 100",
+     ("عمل", "completed")),
+    ("count by category", "SELECT COUNT(*) FROM tasks WHERE category = ?", ("عمل",)),
+]
+
+NORMALIZED_FILTERS = [
+    ("category", "SELECT * FROM tasks WHERE category_id = ? ORDER BY created_at DESC LIMIT 100", ("عمل",)),
+    ("status", "SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC LIMIT 100", ("completed",)),
+    ("category + status",
+     "SELECT * FROM tasks WHERE category_id = ? AND status = ? ORDER BY created_at DESC LIMIT 100",
+     ("عمل", "completed")),
+    ("count by category", "SELECT COUNT(*) FROM tasks WHERE category_id = ?", ("عمل",)),
+]
+
+PAGE_FILTERS = [
+    {'category': "عمل"},
+    {'status': "completed"},
+    {'category': "عمل", 'status': "completed"},
+]
+
+
+def normalized_params(params):
+    return tuple(db.STATUS_CODES[value] if value in db.STATUS_CODES else db.category_id(value) for value in params)
+
+
+def create_legacy_database(path, count):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA:
+        conn.execute(statement)
+    conn.executemany(
+        "INSERT INTO tasks (title, description, category, status, created_at) "
+        "VALUES (?, ?, ?, ?, datetime('2020-01-01', '+' || ? || ' minutes'))",
+        (task[:5] for task in generate_tasks(count)))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def index_sizes(path):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute('''
+            SELECT name, SUM(pgsize) FROM dbstat
+            WHERE name = 'tasks' OR name LIKE 'idx_tasks_%'
+            GROUP BY name ORDER BY name
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        # dbstat is a compile-time option; fall back to the whole file.
+        rows = [("(file)", os.path.getsize(path))]
+    conn.close()
+    return dict(rows)
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def print_sizes(before, after):
+    print(f"{'table / index':<40}{'before KB':>12}{'after KB':>12}")
+    for name in sorted(set(before) | set(after)):
+        old = before.get(name)
+        new = after.get(name)
+        print(f"{name:<40}{old / 1024 if old else 0:>12.0f}{new / 1024 if new else 0:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the text category/status schema with the normalized one")
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tasks.db")
+        create_legacy_database(path, args.tasks)
+        before = index_sizes(path)
+
+        conn = sqlite3.connect(path)
+        legacy = {name: median_ms(lambda: conn.execute(query, params).fetchall(), args.repeat)
+                  for name, query, params in LEGACY_FILTERS}
+        legacy["categories (dialog open)"] = median_ms(
+            lambda: conn.execute("SELECT DISTINCT category FROM tasks ORDER BY category").fetchall(), args.repeat)
+        conn.close()
+
+        db.close_connection()
+        db.DB_PATH = path
+        start = time.perf_counter()
+        # The app's path: schema steps and indexes first, then the backfills that init_db() would also run.
+        db.init_db(defer=True)
+        for version in db.pending_migrations():
+            db.apply_migration(version)
+        for name in db.pending_indexes():
+            db.build_index(name)
+        migration_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        db.run_backfills(pause=0)
+        backfill_ms = (time.perf_counter() - start) * 1000
+        db.get_connection().execute("ANALYZE")
+        after = index_sizes(path)
+
+        conn = db.get_connection()
+        normalized = {name: median_ms(lambda: conn.execute(query, normalized_params(params)).fetchall(), args.repeat)
+                      for name, query, params in NORMALIZED_FILTERS}
+        normalized["categories (dialog open)"] = median_ms(db.get_category_names, args.repeat)
+        # The public API joins the category name back in and maps status codes to strings.
+        pages = [(filters, median_ms(lambda: db.get_tasks_page(page_size=100, **filters), args.repeat))
+                 for filters in PAGE_FILTERS]
+        db.close_connection()
+
+    print(f"{args.tasks} tasks, migration took {migration_ms:.0f} ms, search index backfill {backfill_ms:.0f} ms\n")
+    print_sizes(before, after)
+    print(f"\n{'query':<40}{'before ms':>12}{'after ms':>12}")
+    for name, old in legacy.items():
+        print(f"{name:<40}{old:>12.3f}{normalized[name]:>12.3f}")
+    print()
+    for filters, elapsed in pages:
+        label = "get_tasks_page " + ", ".join(filters.values())
+        print(f"{label:<40}{'':>12}{elapsed:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from seed import seed_database
+
+QUERIES = ["meeting", "اجتماع", "proj", "تقرير الفريق"]
+
+
+def python_scan(search_text):
+    search_text = search_text.lower()
+    tasks = db.get_all_tasks()
+    return [t for t in tasks if search_text in t['title'].lower() or search_text in (t['description'] or "").lower()]
+
+
+def best_of(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Python substring scan with FTS5 search")
+    parser.add_argument("--sizes", default="100000,1000000")
+    args = parser.parse_args()
+
+    print(f"{'tasks':>9}  {'query':<14}{'scan ms':>10}{'fts ms':>10}{'fts rows':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(value) for value in args.sizes.split(",")):
+            seed_database(os.path.join(directory, f"search_{size}.db"), size)
+            for query in QUERIES:
+                scan_ms = best_of(lambda: python_scan(query), repeat=1)
+                rows = db.search_tasks(query, limit=200)
+                fts_ms = best_of(lambda: db.search_tasks(query, limit=200))
+                print(f"{size:>9}  {query:<14}{scan_ms:>10.1f}{fts_ms:>10.1f}{len(rows):>10}")
+            db.close_connection()
+
+
+if __name__ == '__main__':
+    main()
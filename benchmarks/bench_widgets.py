@@ -0,0 +1,118 @@
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QHBoxLayout, QPushButton, QWidget
+from PyQt5.QtGui import QColor
+import db
+import theme
+from theme import StyledButton
+
+LEGACY_PRIMARY = """
+    QPushButton {
+        background-color: #3498db;
+        color: white;
+        border: none;
+        padding: 8px 16px;
+        border-radius: 4px;
+        font-weight: bold;
+        font-size: 13px;
+    }
+    QPushButton:hover {
+        background-color: #2980b9;
+    }
+    QPushButton:pressed {
+        background-color: #1f618d;
+    }
+"""
+
+LEGACY_DANGER = """
+    QPushButton {
+        background-color: #e74c3c;
+        color: white;
+        border: none;
+        padding: 8px 12px;
+        border-radius: 4px;
+        font-weight: bold;
+        font-size: 12px;
+    }
+    QPushButton:hover {
+        background-color: #c0392b;
+    }
+    QPushButton:pressed {
+        background-color: #a93226;
+    }
+"""
+
+
+def legacy_row():
+    widget = QWidget()
+    layout = QHBoxLayout(widget)
+    for text, sheet in (("✎", LEGACY_PRIMARY), ("✕", LEGACY_DANGER)):
+        button = QPushButton(text)
+        button.setStyleSheet(sheet)
+        layout.addWidget(button)
+    return widget
+
+
+def themed_row():
+    widget = QWidget()
+    layout = QHBoxLayout(widget)
+    layout.addWidget(StyledButton("✎", "primary"))
+    layout.addWidget(StyledButton("✕", "danger"))
+    return widget
+
+
+def time_rows(factory, rows):
+    start = time.perf_counter()
+    widgets = []
+    for _ in range(rows):
+        widget = factory()
+        for child in widget.findChildren(QPushButton):
+            child.ensurePolished()
+        widgets.append(widget)
+    elapsed = time.perf_counter() - start
+    for widget in widgets:
+        widget.deleteLater()
+    return elapsed * 1000
+
+
+def time_colors(rows):
+    names = list(db.DEFAULT_CATEGORIES.values())
+    start = time.perf_counter()
+    for i in range(rows):
+        QColor(names[i % len(names)])
+    legacy = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(rows):
+        theme.color(names[i % len(names)])
+    cached = time.perf_counter() - start
+    return legacy * 1000, cached * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-row widget construction cost")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    legacy_ms = time_rows(legacy_row, args.rows)
+    app.processEvents()
+    theme.apply_theme(app)
+    themed_ms = time_rows(themed_row, args.rows)
+    app.processEvents()
+    color_legacy_ms, color_cached_ms = time_colors(args.rows * 2)
+
+    print(f"{'case':<40}{'ms':>10}")
+    print(f"{'per-button stylesheets':<40}{legacy_ms:>10.1f}")
+    print(f"{'application stylesheet + variant':<40}{themed_ms:>10.1f}")
+    print(f"{'new QColor per cell':<40}{color_legacy_ms:>10.1f}")
+    print(f"{'shared theme.color()':<40}{color_cached_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
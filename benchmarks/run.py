@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import db
+from seed import seed_database, CATEGORIES, STATUSES
+
+STATUS_LABELS = {"pending": "قيد الانتظار", "in_progress": "قيد الإنجاز", "completed": "مكتملة"}
+
+SEARCHES = ["meeting", "اجتماع", "تقرير الفريق"]
+
+FILTERS = [
+    {},
+    {'category': "عمل"},
+    {'status': "completed"},
+    {'category': "عمل", 'status': "completed"},
+]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+class Suite:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def record(self, size, name, params, timings):
+        result = {
+            'size': size,
+            'name': name,
+            'params': params,
+            'median_ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'runs': len(timings),
+        }
+        self.results.append(result)
+        label = f"{name} {json.dumps(params, ensure_ascii=False)}" if params else name
+        print(f"{size:>9}  {label:<60}{result['median_ms']:>12.2f} ms")
+
+    def run(self, size, name, func, params=None, repeat=None):
+        self.record(size, name, params or {}, measure(func, repeat or self.repeat))
+
+
+def open_database(data_dir, size):
+    path = os.path.join(data_dir, f"tasks_{size}.db")
+    if os.path.exists(path):
+        db.close_connection()
+        db.DB_PATH = path
+        db.init_db()
+        if db.get_connection().execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == size:
+            return path
+    print(f"Seeding {size} tasks into {path} ...")
+    return seed_database(path, size)
+
+
+def bench_db(suite, size):
+    # Full materialization is what the old UI did; keep it bounded on very large databases.
+    heavy_repeat = 1 if size >= 100000 else None
+    suite.run(size, "get_all_tasks", db.get_all_tasks, repeat=heavy_repeat)
+    suite.run(size, "get_tasks_by_category", lambda: db.get_tasks_by_category("عمل"), repeat=heavy_repeat)
+    suite.run(size, "get_tasks_by_status", lambda: db.get_tasks_by_status("completed"), repeat=heavy_repeat)
+    suite.run(size, "get_categories", db.get_categories)
+    suite.run(size, "get_stats", db.get_stats)
+    suite.run(size, "get_daily_throughput", lambda: db.get_daily_throughput(30))
+    for filters in FILTERS:
+        suite.run(size, "query_tasks", lambda: db.query_tasks(limit=200, **filters), filters)
+    for filters in FILTERS:
+        suite.run(size, "get_tasks_page", lambda: db.get_tasks_page(page_size=100, **filters), filters)
+    _, cursor = db.get_tasks_page(page_size=size // 2)
+    suite.run(size, "get_tasks_page", lambda: db.get_tasks_page(cursor=cursor, page_size=100), {'cursor': 'middle'})
+    for due in db.DUE_FILTERS:
+        suite.run(size, "get_tasks_page", lambda: db.get_tasks_page(page_size=100, due=due), {'due': due})
+    suite.run(size, "get_upcoming_due", db.get_upcoming_due)
+    for key in db.SORTS:
+        if key == 'created':
+            continue
+        for filters in FILTERS:
+            suite.run(size, "get_tasks_page", lambda: db.get_tasks_page(page_size=100, order=f"{key}_asc", **filters),
+                      dict(filters, order=f"{key}_asc"))
+    for text in SEARCHES:
+        suite.run(size, "search_tasks", lambda: db.search_tasks(text, limit=200), {'text': text})
+
+    middle = max(1, size // 2)
+    suite.run(size, "get_task", lambda: db.get_task(middle))
+    suite.run(size, "locate_task", lambda: db.locate_task(middle, page_size=500, order='title_asc'),
+              {'task': 'middle', 'order': 'title_asc'})
+
+    added = []
+    suite.run(size, "add_task", lambda: added.append(db.add_task("benchmark task", "benchmark", CATEGORIES[0])))
+    suite.run(size, "update_task", lambda: db.update_task(added[0], status=STATUSES[2]))
+    suite.run(size, "delete_task", lambda: db.delete_task(added.pop()))
+    for task_id in added:
+        db.delete_task(task_id)
+
+    rows = [{'title': "bulk benchmark", 'description': "bulk", 'category': CATEGORIES[1]} for _ in range(1000)]
+    suite.run(size, "bulk_insert", lambda: db.bulk_insert(rows), {'rows': 1000}, repeat=1)
+    db.get_connection().execute("DELETE FROM tasks WHERE title = 'bulk benchmark'")
+
+
+def bench_ui(suite, size, app, window):
+    from PyQt5.QtCore import QEventLoop, QTimer
+
+    def wait_for_model():
+        if not window.model._loading:
+            return
+        loop = QEventLoop()
+        window.model.loading_changed.connect(loop.quit)
+        QTimer.singleShot(60000, loop.quit)
+        loop.exec_()
+        window.model.loading_changed.disconnect(loop.quit)
+
+    combinations = [(filters, text) for filters in FILTERS for text in [None] + SEARCHES[:1]]
+    for filters, text in combinations:
+        window.category_filter.blockSignals(True)
+        window.status_filter.blockSignals(True)
+        window.search_input.blockSignals(True)
+        window.category_filter.setCurrentText(filters.get('category', "الكل"))
+        window.status_filter.setCurrentText(STATUS_LABELS.get(filters.get('status'), "الكل"))
+        window.search_input.setText(text or "")
+        window.category_filter.blockSignals(False)
+        window.status_filter.blockSignals(False)
+        window.search_input.blockSignals(False)
+
+        params = dict(filters, text=text) if text else dict(filters)
+        latency = []
+        first_page = []
+        for _ in range(suite.repeat):
+            start = time.perf_counter()
+            window.load_tasks()
+            latency.append((time.perf_counter() - start) * 1000)
+            wait_for_model()
+            app.processEvents()
+            first_page.append((time.perf_counter() - start) * 1000)
+        suite.record(size, "load_tasks (GUI thread)", params, latency)
+        suite.record(size, "load_tasks (first page shown)", params, first_page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark suite for db.py and the task table")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="comma-separated task counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--data-dir", default=os.path.join(BENCH_DIR, "data"),
+                        help="where seeded databases are cached between runs")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    parser.add_argument("--no-ui", action="store_true", help="skip the Qt table benchmarks")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    suite = Suite(args.repeat)
+    app = window = None
+    if not args.no_ui:
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication.instance() or QApplication(sys.argv)
+
+    peak_rss = {}
+    for size in (int(value) for value in args.sizes.split(",")):
+        open_database(args.data_dir, size)
+        bench_db(suite, size)
+        if app is not None:
+            from app import TaskManagerApp
+            window = TaskManagerApp()
+            window.show()
+            app.processEvents()
+            bench_ui(suite, size, app, window)
+            window.close()
+            window.deleteLater()
+            app.processEvents()
+        peak_rss[size] = round(peak_rss_mb(), 1)
+        print(f"{size:>9}  {'peak RSS':<60}{peak_rss[size]:>12.1f} MB")
+        db.close_connection()
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'peak_rss_mb': peak_rss,
+        'results': suite.results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(args.compare, report)
+
+
+def result_key(result):
+    return result['size'], result['name'], json.dumps(result['params'], sort_keys=True, ensure_ascii=False)
+
+
+def compare(path, report):
+    with open(path, encoding='utf-8') as f:
+        previous = {result_key(result): result for result in json.load(f)['results']}
+    print(f"\nCompared with {path}:")
+    for result in report['results']:
+        before = previous.get(result_key(result))
+        if not before or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        flag = "  REGRESSION" if ratio > 1.2 else ""
+        label = f"{result['name']} {json.dumps(result['params'], ensure_ascii=False)}"
+        print(f"{result['size']:>9}  {label:<60}{before['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms"
+              f" ({ratio:.2f}x){flag}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+CATEGORIES = list(db.DEFAULT_CATEGORIES)
+STATUSES = db.STATUSES
+# One task in five has a deadline, up to 30 days either side of the time it was seeded.
+DUE_FRACTION = 0.2
+DUE_SPREAD_MINUTES = 30 * 24 * 60
+
+ARABIC_WORDS = ["اجتماع", "تقرير", "مراجعة", "مشروع", "كتابة", "قراءة", "الفريق", "العميل", "الميزانية",
+                "موعد", "الطبيب", "تمرين", "الجامعة", "واجب", "الأسبوع", "الشهر", "خطة", "تسليم", "مكالمة",
+                "إرسال", "البريد", "تحديث", "النظام", "شراء", "مستلزمات", "المنزل", "إعداد", "عرض", "تقديمي"]
+ENGLISH_WORDS = ["meeting", "report", "review", "project", "deadline", "client", "budget", "release", "draft",
+                 "invoice", "design", "sprint", "backlog", "email", "call", "update", "plan", "deploy",
+                 "research", "notes", "workout", "doctor", "groceries", "homework", "presentation", "team"]
+
+
+def random_text(rng, words):
+    vocabulary = ARABIC_WORDS if rng.random() < 0.6 else ENGLISH_WORDS
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def generate_tasks(count, seed=42):
+    rng = random.Random(seed)
+    # A separate generator, so adding deadlines left the seeded text and categories as they were.
+    due_rng = random.Random(seed + 1)
+    now = datetime.utcnow()
+    for i in range(count):
+        due_at = None
+        if due_rng.random() < DUE_FRACTION:
+            due_at = (now + timedelta(minutes=due_rng.randint(-DUE_SPREAD_MINUTES, DUE_SPREAD_MINUTES)))
+            due_at = due_at.strftime("%Y-%m-%d %H:%M:%S")
+        yield (
+            random_text(rng, rng.randint(2, 6)),
+            random_text(rng, rng.randint(0, 25)),
+            rng.choice(CATEGORIES),
+            rng.choice(STATUSES),
+            i,
+            due_at,
+        )
+
+
+def task_dicts(count, seed=42):
+    # The same tasks as seed_database(), in the form bulk_insert() takes.
+    start = datetime(2020, 1, 1)
+    for title, description, category, status, minute, due_at in generate_tasks(count, seed):
+        yield {'title': title, 'description': description, 'category': category, 'status': status,
+               'created_at': (start + timedelta(minutes=minute)).strftime("%Y-%m-%d %H:%M:%S"), 'due_at': due_at}
+
+
+def seed_database(path, count, batch_size=50000):
+    db.close_connection()
+    if os.path.exists(path):
+        os.remove(path)
+    db.DB_PATH = path
+    db.init_db()
+    category_ids = {category: db.category_id(category) for category in CATEGORIES}
+    rows = ((title, description, category_ids[category], db.STATUS_CODES[status], minute, due_at)
+            for title, description, category, status, minute, due_at in generate_tasks(count))
+    conn = db.get_connection()
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            break
+        with db.transaction():
+            conn.executemany(
+                "INSERT INTO tasks (title, description, category_id, status, created_at, due_at) "
+                "VALUES (?, ?, ?, ?, datetime('2020-01-01', '+' || ? || ' minutes'), ?)",
+                batch)
+    conn.execute("ANALYZE")
+    return path
+
+
+if __name__ == '__main__':
+    seed_database(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,457 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import store
+from seed import seed_database, task_dicts
+
+CHECKS = []
+
+
+def check(func):
+    CHECKS.append(func)
+    return func
+
+
+def expect(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+# Conformance: every engine starts empty and has to give the same answers.
+
+@check
+def add_and_get(tasks):
+    first = tasks.add_task("مهمة أولى", "وصف", "عمل")
+    second = tasks.add_task("second task")
+    expect(0 < first < second, f"ids should increase: {first}, {second}")
+    row = tasks.get_task(first)
+    expect((row['id'], row['title'], row['description'], row['category'], row['status']) ==
+           (first, "مهمة أولى", "وصف", "عمل", 'pending'), f"unexpected row {dict(row)}")
+    expect(row['created_at'] and row['updated_at'], "timestamps should be set")
+    expect(tasks.get_task(second)['category'] == "عام", "default category should be عام")
+    expect(tasks.get_task(second + 100) is None, "unknown ids should return None")
+
+
+@check
+def update_changes_given_fields(tasks):
+    task_id = tasks.add_task("title", "description", "عمل")
+    tasks.update_task(task_id, status='completed')
+    tasks.update_task(task_id, title="new title", category="دراسة")
+    row = tasks.get_task(task_id)
+    expect((row['title'], row['description'], row['category'], row['status']) ==
+           ("new title", "description", "دراسة", 'completed'), f"unexpected row {dict(row)}")
+    tasks.update_task(task_id, description="")
+    expect(tasks.get_task(task_id)['description'] == "", "an empty description should clear it")
+    tasks.update_task(task_id + 100, title="nobody")
+    try:
+        tasks.update_task(task_id, status='unknown')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an unknown status should raise ValueError")
+
+
+@check
+def delete_and_restore(tasks):
+    task_id = tasks.add_task("to delete", "", "صحة")
+    created_at = tasks.get_task(task_id)['created_at']
+    tasks.delete_task(task_id)
+    tasks.delete_task(task_id)
+    expect(tasks.get_task(task_id) is None, "deleted task is still there")
+    tasks.restore_tasks([(task_id, "restored", "back", "صحة", 'in_progress', created_at, "2030-01-01 09:00:00")])
+    row = tasks.get_task(task_id)
+    expect((row['title'], row['status'], row['created_at'], row['due_at']) ==
+           ("restored", 'in_progress', created_at, "2030-01-01 09:00:00"),
+           f"restore should keep id and created_at: {dict(row)}")
+    tasks.restore_tasks([(task_id, "restored again", "", "صحة", 'completed', None, None)])
+    row = tasks.get_task(task_id)
+    expect((row['title'], row['status'], row['created_at'], row['due_at']) ==
+           ("restored again", 'completed', created_at, None),
+           f"restoring an existing task should update it: {dict(row)}")
+    expect(tasks.add_task("after restore") > task_id, "new ids must not reuse restored ones")
+
+
+@check
+def keyset_pages(tasks):
+    rows = [{'title': f"task {i}", 'category': ["عمل", "شخصي"][i % 2],
+             'status': db.STATUSES[i % 3], 'created_at': f"2024-01-{1 + i // 10:02d} 10:00:{i % 10:02d}"}
+            for i in range(95)]
+    rows.append(dict(rows[-1], title="same time"))
+    expect(tasks.bulk_insert(rows, chunk_size=40) == 96, "bulk_insert should return the row count")
+    for category, status in [(None, None), ("عمل", None), (None, 'completed'), ("شخصي", 'pending')]:
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = tasks.get_tasks_page(category, status, cursor, page_size=7)
+            seen.extend((row['created_at'], row['id']) for row in page)
+            expect(all((not category or row['category'] == category) and (not status or row['status'] == status)
+                       for row in page), f"filter {category}/{status} let other rows through")
+            if cursor is None:
+                break
+        expected = sum(1 for row in rows if (not category or row['category'] == category)
+                       and (not status or row['status'] == status))
+        expect(seen == sorted(seen, reverse=True), "pages should be newest first, ties by id")
+        expect(len(seen) == len(set(seen)) == expected, f"{category}/{status}: {len(seen)} rows, expected {expected}")
+    expect(tasks.get_tasks_page(category="لا يوجد")[0] == [], "an unknown category should match nothing")
+
+
+SORT_TITLES = ["أحمد", "احمد", "Beta", "alpha", "beta", "إسلام", "Zulu", "زيارة"]
+
+
+@check
+def sorted_pages(tasks):
+    # Categories sort in the order they were created (NULL first), statuses in workflow order.
+    category_rank = {None: 0, "عام": 1, "عمل": 2, "سفر": 6}
+    keys = {
+        'id': lambda row: (),
+        'title': lambda row: (db.fold_text(row['title']).lower(),),
+        'category': lambda row: (category_rank[row['category']], row['created_at']),
+        'status': lambda row: (db.STATUS_CODES[row['status']], row['created_at']),
+        'created': lambda row: (row['created_at'],),
+        'updated': lambda row: (row['updated_at'],),
+    }
+    size = 60
+    tasks.bulk_insert([{'title': SORT_TITLES[i % len(SORT_TITLES)], 'category': ["عمل", "عام", "سفر", None][i % 4],
+                        'status': db.STATUSES[i % 3], 'created_at': f"2024-01-01 10:00:{i // 3:02d}",
+                        'updated_at': f"2024-02-{1 + (i * 7) % 28:02d} 09:00:00"} for i in range(size)])
+    first = tasks.get_tasks_page(order='id_asc', page_size=1)[0][0]['id']
+    tasks.update_task(first, title="zzz")
+    rows = [tasks.get_task(task_id) for task_id in range(first, first + size)]
+    for order in db.ORDERINGS:
+        if order == 'due_asc':
+            continue
+        key, _, direction = order.rpartition('_')
+        for category, status in [(None, None), ("عمل", None), (None, 'completed'), ("عام", 'pending')]:
+            expected = [row['id'] for row in sorted(
+                (row for row in rows if (not category or row['category'] == category)
+                 and (not status or row['status'] == status)),
+                key=lambda row: keys[key](row) + (row['id'],), reverse=direction == 'desc')]
+            seen = []
+            cursor = None
+            while True:
+                page, cursor = tasks.get_tasks_page(category, status, cursor, page_size=7, order=order)
+                seen.extend(row['id'] for row in page)
+                if cursor is None:
+                    break
+            expect(seen == expected, f"{order} {category}/{status}: {seen} != {expected}")
+            for position in range(0, len(expected), 5):
+                page_number, start = tasks.locate_task(expected[position], category, status, 7, order=order)
+                expect(page_number == position // 7 + 1, f"{order}: task at {position} located on page {page_number}")
+                page, _ = tasks.get_tasks_page(category, status, start, page_size=7, order=order)
+                expect(page[0]['id'] == expected[(page_number - 1) * 7], f"{order}: located page starts elsewhere")
+                if page_number > 1:
+                    previous = tasks.previous_page_cursor(start, category, status, 7, order=order)
+                    page, _ = tasks.get_tasks_page(category, status, previous, page_size=7, order=order)
+                    expect(page[0]['id'] == expected[(page_number - 2) * 7], f"{order}: wrong previous page")
+    expect(tasks.get_tasks_page(order='updated_desc', page_size=1)[0][0]['id'] == first,
+           "an edited task should move to the top of updated_desc")
+    expect(tasks.locate_task(first, status='completed') is None, "a filtered out task has no page")
+    found = [row['id'] for row in tasks.search_tasks("beta", order='title_desc')]
+    expect(found == sorted(found, key=lambda task_id: ("beta", -task_id)) and len(found) > 1, "search in an order")
+    try:
+        tasks.get_tasks_page(order='colour_asc')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an unknown order should raise ValueError")
+
+
+@check
+def bulk_changes(tasks):
+    ids = [tasks.add_task(f"bulk {i}", "", "عمل") for i in range(10)]
+    expect(tasks.update_tasks_bulk(ids[:6] + [ids[0], 9999], status='completed') == 6, "update count")
+    expect(tasks.update_tasks_bulk(ids, category="", status="") == 0, "no changes should update nothing")
+    expect(tasks.update_tasks_bulk(ids[3:], category="شخصي") == 7, "update count")
+    expect([tasks.get_task(i)['status'] for i in ids].count('completed') == 6, "bulk status not applied")
+    expect(tasks.delete_tasks_bulk(ids[:4] + [9999]) == 4, "delete count")
+    stats = tasks.get_stats()
+    expect(stats['total'] == 6 and stats['by_category'] == {"شخصي": 6}, f"stats {stats}")
+    expect(stats['by_status'] == {'completed': 2, 'pending': 4}, f"stats {stats}")
+
+
+@check
+def search(tasks):
+    tasks.add_task("اجتماع مع أحمد", "مراجعة الميزانية", "عمل")
+    tasks.add_task("Meeting notes", "weekly team meeting", "عمل")
+    tasks.add_task("شراء مستلزمات", "اجتماع العائلة", "عائلة")
+    done = tasks.add_task("meetup", "", "شخصي")
+    tasks.update_task(done, status='completed')
+    expect(tasks.search_tasks("") == [], "an empty query should find nothing")
+    expect({row['title'] for row in tasks.search_tasks("احمد")} == {"اجتماع مع أحمد"}, "Arabic folding")
+    expect(len(tasks.search_tasks("اجتما")) == 2, "words should match as prefixes")
+    expect(len(tasks.search_tasks("meet")) == 2, "case-insensitive prefix match")
+    expect(len(tasks.search_tasks("meet", status='completed')) == 1, "status filter")
+    expect(len(tasks.search_tasks("اجتماع", category="عائلة")) == 1, "category filter")
+    expect(tasks.search_tasks("meeting team")[0]['title'] == "Meeting notes", "every word has to match")
+    rows = tasks.search_tasks("اجتماع", start_mark="[", end_mark="]")
+    expect(all("[" in row['snippet'] and "]" in row['snippet'] for row in rows), "snippets should mark hits")
+    expect(all(row['archived'] == 0 for row in rows), "live tasks are not archived")
+    expect(len(tasks.search_tasks("اجتماع", limit=1)) == 1 and len(tasks.search_tasks("اجتماع", offset=1)) == 1,
+           "limit and offset")
+
+
+def utc(hours):
+    return (datetime.utcnow() + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@check
+def due_dates(tasks):
+    late_at = utc(-2)
+    late = tasks.add_task("late", "موعد", "عمل", due_at=late_at)
+    later = tasks.add_task("later", "", "عمل", due_at=utc(-1))
+    soon = tasks.add_task("soon", "موعد", "شخصي", due_at=utc(2))
+    far = tasks.add_task("far", "", "عمل", due_at=utc(db.DUE_SOON_HOURS + 5))
+    tasks.add_task("no deadline", "موعد", "عمل")
+    done = tasks.add_task("done late", "", "عمل", due_at=utc(-3))
+    tasks.update_task(done, status='completed')
+    expect(tasks.get_task(late)['due_at'] == late_at, "due_at should be stored as given")
+    page, cursor = tasks.get_tasks_page(due='overdue')
+    expect([row['id'] for row in page] == [late, later] and cursor is None, f"overdue: {[dict(r) for r in page]}")
+    expect([row['id'] for row in tasks.get_tasks_page(due='due_soon')[0]] == [soon], "due soon")
+    expect([row['id'] for row in tasks.get_tasks_page("شخصي", due='overdue')[0]] == [], "category and due filter")
+    page, cursor = tasks.get_tasks_page(due='overdue', page_size=1)
+    expect([row['id'] for row in page] == [late], "first overdue page")
+    expect([row['id'] for row in tasks.get_tasks_page(due='overdue', cursor=cursor)[0]] == [later],
+           "overdue pages go by (due_at, id)")
+    expect({row['id'] for row in tasks.search_tasks("موعد", due='overdue')} == {late}, "search with due filter")
+    upcoming = [row['id'] for row in tasks.get_upcoming_due()]
+    expect(upcoming == [soon, far], f"upcoming deadlines in order: {upcoming}")
+    after = tasks.get_task(soon)
+    expect([row['id'] for row in tasks.get_upcoming_due((after['due_at'], soon))] == [far], "upcoming after a key")
+    tasks.update_task(far, due_at=None)
+    tasks.update_task(soon, title="still soon")
+    expect(tasks.get_task(far)['due_at'] is None and tasks.get_task(soon)['due_at'] is not None,
+           "due_at=None clears the deadline, leaving it out keeps it")
+    tasks.update_tasks_bulk([late], status='completed')
+    expect([row['id'] for row in tasks.get_tasks_page(due='overdue')[0]] == [later], "completed tasks are not due")
+    try:
+        tasks.get_tasks_page(due='someday')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an unknown due filter should raise ValueError")
+
+
+@check
+def categories_and_throughput(tasks):
+    tasks.add_task("trip", "", "سفر")
+    done = tasks.add_task("report", "", "عمل")
+    tasks.update_task(done, status='completed')
+    names = tasks.get_category_names()
+    expect(names == list(db.DEFAULT_CATEGORIES) + ["سفر"], f"categories in creation order: {names}")
+    expect(tasks.category_id("سفر") == len(names) and tasks.category_id("لا يوجد") is None, "category ids")
+    days = [(row['day'], row['created'], row['completed']) for row in tasks.get_daily_throughput(7)]
+    expect(days == [(utc(0)[:10], 2, 1)], f"daily throughput {days}")
+
+
+@check
+def compact_history_moves_on(tasks):
+    # A full batch of long histories that cannot shrink (deletes and restores never merge) comes
+    # first; the next call still has to reach the task with mergeable updates after them.
+    flipped = [tasks.add_task(f"flip {i}") for i in range(db.HISTORY_COMPACT_BATCH)]
+    with tasks.transaction():
+        for _ in range(db.HISTORY_MAX_ENTRIES // 2 + 1):
+            for task_id in flipped:
+                tasks.delete_task(task_id)
+                tasks.restore_tasks([(task_id, "flip", "", "عام", 'pending', None, None)])
+    edited = tasks.add_task("edited")
+    with tasks.transaction():
+        for i in range(4 * db.HISTORY_MAX_ENTRIES):
+            tasks.update_task(edited, title=f"edit {i}")
+    if not tasks.get_task_history(edited):
+        return
+    before = len(tasks.get_task_history(flipped[0]))
+    removed = [tasks.compact_history() for _ in range(3)]
+    history = tasks.get_task_history(edited)
+    expect(len(history) == db.HISTORY_KEEP_ENTRIES + 1, f"{len(history)} entries left after {removed}")
+    expect(history[-1]['changes']['title'] == ("edited", f"edit {4 * db.HISTORY_MAX_ENTRIES - db.HISTORY_KEEP_ENTRIES - 1}"),
+           f"merged entry {history[-1]}")
+    expect(len(tasks.get_task_history(flipped[0])) == before, "deletes and restores should stay")
+
+
+@check
+def failed_transaction_rolls_back(tasks):
+    kept = tasks.add_task("kept", "", "عمل")
+    try:
+        with tasks.transaction():
+            tasks.add_task("rolled back", "", "عمل")
+            tasks.update_task(kept, title="changed")
+            tasks.delete_task(kept)
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    expect(tasks.get_task(kept)['title'] == "kept", "rolled back changes are still visible")
+    expect(tasks.get_stats()['total'] == 1, "rolled back insert is still counted")
+    expect(tasks.search_tasks("rolled") == [], "rolled back insert is still searchable")
+    expect(tasks.add_task("next") == kept + 1, "rolled back ids should be reused like SQLite does")
+
+
+@check
+def query_worker_reports_every_failure(tasks):
+    # The table model waits for finished or failed; a fetch that raises anything must still send failed.
+    from workers import QueryWorker
+    tasks.add_task("listed")
+    for fetch, error in [(lambda: tasks.get_tasks_page(order='colour_asc'), ValueError),
+                         (lambda: tasks.get_tasks_page()[0][0]['no such column'], (IndexError, KeyError)),
+                         (lambda: len(None), TypeError)]:
+        results = []
+        worker = QueryWorker(tasks, 1, fetch, lambda generation: True)
+        worker.signals.finished.connect(lambda generation, result: results.append(('finished', result)))
+        worker.signals.failed.connect(lambda generation, message: results.append(('failed', message)))
+        worker.run()
+        expect(len(results) == 1 and results[0][0] == 'failed', f"{error}: {results}")
+    results = []
+    worker = QueryWorker(tasks, 1, lambda: tasks.get_tasks_page(), lambda generation: True)
+    worker.signals.finished.connect(lambda generation, result: results.append(len(result[0])))
+    worker.run()
+    expect(results == [1], f"a successful fetch should send finished: {results}")
+
+
+def fresh_store(engine, directory, name):
+    if engine == store.SQLiteStore.engine:
+        return store.open_store(engine, os.path.join(directory, f"{name}.db"))
+    return store.open_store(engine)
+
+
+def run_checks(engines):
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for engine in engines:
+            for func in CHECKS:
+                tasks = fresh_store(engine, directory, f"{engine}_{func.__name__}")
+                try:
+                    func(tasks)
+                except Exception:
+                    failures += 1
+                    print(f"FAIL  {engine:<8}{func.__name__}\n{traceback.format_exc()}")
+                else:
+                    print(f"ok    {engine:<8}{func.__name__}")
+                finally:
+                    tasks.close()
+    return failures
+
+
+# Benchmark: the same operations on a seeded store, then the same page through the table model.
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def seeded_store(engine, directory, size):
+    start = time.perf_counter()
+    if engine == store.SQLiteStore.engine:
+        tasks = store.open_store(engine, seed_database(os.path.join(directory, "bench.db"), size))
+    else:
+        tasks = store.open_store(engine)
+        tasks.bulk_insert(task_dicts(size))
+    return tasks, (time.perf_counter() - start) * 1000
+
+
+def storage_timings(tasks, size, repeat):
+    _, middle = tasks.get_tasks_page(page_size=size // 2)
+    added = []
+    ids = list(range(1, min(size, 1000) + 1))
+    operations = [
+        ("get_task", lambda: tasks.get_task(size // 2)),
+        ("get_tasks_page", lambda: tasks.get_tasks_page(page_size=100)),
+        ("get_tasks_page category", lambda: tasks.get_tasks_page("عمل", page_size=100)),
+        ("get_tasks_page category+status", lambda: tasks.get_tasks_page("عمل", 'completed', page_size=100)),
+        ("get_tasks_page middle", lambda: tasks.get_tasks_page(cursor=middle, page_size=100)),
+        ("get_tasks_page overdue", lambda: tasks.get_tasks_page(due='overdue', page_size=100)),
+        ("get_tasks_page by title", lambda: tasks.get_tasks_page(page_size=100, order='title_asc')),
+        ("get_tasks_page category by updated", lambda: tasks.get_tasks_page("عمل", page_size=100,
+                                                                            order='updated_desc')),
+        ("locate_task middle by title", lambda: tasks.locate_task(size // 2, page_size=500, order='title_asc')),
+        ("get_upcoming_due", lambda: tasks.get_upcoming_due()),
+        ("search_tasks meeting", lambda: tasks.search_tasks("meeting", limit=100)),
+        ("search_tasks اجتماع الفريق", lambda: tasks.search_tasks("اجتماع الفريق", limit=100)),
+        ("get_stats", tasks.get_stats),
+        ("add_task", lambda: added.append(tasks.add_task("benchmark task", "benchmark", "عمل"))),
+        ("update_task", lambda: tasks.update_task(added[0], title=f"benchmark {time.perf_counter()}")),
+        ("update_tasks_bulk 1000", lambda: tasks.update_tasks_bulk(ids, status=db.STATUSES[len(added) % 3])),
+        ("delete_task", lambda: tasks.delete_task(added.pop())),
+    ]
+    return [(name, median_ms(func, repeat)) for name, func in operations]
+
+
+def model_timings(tasks, repeat):
+    # Time until the table model shows its first chunk; minus the page query, that is the UI cost.
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from repository import TaskRepository
+    from task_model import TaskTableModel
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    repository = TaskRepository(store=tasks)
+    model = TaskTableModel(repository)
+
+    def first_chunk(**filters):
+        model.set_filters(**filters)
+        if model._loading:
+            loop = QEventLoop()
+            model.loading_changed.connect(loop.quit)
+            QTimer.singleShot(60000, loop.quit)
+            loop.exec_()
+            model.loading_changed.disconnect(loop.quit)
+        app.processEvents()
+
+    results = [("model first chunk", median_ms(first_chunk, repeat)),
+               ("model first chunk category+status",
+                median_ms(lambda: first_chunk(category="عمل", status='completed'), repeat)),
+               ("model first chunk search", median_ms(lambda: first_chunk(text="meeting"), repeat))]
+    repository.close()
+    return results
+
+
+def run_benchmark(engines, size, repeat, ui):
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for engine in engines:
+            tasks, seed_ms = seeded_store(engine, directory, size)
+            results = [("seed", seed_ms)] + storage_timings(tasks, size, repeat)
+            if ui:
+                results += model_timings(tasks, repeat)
+            tasks.close()
+            report[engine] = dict(results)
+            names = [name for name, _ in results]
+    print(f"\n{size} tasks, median of {repeat} runs\n")
+    print(f"{'operation':<36}" + "".join(f"{engine + ' ms':>14}" for engine in engines))
+    for name in names:
+        print(f"{name:<36}" + "".join(f"{report[engine][name]:>14.3f}" for engine in engines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conformance checks and benchmarks for every TaskStore engine")
+    parser.add_argument("--engines", default=",".join(store.STORE_ENGINES),
+                        help="comma-separated engines (default: %(default)s)")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--checks-only", action="store_true", help="skip the benchmark")
+    parser.add_argument("--no-ui", action="store_true", help="skip the table model timings")
+    args = parser.parse_args()
+
+    engines = args.engines.split(",")
+    failures = run_checks(engines)
+    if failures:
+        print(f"\n{failures} check(s) failed")
+        sys.exit(1)
+    if not args.checks_only:
+        run_benchmark(engines, args.tasks, args.repeat, not args.no_ui)
+
+
+if __name__ == '__main__':
+    main()
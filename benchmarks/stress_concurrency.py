@@ -0,0 +1,138 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from seed import seed_database, CATEGORIES, STATUSES
+
+
+def configure(path, legacy):
+    db.DB_PATH = path
+    if legacy:
+        # What db.py did before: rollback journal, no busy timeout and no retries.
+        db.JOURNAL_MODE = "DELETE"
+        db.BUSY_TIMEOUT_MS = 0
+        db.BUSY_RETRIES = 0
+
+
+def writer(path, legacy, worker, operations, results):
+    configure(path, legacy)
+    latencies = []
+    errors = 0
+    inserted = 0
+    for i in range(operations):
+        start = time.perf_counter()
+        try:
+            if i % 4 == 3:
+                task_id = db.add_task(f"stress {worker}-{i}", "", CATEGORIES[i % len(CATEGORIES)])
+                db.delete_task(task_id)
+            elif i % 2:
+                db.update_task(worker * operations + i + 1, status=STATUSES[i % len(STATUSES)])
+            else:
+                db.add_task(f"stress {worker}-{i}", "stress test", CATEGORIES[i % len(CATEGORIES)])
+                inserted += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    db.close_connection()
+    results.put(('writer', latencies, errors, inserted))
+
+
+def reader(path, legacy, stop, results):
+    configure(path, legacy)
+    latencies = []
+    errors = 0
+    queries = [
+        lambda: db.get_tasks_page(page_size=100),
+        lambda: db.get_tasks_page(category=CATEGORIES[1], status=STATUSES[2], page_size=100),
+        lambda: db.search_tasks("stress", limit=50),
+        db.get_stats,
+    ]
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            queries[i % len(queries)]()
+        except sqlite3.OperationalError:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+    db.close_connection()
+    results.put(('reader', latencies, errors, 0))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def check_consistency(path):
+    conn = sqlite3.connect(path)
+    tasks = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    counted = conn.execute("SELECT COALESCE(SUM(count), 0) FROM task_counts").fetchone()[0]
+    indexed = conn.execute("SELECT COUNT(*) FROM tasks_fts").fetchone()[0]
+    integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    conn.close()
+    return tasks, counted, indexed, integrity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="N writer processes against M reader processes on one tasks.db")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=500, help="writes per writer process")
+    parser.add_argument("--tasks", type=int, default=10000, help="tasks seeded before the run")
+    parser.add_argument("--legacy", action="store_true",
+                        help="rollback journal without busy timeout or retries, as db.py used to open it")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = seed_database(os.path.join(directory, "tasks.db"), args.tasks)
+        if args.legacy:
+            db.get_connection().execute("PRAGMA journal_mode = DELETE")
+        before = db.get_connection().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        db.close_connection()
+
+        results = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        readers = [multiprocessing.Process(target=reader, args=(path, args.legacy, stop, results))
+                   for _ in range(args.readers)]
+        writers = [multiprocessing.Process(target=writer, args=(path, args.legacy, i, args.operations, results))
+                   for i in range(args.writers)]
+        start = time.perf_counter()
+        for process in readers + writers:
+            process.start()
+        collected = [results.get() for _ in writers]
+        elapsed = time.perf_counter() - start
+        stop.set()
+        collected += [results.get() for _ in readers]
+        for process in readers + writers:
+            process.join()
+        tasks, counted, indexed, integrity = check_consistency(path)
+
+    mode = "legacy (rollback journal, no busy timeout)" if args.legacy else f"{db.JOURNAL_MODE}, busy timeout {db.BUSY_TIMEOUT_MS} ms"
+    print(f"{args.writers} writers x {args.operations} writes, {args.readers} readers, {mode}: {elapsed:.1f} s\n")
+    print(f"{'role':<10}{'ops':>8}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    inserted = 0
+    for role in ('writer', 'reader'):
+        latencies = sorted(value for kind, values, _, _ in collected if kind == role for value in values)
+        errors = sum(count for kind, _, count, _ in collected if kind == role)
+        inserted += sum(count for kind, _, _, count in collected if kind == role)
+        print(f"{role:<10}{len(latencies):>8}{errors:>8}{len(latencies) / elapsed:>10.0f}"
+              f"{statistics.median(latencies) if latencies else 0:>10.2f}"
+              f"{percentile(latencies, 0.99):>10.2f}{latencies[-1] if latencies else 0:>10.2f}")
+
+    expected = before + inserted
+    print(f"\ntasks {tasks} (expected {expected}), task_counts total {counted}, search index rows {indexed}, "
+          f"integrity {integrity}")
+    if tasks != expected or counted != tasks or indexed != tasks or integrity != "ok":
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
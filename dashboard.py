@@ -0,0 +1,89 @@
+from PyQt5.QtWidgets import QFrame, QHBoxLayout, QVBoxLayout, QLabel
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont
+import theme
+from task_model import STATUS_LABELS
+
+REFRESH_DELAY_MS = 300
+THROUGHPUT_DAYS = 7
+
+
+class StatCard(QFrame):
+    def __init__(self, title, color):
+        super().__init__()
+        self.setObjectName("statCard")
+        self.setStyleSheet(f"QFrame#statCard {{ border-left: 4px solid {color}; }}")
+        layout = QVBoxLayout()
+        layout.setContentsMargins(10, 6, 10, 6)
+        layout.setSpacing(2)
+        self.value_label = QLabel("0")
+        self.value_label.setFont(theme.font("Arial", 16, QFont.Bold))
+        title_label = QLabel(title)
+        title_label.setStyleSheet("color: #7f8c8d;")
+        layout.addWidget(self.value_label)
+        layout.addWidget(title_label)
+        self.setLayout(layout)
+
+    def set_value(self, value):
+        self.value_label.setText(value)
+
+
+class DashboardPanel(QFrame):
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setObjectName("dashboardFrame")
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(REFRESH_DELAY_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QHBoxLayout()
+        layout.setContentsMargins(15, 8, 15, 8)
+        layout.setSpacing(15)
+
+        self.total_card = StatCard("إجمالي المهام", "#34495e")
+        layout.addWidget(self.total_card)
+        self.status_cards = {}
+        for status, label in STATUS_LABELS.items():
+            card = StatCard(label, theme.STATUS_COLORS[status])
+            self.status_cards[status] = card
+            layout.addWidget(card)
+        self.rate_card = StatCard("نسبة الإنجاز", "#27ae60")
+        layout.addWidget(self.rate_card)
+
+        details_layout = QVBoxLayout()
+        details_layout.setSpacing(4)
+        self.categories_label = QLabel()
+        self.categories_label.setTextFormat(Qt.RichText)
+        self.throughput_label = QLabel()
+        self.throughput_label.setStyleSheet("color: #7f8c8d;")
+        details_layout.addWidget(self.categories_label)
+        details_layout.addWidget(self.throughput_label)
+        layout.addLayout(details_layout)
+        layout.addStretch()
+
+        self.setLayout(layout)
+
+    def schedule_refresh(self, *args):
+        self.refresh_timer.start()
+
+    def refresh(self):
+        stats = self.store.get_stats()
+        self.total_card.set_value(str(stats['total']))
+        for status, card in self.status_cards.items():
+            card.set_value(str(stats['by_status'].get(status, 0)))
+        self.rate_card.set_value(f"{stats['completion_rate']:.0%}")
+
+        chips = []
+        for category, count in sorted(stats['by_category'].items(), key=lambda item: -item[1]):
+            color = self.store.category_color(category) or theme.DEFAULT_COLOR
+            chips.append(f'<span style="color: {color}; font-weight: bold;">{category}</span> {count}')
+        self.categories_label.setText("&nbsp;&nbsp;".join(chips))
+
+        days = self.store.get_daily_throughput(THROUGHPUT_DAYS)
+        created = sum(day['created'] for day in days)
+        completed = sum(day['completed'] for day in days)
+        self.throughput_label.setText(f"آخر {THROUGHPUT_DAYS} أيام: {created} مهمة جديدة، {completed} مكتملة")
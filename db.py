@@ -1,114 +1,1413 @@
 import sqlite3
+import json
 import os
-from datetime import datetime
-
-DB_PATH = "tasks.db"
-
-
-def init_db():
-    if not os.path.exists(DB_PATH):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                category TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+
+# Relative paths resolve against the working directory; set TASKS_DB (or main.py --db) to move it.
+DB_PATH = os.environ.get("TASKS_DB", "tasks.db")
+
+CACHE_SIZE_KB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Several processes may share one database file. WAL lets readers run alongside the writer;
+# writers wait up to BUSY_TIMEOUT_MS for the lock, then retry with exponential backoff.
+JOURNAL_MODE = "WAL"
+BUSY_TIMEOUT_MS = 5000
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+
+# Completed tasks older than ARCHIVE_AFTER_DAYS move to a second file, attached to every
+# connection as "archive" (by default tasks_archive.db next to DB_PATH).
+ARCHIVE_PATH = None
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 1000
+VACUUM_STEP_PAGES = 1000
+
+# Called with every statement run on connections opened afterwards; set by diagnostics.enable().
+TRACE_CALLBACK = None
+
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+_local = threading.local()
+
+DEFAULT_CATEGORIES = {
+    "عام": "#3498db",
+    "عمل": "#e74c3c",
+    "دراسة": "#f39c12",
+    "صحة": "#27ae60",
+    "شخصي": "#9b59b6",
+}
+
+# Statuses are stored as these integer codes; the public API still speaks in names.
+STATUSES = ['pending', 'in_progress', 'completed']
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+COMPLETED = STATUS_CODES['completed']
+
+_category_lock = threading.Lock()
+_category_cache = None
+
+DUE_SOON_HOURS = 24
+DUE_FILTERS = ['overdue', 'due_soon']
+REMINDER_BATCH_SIZE = 1000
+
+# Task history keeps only what changed: an update records [old, new] for each changed field,
+# a delete records the row it removed, and re-inserting a deleted id records a restore.
+HISTORY_ACTIONS = ['update', 'delete', 'restore', 'archive']
+HISTORY_CODES = {action: code for code, action in enumerate(HISTORY_ACTIONS)}
+HISTORY_FIELDS = ['title', 'description', 'category_id', 'status']
+
+# compact_history() merges runs of old updates once a task has more than HISTORY_MAX_ENTRIES,
+# keeping the newest HISTORY_KEEP_ENTRIES as they are, and drops the history of tasks that
+# were deleted more than HISTORY_RETENTION_DAYS ago. Each call looks at HISTORY_COMPACT_BATCH
+# long histories after the task id the previous call stopped at.
+HISTORY_MAX_ENTRIES = 50
+HISTORY_KEEP_ENTRIES = 20
+HISTORY_RETENTION_DAYS = 90
+HISTORY_COMPACT_BATCH = 50
+
+# Arabic diacritics (harakat, superscript alef) and tatweel are dropped, and letter
+# variants are folded, so "أحمد" / "احمد" and "كَتَبَ" / "كتب" index to the same token.
+ARABIC_FOLDING = [(chr(code), "") for code in range(0x064B, 0x0653)] + [
+    ("\u0670", ""),
+    ("\u0640", ""),
+    ("أ", "ا"),
+    ("إ", "ا"),
+    ("آ", "ا"),
+    ("ٱ", "ا"),
+    ("ى", "ي"),
+    ("ة", "ه"),
+]
+
+
+def _configure_connection(conn):
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    # Only takes effect while a file is still empty; vacuum() converts an existing database.
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(),))
+    conn.execute("PRAGMA archive.auto_vacuum = INCREMENTAL")
+    conn.execute(f"PRAGMA archive.journal_mode = {JOURNAL_MODE}")
+    if TRACE_CALLBACK is not None:
+        conn.set_trace_callback(TRACE_CALLBACK)
+
+
+def archive_path():
+    if ARCHIVE_PATH:
+        return ARCHIVE_PATH
+    if DB_PATH == ":memory:":
+        return ":memory:"
+    root, _ = os.path.splitext(DB_PATH)
+    return f"{root}_archive.db"
+
+
+def get_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == DB_PATH:
+        return conn
+    close_connection()
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, timeout=BUSY_TIMEOUT_MS / 1000)
+    _configure_connection(conn)
+    _local.conn = conn
+    _local.path = DB_PATH
+    _local.depth = 0
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction():
+    conn = get_connection()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+    
+    # Take the write lock up front so concurrent writers wait for it instead of failing mid-transaction.
+    conn.execute("BEGIN IMMEDIATE")
+    _local.depth = 1
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        # Categories created inside the rolled back transaction may already be cached.
+        invalidate_categories()
+        raise
+    finally:
+        _local.depth = 0
+
+
+def is_busy(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+
+def run_with_retry(func, *args, **kwargs):
+    delay = BUSY_BACKOFF
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            # Inside an outer transaction the caller owns the retry, since the whole transaction has to rerun.
+            if attempt == BUSY_RETRIES or getattr(_local, 'depth', 0) or not is_busy(e):
+                raise
+        time.sleep(delay * (1 + random.random()))
+        delay *= 2
+
+
+def retry_on_busy(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_with_retry(func, *args, **kwargs)
+    return wrapper
+
+
+def data_version():
+    # Changes whenever another connection, in this process or another one, commits.
+    return get_connection().execute('PRAGMA data_version').fetchone()[0]
+
+
+def change_counter():
+    # Goes up with every committed change to tasks or categories, from any connection.
+    return get_connection().execute('SELECT value FROM change_counter WHERE id = 0').fetchone()[0]
+
+
+def _create_base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            color TEXT NOT NULL DEFAULT '#95a5a6'
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO categories (name, color) VALUES (?, ?) ON CONFLICT (name) DO NOTHING',
+        DEFAULT_CATEGORIES.items())
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            category_id INTEGER REFERENCES categories (id),
+            status INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _normalize_categories(conn):
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(tasks)')]
+    if 'category' not in columns:
+        return
+    
+    # Older databases stored the category name and status string on every row.
+    conn.execute('''
+        INSERT INTO categories (name) SELECT DISTINCT category FROM tasks WHERE category != ''
+        ON CONFLICT (name) DO NOTHING
+    ''')
+    conn.execute('''
+        CREATE TABLE tasks_normalized (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            category_id INTEGER REFERENCES categories (id),
+            status INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(f'''
+        INSERT INTO tasks_normalized (id, title, description, category_id, status, created_at, updated_at)
+        SELECT t.id, t.title, t.description, c.id, {_status_code_sql("t.status")}, t.created_at, t.updated_at
+        FROM tasks t LEFT JOIN categories c ON c.name = t.category
+    ''')
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+    # Dropping the table also drops its old indexes and triggers; they are recreated below.
+    conn.execute('DROP TABLE tasks')
+    conn.execute('ALTER TABLE tasks_normalized RENAME TO tasks')
+    if sequence is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'tasks'", (sequence['seq'],))
+    conn.execute('DROP TABLE IF EXISTS task_counts')
+
+
+def _create_index(conn, name, columns, where=None):
+    sql = f'CREATE INDEX IF NOT EXISTS {name} ON tasks ({columns})'
+    if where is not None:
+        sql += f' WHERE {where}'
+    # Building an index reads every task, so on an existing database it is only recorded here
+    # and built after startup by build_index, one index per transaction. Queries use the other
+    # indexes until then.
+    if conn.execute('SELECT 1 FROM tasks LIMIT 1').fetchone() is None:
+        conn.execute(sql)
+    else:
+        conn.execute('INSERT OR REPLACE INTO pending_indexes (name, sql) VALUES (?, ?)', (name, sql))
+
+
+def _create_filter_indexes(conn):
+    _create_index(conn, 'idx_tasks_created', 'created_at')
+    _create_index(conn, 'idx_tasks_category_created', 'category_id, created_at')
+    _create_index(conn, 'idx_tasks_status_created', 'status, created_at')
+    _create_index(conn, 'idx_tasks_category_status_created', 'category_id, status, created_at')
+
+
+def _create_search_index(conn):
+    has_search_index = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'").fetchone()
+    if not has_search_index:
+        conn.execute('''
+            CREATE VIRTUAL TABLE tasks_fts USING fts5(
+                title,
+                description,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
             )
         ''')
-        conn.commit()
-        conn.close()
+    
+    title = _fold_sql("new.title")
+    description = _fold_sql("new.description")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, {title}, {description});
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+            UPDATE tasks_fts SET title = {title}, description = {description} WHERE rowid = new.id;
+        END
+    ''')
+    
+    return not has_search_index
+
+
+def _create_stats_tables(conn):
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_counts'").fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_counts (
+            category_id INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (category_id, status)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_daily (
+            day TEXT PRIMARY KEY,
+            created INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_stats_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO task_counts (category_id, status, count)
+            VALUES (COALESCE(new.category_id, 0), new.status, 1)
+            ON CONFLICT (category_id, status) DO UPDATE SET count = count + 1;
+            INSERT INTO task_daily (day, created) VALUES (date(new.created_at), 1)
+            ON CONFLICT (day) DO UPDATE SET created = created + 1;
+            INSERT INTO task_daily (day, completed) SELECT date(new.updated_at), 1 WHERE new.status = {COMPLETED}
+            ON CONFLICT (day) DO UPDATE SET completed = completed + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS task_stats_delete AFTER DELETE ON tasks BEGIN
+            UPDATE task_counts SET count = count - 1
+            WHERE category_id = COALESCE(old.category_id, 0) AND status = old.status;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_stats_update AFTER UPDATE OF category_id, status ON tasks
+        WHEN old.category_id IS NOT new.category_id OR old.status IS NOT new.status BEGIN
+            UPDATE task_counts SET count = count - 1
+            WHERE category_id = COALESCE(old.category_id, 0) AND status = old.status;
+            INSERT INTO task_counts (category_id, status, count)
+            VALUES (COALESCE(new.category_id, 0), new.status, 1)
+            ON CONFLICT (category_id, status) DO UPDATE SET count = count + 1;
+            INSERT INTO task_daily (day, completed)
+            SELECT date(new.updated_at), 1 WHERE new.status = {COMPLETED} AND old.status != {COMPLETED}
+            ON CONFLICT (day) DO UPDATE SET completed = completed + 1;
+            UPDATE task_daily SET completed = completed - 1
+            WHERE day = date(old.updated_at) AND old.status = {COMPLETED} AND new.status != {COMPLETED};
+        END
+    ''')
+    
+    if not has_stats:
+        rebuild_stats()
+
+
+def rebuild_stats():
+    with transaction() as conn:
+        conn.execute('DELETE FROM task_counts')
+        conn.execute('DELETE FROM task_daily')
+        conn.execute('''
+            INSERT INTO task_counts (category_id, status, count)
+            SELECT COALESCE(category_id, 0), status, COUNT(*) FROM tasks GROUP BY 1, 2
+        ''')
+        conn.execute(f'''
+            INSERT INTO task_daily (day, created, completed)
+            SELECT day, SUM(created), SUM(completed) FROM (
+                SELECT date(created_at) AS day, 1 AS created, 0 AS completed FROM tasks
+                UNION ALL
+                SELECT date(updated_at), 0, 1 FROM tasks WHERE status = {COMPLETED}
+            ) GROUP BY day
+        ''')
+
+
+def _create_history_log(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_history (
+            id INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            action INTEGER NOT NULL,
+            changes TEXT NOT NULL DEFAULT '{}',
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # One task's history is a range scan of this index; ids grow with time, so it comes back in order.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_task_history_task ON task_history (task_id, id)')
+    conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_task_history_deleted ON task_history (changed_at)
+        WHERE action = {HISTORY_CODES['delete']}
+    ''')
+
+    changed = " UNION ALL ".join(
+        f"SELECT '{field}' AS field, json_array(old.{field}, new.{field}) AS value "
+        f"WHERE old.{field} IS NOT new.{field}"
+        for field in HISTORY_FIELDS)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_history_update AFTER UPDATE ON tasks
+        WHEN {" OR ".join(f"old.{field} IS NOT new.{field}" for field in HISTORY_FIELDS)} BEGIN
+            INSERT INTO task_history (task_id, action, changes)
+            SELECT new.id, {HISTORY_CODES['update']}, json_group_object(field, json(value)) FROM ({changed});
+        END
+    ''')
+    removed = ", ".join(f"'{field}', old.{field}" for field in HISTORY_FIELDS + ['created_at'])
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_history_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO task_history (task_id, action, changes)
+            VALUES (old.id, {HISTORY_CODES['delete']}, json_object({removed}));
+        END
+    ''')
+    # New tasks are not logged (created_at already says when); only a deleted id coming back is.
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_history_restore AFTER INSERT ON tasks
+        WHEN EXISTS (SELECT 1 FROM task_history WHERE task_id = new.id) BEGIN
+            INSERT INTO task_history (task_id, action) VALUES (new.id, {HISTORY_CODES['restore']});
+        END
+    ''')
+
+
+def _create_archive_moves(conn):
+    # Ids being moved to the archive in the current transaction. Their removal from tasks is
+    # logged as an archive, not as a delete, and the table is empty again before commit.
+    conn.execute('CREATE TABLE IF NOT EXISTS archive_moves (id INTEGER PRIMARY KEY)')
+    conn.execute('DROP TRIGGER IF EXISTS task_history_delete')
+    removed = ", ".join(f"'{field}', old.{field}" for field in HISTORY_FIELDS + ['created_at'])
+    conn.execute(f'''
+        CREATE TRIGGER task_history_delete AFTER DELETE ON tasks
+        WHEN NOT EXISTS (SELECT 1 FROM archive_moves WHERE id = old.id) BEGIN
+            INSERT INTO task_history (task_id, action, changes)
+            VALUES (old.id, {HISTORY_CODES['delete']}, json_object({removed}));
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_history_archive AFTER DELETE ON tasks
+        WHEN EXISTS (SELECT 1 FROM archive_moves WHERE id = old.id) BEGIN
+            INSERT INTO task_history (task_id, action) VALUES (old.id, {HISTORY_CODES['archive']});
+        END
+    ''')
+
+
+def _create_archive_tables(conn):
+    # The archive is a separate file, so it is checked on every start rather than versioned.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.tasks (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            category_id INTEGER,
+            status INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            due_at TIMESTAMP
+        )
+    ''')
+    if 'due_at' not in [row['name'] for row in conn.execute('PRAGMA archive.table_info(tasks)')]:
+        conn.execute('ALTER TABLE archive.tasks ADD COLUMN due_at TIMESTAMP')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS archive.tasks_fts USING fts5(
+            title,
+            description,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS archive.tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, {_fold_sql("new.title")}, {_fold_sql("new.description")});
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS archive.tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.id;
+        END
+    ''')
+
+
+def _status_code_sql(expression):
+    cases = " ".join(f"WHEN '{status}' THEN {code}" for status, code in STATUS_CODES.items())
+    return f"CASE {expression} {cases} ELSE 0 END"
+
+
+def _status_name_sql(expression):
+    cases = " ".join(f"WHEN {code} THEN '{status}'" for status, code in STATUS_CODES.items())
+    return f"CASE {expression} {cases} END"
+
+
+# Rows keep their old shape (category name, status string) so callers never see the codes.
+TASK_COLUMNS = f'''t.id, t.title, t.description, c.name AS category, {_status_name_sql("t.status")} AS status,
+    t.created_at, t.updated_at, t.due_at'''
+TASK_SOURCE = "tasks t LEFT JOIN categories c ON c.id = t.category_id"
+
+
+def _load_categories():
+    global _category_cache
+    with _category_lock:
+        if _category_cache is None or _category_cache[0] != DB_PATH:
+            rows = get_connection().execute('SELECT id, name, color FROM categories ORDER BY id').fetchall()
+            _category_cache = (DB_PATH, {row['name']: (row['id'], row['color']) for row in rows})
+        return _category_cache[1]
+
+
+def invalidate_categories():
+    global _category_cache
+    with _category_lock:
+        _category_cache = None
+
+
+def category_id(name, create=False):
+    category = _load_categories().get(name)
+    if category is not None:
+        return category[0]
+    # A miss may be a category added by another thread or process since the cache was filled.
+    conn = get_connection()
+    if create:
+        conn.execute('INSERT INTO categories (name) VALUES (?) ON CONFLICT (name) DO NOTHING', (name,))
+    row = conn.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()
+    if row is None:
+        return None
+    invalidate_categories()
+    return row['id']
+
+
+def status_code(status):
+    if status not in STATUS_CODES:
+        raise ValueError(f"Unknown task status: {status}")
+    return STATUS_CODES[status]
+
+
+def category_name(category):
+    for name, (id_, _) in _load_categories().items():
+        if id_ == category:
+            return name
+    return None
+
+
+def get_category_names():
+    return list(_load_categories())
+
+
+def category_color(name):
+    category = _load_categories().get(name)
+    return category[1] if category is not None else None
+
+
+@retry_on_busy
+def set_category_color(name, color):
+    get_connection().execute('UPDATE categories SET color = ? WHERE id = ?', (color, category_id(name, create=True)))
+    invalidate_categories()
+
+
+def _fold_sql(expression):
+    for source, target in ARABIC_FOLDING:
+        expression = f"replace({expression}, '{source}', '{target}')"
+    return expression
+
+
+def fold_text(text):
+    for source, target in ARABIC_FOLDING:
+        text = text.replace(source, target)
+    return text
+
+
+def rebuild_search_index():
+    with transaction() as conn:
+        conn.execute('DELETE FROM tasks_fts')
+        conn.execute(f'''
+            INSERT INTO tasks_fts (rowid, title, description)
+            SELECT id, {_fold_sql("title")}, {_fold_sql("description")} FROM tasks
+        ''')
+
+
+def _add_due_dates(conn):
+    if 'due_at' not in [row['name'] for row in conn.execute('PRAGMA table_info(tasks)')]:
+        conn.execute('ALTER TABLE tasks ADD COLUMN due_at TIMESTAMP')
+    # Only open tasks with a deadline are indexed, so the reminder and overdue queries read
+    # just those rows however many tasks have none or are done.
+    _create_index(conn, 'idx_tasks_due', 'due_at', f'due_at IS NOT NULL AND status != {COMPLETED}')
+
+
+def _create_sort_indexes(conn):
+    # Each column sort gets an index, and one more led by category_id for the category filter.
+    # The status sorts already have the (status, created_at) indexes, and under a status filter
+    # the sort's own index is read and the status checked per row (see _task_filters). Indexes
+    # on expressions repeat SORT_TERMS exactly, the title ones folded and case-insensitive like
+    # the title sort.
+    title = f'{_fold_sql("title")} COLLATE NOCASE'
+    for name, columns in [
+        ('idx_tasks_title', title),
+        ('idx_tasks_category_title', f'category_id, {title}'),
+        ('idx_tasks_category_sort', 'IFNULL(category_id, 0), created_at'),
+        ('idx_tasks_updated', 'updated_at'),
+        ('idx_tasks_category_updated', 'category_id, updated_at'),
+    ]:
+        _create_index(conn, name, columns)
+
+
+def _create_change_counter(conn):
+    # One row counting every change to tasks and categories, committed with the change itself,
+    # so a reader gets the counter and the rows it describes from the same snapshot.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            value INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO change_counter (id, value) VALUES (0, 0)')
+    for table in ['tasks', 'categories']:
+        for event in ['INSERT', 'UPDATE', 'DELETE']:
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE change_counter SET value = value + 1 WHERE id = 0;
+                END
+            ''')
+
+
+def _backfill_search_index(conn, start, end):
+    conn.execute(f'''
+        INSERT INTO tasks_fts (rowid, title, description)
+        SELECT id, {_fold_sql("title")}, {_fold_sql("description")} FROM tasks
+        WHERE id > ? AND id <= ?
+    ''', (start, end))
+
+
+# Steps run once each, in order, and PRAGMA user_version records the last one applied.
+# A step with a backfill returns True when existing rows still need it; the backfill then
+# runs after startup in bounded batches of task ids (see backfill_batch).
+MIGRATIONS = [
+    (1, _create_base_tables, None),
+    (2, _normalize_categories, None),
+    (3, _create_filter_indexes, None),
+    (4, _create_search_index, _backfill_search_index),
+    (5, _create_stats_tables, None),
+    (6, _create_history_log, None),
+    (7, _create_archive_moves, None),
+    (8, _add_due_dates, None),
+    (9, _create_sort_indexes, None),
+    (10, _create_change_counter, None),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+BACKFILLS = {version: backfill for version, _, backfill in MIGRATIONS if backfill is not None}
+# Steps whose work grows with the number of tasks; init_db(defer=True) leaves them to apply_migration.
+LARGE_STEPS = {2, 5}
+
+BACKFILL_BATCH_SIZE = 2000
+BACKFILL_PAUSE = 0.01
+
+
+def schema_version():
+    return get_connection().execute('PRAGMA user_version').fetchone()[0]
+
+
+def _apply_migration(conn, version):
+    apply, backfill = next((apply, backfill) for step, apply, backfill in MIGRATIONS if step == version)
+    if apply(conn) and backfill is not None:
+        target = conn.execute('SELECT MAX(id) FROM tasks').fetchone()[0]
+        if target:
+            conn.execute('INSERT INTO migration_backfills (version, target) VALUES (?, ?)', (version, target))
+    conn.execute(f'PRAGMA user_version = {version}')
+
+
+@retry_on_busy
+def init_db(defer=False):
+    # With defer, a large step on existing tasks and every step after it are left for
+    # apply_migration, new indexes for build_index and backfills for backfill_batch, so the caller
+    # can run them in the background.
+    with transaction() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS migration_backfills (
+                version INTEGER PRIMARY KEY,
+                position INTEGER NOT NULL DEFAULT 0,
+                target INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pending_indexes (
+                name TEXT PRIMARY KEY,
+                sql TEXT NOT NULL
+            )
+        ''')
+        current = schema_version()
+        if current > SCHEMA_VERSION:
+            raise RuntimeError(f"Database schema version {current} is newer than this application ({SCHEMA_VERSION})")
+        for version, _, _ in MIGRATIONS:
+            if version <= current:
+                continue
+            if defer and version in LARGE_STEPS and conn.execute('SELECT 1 FROM tasks LIMIT 1').fetchone():
+                break
+            _apply_migration(conn, version)
+        _create_archive_tables(conn)
+    invalidate_categories()
+    if not defer:
+        for name in pending_indexes():
+            build_index(name)
+        # Without a background runner to finish them, backfills run here, in batches.
+        run_backfills(pause=0)
+
+
+def pending_migrations():
+    current = schema_version()
+    return [version for version, _, _ in MIGRATIONS if version > current]
+
+
+@retry_on_busy
+def apply_migration(version):
+    with transaction() as conn:
+        # Another process may have upgraded the database in the meantime.
+        if schema_version() < version:
+            _apply_migration(conn, version)
+    invalidate_categories()
+    return version
+
+
+def pending_indexes():
+    return [row['name'] for row in get_connection().execute('SELECT name FROM pending_indexes ORDER BY rowid')]
 
 
-def add_task(title, description="", category="عام"):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO tasks (title, description, category, status)
-        VALUES (?, ?, ?, 'pending')
-    ''', (title, description, category))
-    conn.commit()
-    task_id = cursor.lastrowid
-    conn.close()
-    return task_id
+@retry_on_busy
+def build_index(name):
+    with transaction() as conn:
+        row = conn.execute('SELECT sql FROM pending_indexes WHERE name = ?', (name,)).fetchone()
+        if row is not None:
+            conn.execute(row['sql'])
+            conn.execute('DELETE FROM pending_indexes WHERE name = ?', (name,))
+    return name
+
+
+def pending_backfills():
+    return get_connection().execute(
+        'SELECT version, position, target FROM migration_backfills ORDER BY version').fetchall()
+
+
+@retry_on_busy
+def backfill_batch(version, position, target, batch_size=BACKFILL_BATCH_SIZE):
+    end = min(position + batch_size, target)
+    with transaction() as conn:
+        BACKFILLS[version](conn, position, end)
+        # The position commits with the batch, so an interrupted backfill resumes where it stopped.
+        if end < target:
+            conn.execute('UPDATE migration_backfills SET position = ? WHERE version = ?', (end, version))
+        else:
+            conn.execute('DELETE FROM migration_backfills WHERE version = ?', (version,))
+    return end
+
+
+def run_backfills(progress=None, batch_size=BACKFILL_BATCH_SIZE, pause=BACKFILL_PAUSE):
+    for version, position, target in pending_backfills():
+        while position < target:
+            position = backfill_batch(version, position, target, batch_size)
+            if progress:
+                progress(version, position, target)
+            time.sleep(pause)
+
+
+@retry_on_busy
+def add_task(title, description="", category="عام", due_at=None, status='pending'):
+    conn = get_connection()
+    cursor = conn.execute('''
+        INSERT INTO tasks (title, description, category_id, status, due_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (title, description, category_id(category, create=True) if category else None, status_code(status), due_at))
+    return cursor.lastrowid
+
+
+TASK_FIELDS = ['title', 'description', 'category', 'status', 'created_at', 'updated_at', 'due_at']
+
+BULK_CHUNK_SIZE = 10000
+
+
+def bulk_insert(tasks, chunk_size=BULK_CHUNK_SIZE, progress=None):
+    conn = get_connection()
+    query = '''
+        INSERT INTO tasks (title, description, category_id, status, created_at, updated_at, due_at)
+        VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP), ?)
+    '''
+    tasks = iter(tasks)
+    total = 0
+    while True:
+        chunk = list(zip(range(chunk_size), tasks))
+        if not chunk:
+            break
+        run_with_retry(_insert_chunk, conn, query, [task for _, task in chunk])
+        total += len(chunk)
+        if progress:
+            progress(total)
+    return total
+
+
+def _insert_chunk(conn, query, tasks):
+    with transaction():
+        conn.executemany(query, [_insert_params(task) for task in tasks])
+
+
+def _insert_params(task):
+    category = task.get('category')
+    return (
+        task.get('title'),
+        task.get('description'),
+        category_id(category, create=True) if category else None,
+        status_code(task.get('status') or 'pending'),
+        task.get('created_at'),
+        task.get('updated_at'),
+        task.get('due_at'),
+    )
+
+
+def iter_tasks(batch_size=1000):
+    cursor = get_connection().execute(f'SELECT {TASK_COLUMNS} FROM {TASK_SOURCE} ORDER BY t.id')
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def get_task(task_id):
+    return get_connection().execute(f'SELECT {TASK_COLUMNS} FROM {TASK_SOURCE} WHERE t.id = ?', (task_id,)).fetchone()
 
 
 def get_all_tasks():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tasks ORDER BY created_at DESC')
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    return query_tasks()
 
 
 def get_tasks_by_category(category):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tasks WHERE category = ? ORDER BY created_at DESC', (category,))
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    return query_tasks(category=category)
 
 
 def get_tasks_by_status(status):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC', (status,))
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    return query_tasks(status=status)
+
+
+# The sortable columns: each orders by its terms and then t.id, so every row has one place and a
+# page can resume after the last row's values. _create_sort_indexes and the filter indexes hold
+# them in that order. Titles compare Arabic-folded, like search, and ignore ASCII case.
+SORT_TERMS = {
+    'id': [],
+    'title': [f"{_fold_sql('t.title')} COLLATE NOCASE"],
+    'category': ['IFNULL(t.category_id, 0)', 't.created_at'],
+    'status': ['t.status', 't.created_at'],
+    'created': ['t.created_at'],
+    'updated': ['t.updated_at'],
+}
+SORTS = list(SORT_TERMS)
+
+ORDERINGS = {f"{key}_{direction}": (terms, direction == 'desc')
+             for key, terms in SORT_TERMS.items() for direction in ('asc', 'desc')}
+# Only the due filters use it: idx_tasks_due holds just the tasks that have a deadline.
+ORDERINGS['due_asc'] = (['t.due_at'], False)
+# The leading sort terms that have an index led by the filter column: (category_id, ...) for the
+# created, title, updated and status orders, (status, created_at) for the created order.
+CATEGORY_INDEXED = {'t.created_at', SORT_TERMS['title'][0], 't.updated_at', 't.status'}
+STATUS_INDEXED = {'t.created_at'}
+
+
+def ordering(order, due=None, category=None, status=None):
+    order = order or ('due_asc' if due else 'created_desc')
+    if order not in ORDERINGS:
+        raise ValueError(f"Unknown task ordering: {order}")
+    terms, descending = ORDERINGS[order]
+    # A term the filters hold constant would only keep SQLite off the filter's index.
+    fixed = {SORT_TERMS['category'][0]: category, SORT_TERMS['status'][0]: status}
+    return [term for term in terms if not fixed.get(term)], descending
+
+
+def _order_sql(terms, descending):
+    direction = " DESC" if descending else ""
+    return ", ".join(term + direction for term in terms + ['t.id'])
+
+
+def _sort_columns(terms):
+    return "".join(f", {term} AS sort_{i}" for i, term in enumerate(terms))
+
+
+def _row_key(row, terms):
+    return tuple(row[f'sort_{i}'] for i in range(len(terms))) + (row['id'],)
+
+
+def _after_key(terms, descending, key):
+    # Rows after the (terms..., id) values `key` in this order. The leading term also gets a bound
+    # of its own: SQLite seeks an expression index on that, but not on a row value.
+    columns = terms + ['t.id']
+    op = '<' if descending else '>'
+    conditions = [f"({', '.join(columns)}) {op} ({', '.join('?' * len(columns))})"]
+    params = list(key)
+    if terms:
+        conditions.insert(0, f"{terms[0]} {op}= ?")
+        params.insert(0, key[0])
+    return conditions, params
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _due_conditions(due):
+    # Repeats the WHERE of idx_tasks_due word for word, so SQLite can use the partial index.
+    if due not in DUE_FILTERS:
+        raise ValueError(f"Unknown due filter: {due}")
+    conditions = ["t.due_at IS NOT NULL", f"t.status != {COMPLETED}"]
+    if due == 'overdue':
+        conditions.append("t.due_at < datetime('now')")
+    else:
+        conditions.append(f"t.due_at >= datetime('now') AND t.due_at < datetime('now', '+{DUE_SOON_HOURS} hours')")
+    return conditions
+
+
+def due_state(due_at, status, now=None):
+    # 'overdue', 'due_soon' or None for one task, by the same rules as the due filters.
+    if not due_at or status == 'completed':
+        return None
+    now = now or datetime.utcnow()
+    if due_at < now.strftime("%Y-%m-%d %H:%M:%S"):
+        return 'overdue'
+    if due_at < (now + timedelta(hours=DUE_SOON_HOURS)).strftime("%Y-%m-%d %H:%M:%S"):
+        return 'due_soon'
+    return None
+
+
+def _task_filters(category=None, status=None, due=None, terms=None):
+    # With the order's terms, a filter no index serves together with that order is written with a
+    # unary +, so SQLite reads the order's index and checks the filter per row. The app never runs
+    # ANALYZE, and without sqlite_stat1 SQLite would rather read the filter's index and sort.
+    lead = None if terms is None else terms[0] if terms else 't.id'
+    
+    def column(name, indexed):
+        return name if lead is None or lead in indexed else f"+{name}"
+    
+    conditions = []
+    params = []
+    if category:
+        # Unknown names match nothing rather than everything.
+        conditions.append(f"{column('t.category_id', CATEGORY_INDEXED)} = ?")
+        params.append(category_id(category) or -1)
+    if status:
+        conditions.append(f"{column('t.status', STATUS_INDEXED)} = ?")
+        params.append(status_code(status))
+    if due:
+        conditions.extend(_due_conditions(due))
+    return conditions, params
+
+
+def query_tasks(category=None, status=None, text=None, limit=None, offset=None, order='created_desc', due=None):
+    terms, descending = ordering(order, due, category, status)
+    
+    conditions, params = _task_filters(category, status, due, terms)
+    if text:
+        pattern = "%" + _escape_like(text) + "%"
+        conditions.append("(t.title LIKE ? ESCAPE '\\' OR t.description LIKE ? ESCAPE '\\')")
+        params.extend([pattern, pattern])
+    
+    query = f"SELECT {TASK_COLUMNS} FROM {TASK_SOURCE}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + _order_sql(terms, descending)
+    if limit is not None or offset:
+        query += " LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset or 0])
+    
+    return get_connection().execute(query, params).fetchall()
+
+
+def get_tasks_page(category=None, status=None, cursor=None, page_size=50, due=None, order=None):
+    # Keyset pages in one of ORDERINGS: newest first unless asked otherwise, nearest deadline first
+    # under a due filter. The cursor is the last row's sort values and id, so every page, the last
+    # one too, is a range read from the order's index.
+    terms, descending = ordering(order, due, category, status)
+    conditions, params = _task_filters(category, status, due, terms)
+    if cursor is not None:
+        after, after_params = _after_key(terms, descending, cursor)
+        conditions += after
+        params += after_params
+    
+    query = f"SELECT {TASK_COLUMNS}{_sort_columns(terms)} FROM {TASK_SOURCE}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {_order_sql(terms, descending)} LIMIT ?"
+    params.append(page_size + 1)
+    
+    tasks = get_connection().execute(query, params).fetchall()
+    if len(tasks) <= page_size:
+        return tasks, None
+    tasks = tasks[:page_size]
+    return tasks, _row_key(tasks[-1], terms)
+
+
+def _key_before(key, terms, descending, conditions, params, offset):
+    # The sort key of the row `offset` places before `key` (0 is the row right before it), read
+    # backwards through the same index, or None when there are not that many rows.
+    before, before_params = _after_key(terms, not descending, key)
+    row = get_connection().execute(f'''
+        SELECT {", ".join(terms + ["t.id"])} FROM tasks t WHERE {" AND ".join(conditions + before)}
+        ORDER BY {_order_sql(terms, not descending)} LIMIT 1 OFFSET ?
+    ''', params + before_params + [offset]).fetchone()
+    return None if row is None else tuple(row)
 
 
-def update_task(task_id, title="", description="", category="", status=""):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def locate_task(task_id, category=None, status=None, page_size=50, due=None, order=None):
+    # The page of this listing a task is on and the cursor that starts it, so a re-sorted view can
+    # open where the task now is; None when the filters leave it out. Counting the rows before it
+    # reads them from the index, which is the one cost here that grows with the position.
+    terms, descending = ordering(order, due, category, status)
+    conditions, params = _task_filters(category, status, due, terms)
+    conn = get_connection()
+    key = conn.execute(f'''
+        SELECT {", ".join(terms + ["t.id"])} FROM tasks t WHERE {" AND ".join(["t.id = ?"] + conditions)}
+    ''', [task_id] + params).fetchone()
+    if key is None:
+        return None
+    key = tuple(key)
+    # Counted as two index ranges, rows that sort before on the leading value and ties on it, so
+    # SQLite counts index entries instead of computing the sort expressions for every row.
+    op = '>' if descending else '<'
+    ranges = [([f"t.id {op} ?"], [key[0]])] if not terms else [
+        ([f"{terms[0]} {op} ?"], [key[0]]),
+        ([f"{terms[0]} = ?", f"({', '.join(terms[1:] + ['t.id'])}) {op} ({', '.join('?' * len(terms))})"], list(key)),
+    ]
+    count = sum(conn.execute(f"SELECT COUNT(*) FROM tasks t WHERE {' AND '.join(conditions + extra)}",
+                             params + extra_params).fetchone()[0] for extra, extra_params in ranges)
+    page, position = divmod(count, page_size)
+    if page == 0:
+        return 1, None
+    return page + 1, _key_before(key, terms, descending, conditions, params, position)
+
+
+def previous_page_cursor(cursor, category=None, status=None, page_size=50, due=None, order=None):
+    # For a page that starts after `cursor`, the cursor of the page before it: the row page_size
+    # places back from that page's last row. None when the page before is the first one.
+    terms, descending = ordering(order, due, category, status)
+    conditions, params = _task_filters(category, status, due, terms)
+    return _key_before(tuple(cursor), terms, descending, conditions, params, page_size - 1)
+
+
+def get_upcoming_due(after=None, limit=REMINDER_BATCH_SIZE):
+    # The next open deadlines after the (due_at, id) key `after`, or after now, in order.
+    if after is None:
+        query = "t.due_at > datetime('now')"
+        params = []
+    else:
+        query = "(t.due_at, t.id) > (?, ?)"
+        params = list(after)
+    return get_connection().execute(f'''
+        SELECT t.id, t.due_at FROM tasks t
+        WHERE t.due_at IS NOT NULL AND t.status != {COMPLETED} AND {query}
+        ORDER BY t.due_at, t.id LIMIT ?
+    ''', params + [limit]).fetchall()
+
+
+def _match_expression(query):
+    terms = []
+    for word in fold_text(query).split():
+        word = word.replace('"', '')
+        if word:
+            terms.append(f'"{word}"*')
+    return " ".join(terms)
+
+
+def search_tasks(query, category=None, status=None, limit=50, offset=0, start_mark="<b>", end_mark="</b>",
+                 include_archive=False, due=None, order=None):
+    # Best matches first, or in one of ORDERINGS when given (offset paging either way).
+    match = _match_expression(query)
+    if not match:
+        return []
     
+    filters, filter_params = _task_filters(category, status, due)
+    conditions = ["f.tasks_fts MATCH ?"] + filters
+    order_by = "rank"
+    sort_columns = ""
+    if order:
+        terms, descending = ordering(order, due, category, status)
+        sort_columns = _sort_columns(terms + ['t.id'])
+        order_by = ", ".join(f"sort_{i}{' DESC' if descending else ''}" for i in range(len(terms) + 1))
+    # Archived tasks are searched only when asked for; each row says where it came from.
+    schemas = ['main', 'archive'] if include_archive else ['main']
+    selects = [f'''
+        SELECT {TASK_COLUMNS}, {schema == 'archive':d} AS archived,
+               snippet(f.tasks_fts, -1, ?, ?, '…', 12) AS snippet,
+               bm25(f.tasks_fts, 10.0, 1.0) AS rank{sort_columns}
+        FROM {schema}.tasks_fts f
+        JOIN {schema}.tasks t ON t.id = f.rowid
+        LEFT JOIN main.categories c ON c.id = t.category_id
+        WHERE {" AND ".join(conditions)}
+    ''' for schema in schemas]
+    params = [start_mark, end_mark, match] + filter_params
+    
+    query = f'''
+        {" UNION ALL ".join(selects)}
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+    '''
+    
+    return get_connection().execute(query, params * len(schemas) + [limit, offset]).fetchall()
+
+
+@retry_on_busy
+def update_task(task_id, title="", description=None, category="", status="", due_at=""):
+    # Empty strings leave a field as it is, except the description, which None leaves and ""
+    # clears; due_at=None clears the deadline.
     updates = []
     params = []
     
     if title:
         updates.append("title = ?")
         params.append(title)
-    if description:
+    if description is not None:
         updates.append("description = ?")
         params.append(description)
     if category:
-        updates.append("category = ?")
-        params.append(category)
+        updates.append("category_id = ?")
+        params.append(category_id(category, create=True))
     if status:
         updates.append("status = ?")
-        params.append(status)
+        params.append(status_code(status))
+    if due_at != "":
+        updates.append("due_at = ?")
+        params.append(due_at)
     
     if updates:
         updates.append("updated_at = CURRENT_TIMESTAMP")
         params.append(task_id)
         query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-        conn.commit()
-    
-    conn.close()
+        get_connection().execute(query, params)
 
 
+@retry_on_busy
 def delete_task(task_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-    conn.commit()
-    conn.close()
+    get_connection().execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+
+
+# The bulk functions pass the ids as one JSON array, so any number of tasks is changed by a
+# single statement in a single transaction, without building a query per selection size.
+
+@retry_on_busy
+def update_tasks_bulk(task_ids, category="", status=""):
+    updates = []
+    params = []
+    if category:
+        updates.append("category_id = ?")
+        params.append(category_id(category, create=True))
+    if status:
+        updates.append("status = ?")
+        params.append(status_code(status))
+    if not updates:
+        return 0
+    updates.append("updated_at = CURRENT_TIMESTAMP")
+    params.append(json.dumps(list(task_ids)))
+    with transaction() as conn:
+        return conn.execute(
+            f"UPDATE tasks SET {', '.join(updates)} WHERE id IN (SELECT value FROM json_each(?))", params).rowcount
+
+
+@retry_on_busy
+def delete_tasks_bulk(task_ids):
+    with transaction() as conn:
+        return conn.execute('DELETE FROM tasks WHERE id IN (SELECT value FROM json_each(?))',
+                            (json.dumps(list(task_ids)),)).rowcount
+
+
+def restore_task(task_id, title, description, category, status, created_at=None, due_at=None):
+    restore_tasks([(task_id, title, description, category, status, created_at, due_at)])
+
+
+@retry_on_busy
+def restore_tasks(tasks):
+    # Puts tasks back exactly as given, re-inserting deleted ones under the same id.
+    # tasks holds (id, title, description, category, status, created_at, due_at) tuples.
+    params = [(task_id, title, description, category_id(category, create=True) if category else None,
+               status_code(status), created_at, due_at)
+              for task_id, title, description, category, status, created_at, due_at in tasks]
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO tasks (id, title, description, category_id, status, created_at, due_at)
+            VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+            ON CONFLICT (id) DO UPDATE SET title = excluded.title, description = excluded.description,
+                category_id = excluded.category_id, status = excluded.status, due_at = excluded.due_at,
+                updated_at = CURRENT_TIMESTAMP
+        ''', params)
+
+
+def _history_value(field, value):
+    if field == 'category_id':
+        return 'category', category_name(value)
+    if field == 'status':
+        return 'status', STATUSES[value] if value is not None else None
+    return field, value
+
+
+def get_task_history(task_id):
+    history = []
+    for row in get_connection().execute('''
+        SELECT id, action, changes, changed_at FROM task_history WHERE task_id = ? ORDER BY id DESC
+    ''', (task_id,)):
+        action = HISTORY_ACTIONS[row['action']]
+        changes = {}
+        for field, value in json.loads(row['changes']).items():
+            # Updates store [old, new]; a delete stores the removed values.
+            old, new = value if action == 'update' else (value, None)
+            name, old = _history_value(field, old)
+            changes[name] = (old, _history_value(field, new)[1])
+        history.append({'id': row['id'], 'action': action, 'changed_at': row['changed_at'], 'changes': changes})
+    return history
+
+
+def _merge_updates(entries):
+    merged = {}
+    for entry in entries:
+        for field, (old, new) in json.loads(entry['changes']).items():
+            merged[field] = [merged[field][0] if field in merged else old, new]
+    return {field: value for field, value in merged.items() if value[0] != value[1]}
+
+
+@retry_on_busy
+def compact_history(max_entries=HISTORY_MAX_ENTRIES, keep=HISTORY_KEEP_ENTRIES,
+                    retention_days=HISTORY_RETENTION_DAYS, batch_size=HISTORY_COMPACT_BATCH, after=0):
+    # Returns the entries removed and the task id to pass as `after` next time, 0 once the end is reached.
+    # Without the cursor, long histories that cannot shrink would fill every batch.
+    conn = get_connection()
+    update = HISTORY_CODES['update']
+    removed = 0
+    with transaction():
+        # A task whose latest entry is an old delete is gone for good.
+        removed += conn.execute(f'''
+            DELETE FROM task_history WHERE task_id IN (
+                SELECT h.task_id FROM task_history h
+                WHERE h.action = {HISTORY_CODES['delete']} AND h.changed_at < datetime('now', ?)
+                AND h.id = (SELECT MAX(id) FROM task_history WHERE task_id = h.task_id)
+                LIMIT ?
+            )
+        ''', (f"-{retention_days} days", batch_size)).rowcount
+    # Finding long histories only reads the (task_id, id) index, outside the write lock.
+    long_histories = [row[0] for row in conn.execute(
+        'SELECT task_id FROM task_history WHERE task_id > ? GROUP BY task_id HAVING COUNT(*) > ? LIMIT ?',
+        (after, max_entries, batch_size))]
+    with transaction():
+        for task_id in long_histories:
+            entries = conn.execute(
+                'SELECT id, action, changes FROM task_history WHERE task_id = ? ORDER BY id',
+                (task_id,)).fetchall()
+            entries = entries[:len(entries) - keep]
+            run = []
+            # Only consecutive updates merge; deletes and restores stay as they are.
+            for entry in entries + [None]:
+                if entry is not None and entry['action'] == update:
+                    run.append(entry)
+                    continue
+                if len(run) > 1:
+                    merged = _merge_updates(run)
+                    stale = [item['id'] for item in (run[:-1] if merged else run)]
+                    conn.execute(f'DELETE FROM task_history WHERE id IN ({",".join("?" * len(stale))})', stale)
+                    if merged:
+                        conn.execute('UPDATE task_history SET changes = ? WHERE id = ?',
+                                     (json.dumps(merged, ensure_ascii=False), run[-1]['id']))
+                    removed += len(stale)
+                run = []
+    return removed, long_histories[-1] if len(long_histories) == batch_size else 0
+
+
+def _archive_cutoff(older_than_days):
+    return f"-{older_than_days} days"
+
+
+@retry_on_busy
+def copy_to_archive(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    # First half of a move: copy one batch into the archive and commit. remove_archived() then
+    # deletes the originals in a separate transaction, because a commit spanning two WAL files
+    # is not atomic; a crash in between leaves a copy in both files, never in neither.
+    with transaction() as conn:
+        task_ids = [row[0] for row in conn.execute(f'''
+            SELECT id FROM main.tasks
+            WHERE status = {COMPLETED} AND updated_at < datetime('now', ?)
+            ORDER BY created_at LIMIT ?
+        ''', (_archive_cutoff(older_than_days), batch_size))]
+        if task_ids:
+            conn.execute('''
+                INSERT INTO archive.tasks (id, title, description, category_id, status, created_at, updated_at, due_at)
+                SELECT id, title, description, category_id, status, created_at, updated_at, due_at FROM main.tasks
+                WHERE id IN (SELECT value FROM json_each(?))
+                ON CONFLICT (id) DO NOTHING
+            ''', (json.dumps(task_ids),))
+    return task_ids
+
+
+@retry_on_busy
+def remove_archived(task_ids):
+    ids = json.dumps(list(task_ids))
+    with transaction() as conn:
+        conn.execute('INSERT OR IGNORE INTO main.archive_moves (id) SELECT value FROM json_each(?)', (ids,))
+        # Only rows still identical to their archived copy go; a task edited since the copy stays.
+        removed = conn.execute('''
+            DELETE FROM main.tasks WHERE id IN (SELECT value FROM json_each(?)) AND EXISTS (
+                SELECT 1 FROM archive.tasks a
+                WHERE a.id = main.tasks.id AND a.status = main.tasks.status AND a.updated_at IS main.tasks.updated_at
+            )
+        ''', (ids,)).rowcount
+        conn.execute('DELETE FROM main.archive_moves')
+        conn.execute('''
+            DELETE FROM archive.tasks
+            WHERE id IN (SELECT value FROM json_each(?)) AND id IN (SELECT id FROM main.tasks)
+        ''', (ids,))
+    return removed
+
+
+def archive_tasks(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, progress=None):
+    total = 0
+    while True:
+        task_ids = copy_to_archive(older_than_days, batch_size)
+        if not task_ids:
+            return total
+        total += remove_archived(task_ids)
+        if progress:
+            progress(total)
+
+
+@retry_on_busy
+def copy_from_archive(task_ids):
+    # Restored tasks count as just updated, so the next archive run does not take them straight back.
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO main.tasks (id, title, description, category_id, status, created_at, updated_at, due_at)
+            SELECT id, title, description, category_id, status, created_at, CURRENT_TIMESTAMP, due_at FROM archive.tasks
+            WHERE id IN (SELECT value FROM json_each(?))
+            ON CONFLICT (id) DO NOTHING
+        ''', (json.dumps(list(task_ids)),))
+
+
+@retry_on_busy
+def remove_unarchived(task_ids):
+    with transaction() as conn:
+        return conn.execute('''
+            DELETE FROM archive.tasks
+            WHERE id IN (SELECT value FROM json_each(?)) AND id IN (SELECT id FROM main.tasks)
+        ''', (json.dumps(list(task_ids)),)).rowcount
+
+
+def unarchive_tasks(task_ids):
+    copy_from_archive(task_ids)
+    return remove_unarchived(task_ids)
+
+
+def count_archived():
+    return get_connection().execute('SELECT COUNT(*) FROM archive.tasks').fetchone()[0]
+
+
+@retry_on_busy
+def vacuum_step(pages=VACUUM_STEP_PAGES):
+    # One bounded step of cleanup after archiving; returns True while there is more to do.
+    # Merging search index segments drops the entries of removed rows, and incremental vacuum
+    # hands whole free pages back to the file system. Partly emptied pages only shrink with a
+    # full vacuum(), which needs auto_vacuum = INCREMENTAL set once on older databases anyway.
+    conn = get_connection()
+    with transaction():
+        before = conn.total_changes
+        conn.execute("INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('merge', ?)", (-pages,))
+        merging = conn.total_changes - before > 1
+        if conn.execute('PRAGMA main.auto_vacuum').fetchone()[0] == 2:
+            conn.execute(f'PRAGMA main.incremental_vacuum({pages})').fetchall()
+        free = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+    return merging or free > 0
+
+
+def vacuum():
+    conn = get_connection()
+    conn.execute('PRAGMA main.auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM main')
+    # In WAL mode the rebuilt file sits in the -wal file until it is checkpointed.
+    conn.execute('PRAGMA main.wal_checkpoint(TRUNCATE)')
 
 
 def get_categories():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT DISTINCT category FROM tasks ORDER BY category')
-    categories = cursor.fetchall()
-    conn.close()
+    categories = get_connection().execute('''
+        SELECT c.name FROM task_counts k JOIN categories c ON c.id = k.category_id
+        GROUP BY k.category_id HAVING SUM(k.count) > 0 ORDER BY c.name
+    ''').fetchall()
     return [cat[0] for cat in categories]
+
+
+def get_stats():
+    by_category = {}
+    by_status = {}
+    for row in get_connection().execute(f'''
+        SELECT COALESCE(c.name, '') AS category, {_status_name_sql("k.status")} AS status, k.count
+        FROM task_counts k LEFT JOIN categories c ON c.id = k.category_id
+        WHERE k.count > 0
+    '''):
+        by_category[row['category']] = by_category.get(row['category'], 0) + row['count']
+        by_status[row['status']] = by_status.get(row['status'], 0) + row['count']
+    total = sum(by_status.values())
+    completed = by_status.get('completed', 0)
+    return {
+        'total': total,
+        'by_category': by_category,
+        'by_status': by_status,
+        'completion_rate': completed / total if total else 0.0,
+    }
+
+
+def get_daily_throughput(days=14):
+    return get_connection().execute('''
+        SELECT day, created, completed FROM task_daily
+        WHERE day >= date('now', ?)
+        ORDER BY day
+    ''', (f"-{days - 1} days",)).fetchall()
@@ -0,0 +1,265 @@
+import bisect
+import functools
+import inspect
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer
+import db
+
+LOG_PATH = None
+SLOW_QUERY_MS = 50
+STALL_THRESHOLD_MS = 200
+HEARTBEAT_MS = 50
+SUMMARY_INTERVAL = 60.0
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+RECENT_EVENTS = 50
+MAX_CAPTURED_STATEMENTS = 20
+MAX_PLANNED_STATEMENTS = 5
+HISTOGRAM_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+# Plumbing and per-row helpers are not timed: they are not queries, or too hot to wrap.
+UNTIMED = {'get_connection', 'close_connection', 'transaction', 'run_with_retry', 'retry_on_busy', 'is_busy',
+           'iter_tasks', 'data_version', 'change_counter', 'fold_text', 'status_code', 'category_id',
+           'category_name', 'category_color', 'get_category_names', 'invalidate_categories', 'archive_path',
+           'due_state'}
+PLANNED_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# FTS5 runs its own statements on 'schema'.'table' shadow tables; those are not ours to plan.
+SHADOW_TABLE = re.compile(r"'\w+'\.'\w+'")
+
+_metrics = None
+_log = None
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms, rows):
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, elapsed_ms)] += 1
+        self.calls += 1
+        self.rows += rows or 0
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction):
+        # The upper bound of the bucket the call at that fraction falls in.
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS + [self.max_ms], self.counts):
+            seen += count
+            if seen >= fraction * self.calls:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.slow_queries = deque(maxlen=RECENT_EVENTS)
+            self.stalls = deque(maxlen=RECENT_EVENTS)
+
+    def record(self, name, elapsed_ms, rows=None):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(elapsed_ms, rows)
+
+    def add_event(self, events, event):
+        with self._lock:
+            events.append(event)
+
+    def summary(self):
+        with self._lock:
+            rows = [{'name': name, 'calls': h.calls, 'rows': h.rows,
+                     'p50_ms': round(h.percentile(0.5), 3), 'p95_ms': round(h.percentile(0.95), 3),
+                     'max_ms': round(h.max_ms, 3), 'total_ms': round(h.total_ms, 3), 'histogram': list(h.counts)}
+                    for name, h in self.histograms.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def events(self):
+        with self._lock:
+            return list(self.slow_queries), list(self.stalls)
+
+
+def enabled():
+    return _metrics is not None
+
+
+def metrics():
+    return _metrics
+
+
+def record(name, elapsed_ms, rows=None):
+    if _metrics is not None:
+        _metrics.record(name, elapsed_ms, rows)
+
+
+def row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return None
+
+
+def log_path():
+    if LOG_PATH:
+        return LOG_PATH
+    if db.DB_PATH == ":memory:":
+        return "diagnostics.log"
+    root, _ = os.path.splitext(db.DB_PATH)
+    return f"{root}_diagnostics.log"
+
+
+def _write(event, **fields):
+    _log.info(json.dumps(dict(event=event, **fields), ensure_ascii=False))
+
+
+def _trace(statement):
+    statements = getattr(_local, 'statements', None)
+    if statements is not None and len(statements) < MAX_CAPTURED_STATEMENTS and not SHADOW_TABLE.search(statement):
+        statements.append(statement)
+
+
+def _query_plans(statements):
+    plans = []
+    conn = db.get_connection()
+    for statement in dict.fromkeys(statements):
+        if not statement.lstrip().upper().startswith(PLANNED_STATEMENTS):
+            continue
+        try:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+        except sqlite3.Error as e:
+            plan = [f"no plan: {e}"]
+        if not plan:
+            continue
+        plans.append({'sql': " ".join(statement.split())[:500], 'plan': plan})
+        if len(plans) == MAX_PLANNED_STATEMENTS:
+            break
+    return plans
+
+
+def _timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Statements run by this call (and the calls it makes) are kept for the query plan.
+        outer = getattr(_local, 'statements', None)
+        statements = _local.statements = []
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            _local.statements = outer
+            if outer is not None:
+                outer.extend(statements[:MAX_CAPTURED_STATEMENTS - len(outer)])
+        rows = row_count(result)
+        _metrics.record(f"db.{name}", elapsed, rows)
+        if elapsed >= SLOW_QUERY_MS:
+            event = {'time': time.strftime("%H:%M:%S"), 'call': name, 'ms': round(elapsed, 1), 'rows': rows,
+                     'statements': _query_plans(statements)}
+            _metrics.add_event(_metrics.slow_queries, event)
+            _write("slow_query", **event)
+        return result
+    wrapper.timed = True
+    return wrapper
+
+
+def _instrument_db():
+    for name, func in inspect.getmembers(db, inspect.isfunction):
+        if func.__module__ == db.__name__ and not name.startswith('_') and name not in UNTIMED \
+                and not getattr(func, 'timed', False):
+            setattr(db, name, _timed(name, func))
+
+
+def _write_summaries():
+    while True:
+        time.sleep(SUMMARY_INTERVAL)
+        _write("summary", metrics=_metrics.summary())
+
+
+def enable():
+    # Opt-in (main.py --diagnostics): times every db.py call, keeps the query plans of slow ones and
+    # writes them, GUI stalls and a summary every minute to a rotating log next to the database.
+    global _metrics, _log
+    if _metrics is not None:
+        return _metrics
+    import logging
+    import logging.handlers
+    handler = logging.handlers.RotatingFileHandler(log_path(), maxBytes=LOG_MAX_BYTES,
+                                                   backupCount=LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    _log = logging.getLogger("task_manager.diagnostics")
+    _log.setLevel(logging.INFO)
+    _log.propagate = False
+    _log.addHandler(handler)
+    _metrics = Metrics()
+    _instrument_db()
+    # Connections opened from now on report their statements; reopen this thread's one.
+    db.TRACE_CALLBACK = _trace
+    db.close_connection()
+    threading.Thread(target=_write_summaries, name="diagnostics-summary", daemon=True).start()
+    _write("enabled", database=db.DB_PATH, slow_query_ms=SLOW_QUERY_MS, stall_threshold_ms=STALL_THRESHOLD_MS)
+    return _metrics
+
+
+class StallDetector(QObject):
+    # A timer on the GUI thread beats every HEARTBEAT_MS. When the beats stop for longer than the
+    # threshold, a watchdog thread grabs the GUI thread's Python stack while it is still blocked;
+    # the next beat logs how long the block lasted.
+    def __init__(self, threshold_ms=STALL_THRESHOLD_MS, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self._gui_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stack = None
+        self._stopped = threading.Event()
+        self._timer = QTimer(self)
+        self._timer.setInterval(HEARTBEAT_MS)
+        self._timer.timeout.connect(self._on_beat)
+        self._watchdog = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+
+    def start(self):
+        self._beat = time.monotonic()
+        self._timer.start()
+        self._watchdog.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stopped.set()
+
+    def _on_beat(self):
+        now = time.monotonic()
+        blocked = now - self._beat - HEARTBEAT_MS / 1000
+        self._beat = now
+        stack, self._stack = self._stack, None
+        if blocked >= self.threshold:
+            event = {'time': time.strftime("%H:%M:%S"), 'ms': round(blocked * 1000, 1), 'stack': stack}
+            record("ui.stall", blocked * 1000)
+            _metrics.add_event(_metrics.stalls, event)
+            _write("stall", **event)
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            if self._stack is None and time.monotonic() - self._beat > self.threshold:
+                frame = sys._current_frames().get(self._gui_thread)
+                if frame is not None:
+                    self._stack = "".join(traceback.format_stack(frame))
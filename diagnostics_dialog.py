@@ -0,0 +1,116 @@
+from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QDialog, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView, QTabWidget)
+from PyQt5.QtCore import Qt, QTimer
+import diagnostics
+from theme import StyledButton
+
+REFRESH_INTERVAL_MS = 1000
+
+METRIC_HEADERS = ["المقياس", "المرات", "الصفوف", "p50 ms", "p95 ms", "الأقصى ms", "الإجمالي ms", "التوزيع"]
+SLOW_QUERY_HEADERS = ["الوقت", "الاستدعاء", "ms", "الصفوف", "الاستعلامات وخطة التنفيذ"]
+STALL_HEADERS = ["الوقت", "ms", "مكان التوقف"]
+
+
+def histogram_text(counts):
+    # One character per bucket, from "<0.1 ms" to ">2500 ms", scaled to the busiest bucket.
+    peak = max(counts) or 1
+    return "".join(" ▁▂▃▄▅▆▇█"[max(1, round(count / peak * 8)) if count else 0] for count in counts)
+
+
+def plan_text(statements):
+    return "\n\n".join(statement['sql'] + "\n" + "\n".join(f"  {line}" for line in statement['plan'])
+                       for statement in statements)
+
+
+def make_table(headers, stretch_column, wrap):
+    table = QTableWidget(0, len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+    table.horizontalHeader().setSectionResizeMode(stretch_column, QHeaderView.Stretch)
+    table.verticalHeader().hide()
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    table.setSelectionBehavior(QAbstractItemView.SelectRows)
+    table.setWordWrap(wrap)
+    return table
+
+
+def fill_table(table, rows):
+    table.setRowCount(len(rows))
+    for row, values in enumerate(rows):
+        for column, value in enumerate(values):
+            item = QTableWidgetItem("" if value is None else str(value))
+            if isinstance(value, (int, float)):
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            table.setItem(row, column, item)
+    if table.wordWrap():
+        table.resizeRowsToContents()
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.metrics = diagnostics.metrics()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        self.setWindowTitle("التشخيص")
+        self.setGeometry(120, 120, 1000, 560)
+        self.setObjectName("taskDialog")
+
+        layout = QVBoxLayout()
+        layout.setSpacing(10)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        self.tabs = QTabWidget()
+        self.metrics_table = make_table(METRIC_HEADERS, 0, wrap=False)
+        self.slow_table = make_table(SLOW_QUERY_HEADERS, 4, wrap=True)
+        self.stall_table = make_table(STALL_HEADERS, 2, wrap=True)
+        self.tabs.addTab(self.metrics_table, "التوقيت")
+        self.tabs.addTab(self.slow_table, "الاستعلامات البطيئة")
+        self.tabs.addTab(self.stall_table, "تجمد الواجهة")
+        layout.addWidget(self.tabs)
+
+        path_label = QLabel(f"السجل: {diagnostics.log_path()}")
+        path_label.setStyleSheet("color: #7f8c8d;")
+        path_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(path_label)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        reset_btn = StyledButton("تصفير", "secondary")
+        reset_btn.clicked.connect(self.reset)
+        button_layout.addWidget(reset_btn)
+        close_btn = StyledButton("إغلاق", "secondary")
+        close_btn.clicked.connect(self.close)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+    def showEvent(self, event):
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()
+
+    def refresh(self):
+        slow_queries, stalls = self.metrics.events()
+        fill_table(self.metrics_table, [
+            (row['name'], row['calls'], row['rows'], row['p50_ms'], row['p95_ms'], row['max_ms'], row['total_ms'],
+             histogram_text(row['histogram'])) for row in self.metrics.summary()])
+        fill_table(self.slow_table, [
+            (event['time'], event['call'], event['ms'], event['rows'], plan_text(event['statements']))
+            for event in reversed(slow_queries)])
+        fill_table(self.stall_table, [(event['time'], event['ms'], event['stack'] or "") for event in reversed(stalls)])
+        self.tabs.setTabText(1, f"الاستعلامات البطيئة ({len(slow_queries)})")
+        self.tabs.setTabText(2, f"تجمد الواجهة ({len(stalls)})")
@@ -0,0 +1,76 @@
+from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLabel, QDialog, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView)
+from PyQt5.QtGui import QFont
+import theme
+from theme import StyledButton
+from task_model import STATUS_LABELS
+
+ACTION_LABELS = {"update": "تعديل", "delete": "حذف", "restore": "استعادة", "create": "إنشاء",
+                 "archive": "أرشفة"}
+FIELD_LABELS = {"title": "العنوان", "description": "الوصف", "category": "التصنيف", "status": "الحالة"}
+
+
+def format_value(field, value):
+    if field == 'status':
+        return STATUS_LABELS.get(value, value or "")
+    return value if value else "—"
+
+
+def format_changes(action, changes):
+    lines = []
+    for field, (old, new) in changes.items():
+        if field not in FIELD_LABELS:
+            continue
+        if action == 'update':
+            lines.append(f"{FIELD_LABELS[field]}: {format_value(field, old)} ← {format_value(field, new)}")
+        else:
+            lines.append(f"{FIELD_LABELS[field]}: {format_value(field, old)}")
+    return "\n".join(lines)
+
+
+class HistoryDialog(QDialog):
+    def __init__(self, task, store, parent=None):
+        super().__init__(parent)
+        self.task = task
+        # Tasks not yet saved (negative ids) have no history; the read is one index range scan.
+        self.history = store.get_task_history(task.id) if task.id > 0 else []
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle(f"سجل التغييرات: {self.task.title}")
+        self.setGeometry(100, 100, 700, 500)
+        self.setObjectName("taskDialog")
+
+        layout = QVBoxLayout()
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        title_label = QLabel(self.task.title)
+        title_label.setFont(theme.font("Arial", 13, QFont.Bold))
+        layout.addWidget(title_label)
+
+        entries = [(entry['changed_at'], entry['action'], entry['changes']) for entry in self.history]
+        entries.append((self.task.created_at, 'create', {}))
+        self.table = QTableWidget(len(entries), 3)
+        self.table.setHorizontalHeaderLabels(["الوقت", "الإجراء", "التغييرات"])
+        for row, (changed_at, action, changes) in enumerate(entries):
+            self.table.setItem(row, 0, QTableWidgetItem(changed_at or ""))
+            self.table.setItem(row, 1, QTableWidgetItem(ACTION_LABELS[action]))
+            self.table.setItem(row, 2, QTableWidgetItem(format_changes(action, changes)))
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.table.resizeColumnToContents(0)
+        self.table.resizeRowsToContents()
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        close_btn = StyledButton("إغلاق", "secondary")
+        close_btn.setMinimumHeight(40)
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
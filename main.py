@@ -1,13 +1,91 @@
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
 import sys
 from PyQt5.QtWidgets import QApplication
-from app import TaskManagerApp
+from PyQt5.QtCore import QTimer
 import db
+import store
+
+
+class StartupProfile:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []
+        self.last = STARTED
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000, (now - STARTED) * 1000))
+        self.last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print(f"{'phase':<28}{'ms':>10}{'total ms':>10}", file=sys.stderr)
+        for phase, elapsed, total in self.phases:
+            print(f"{phase:<28}{elapsed:>10.1f}{total:>10.1f}", file=sys.stderr)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="مدير المهام")
+    parser.add_argument("--profile-startup", action="store_true", help="print startup phase timings to stderr")
+    parser.add_argument("--db", default=db.DB_PATH, metavar="PATH",
+                        help="task database file (default: %(default)s, or TASKS_DB)")
+    parser.add_argument("--store", choices=list(store.STORE_ENGINES), default=store.STORE_ENGINE,
+                        help="task storage engine (default: %(default)s, or TASKS_STORE)")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="time database calls and GUI stalls; Ctrl+Shift+D opens the diagnostics panel")
+    parser.add_argument("--archive-after", type=int, default=db.ARCHIVE_AFTER_DAYS, metavar="DAYS",
+                        help="archive tasks completed more than DAYS days ago, 0 to never archive (default: %(default)s)")
+    # The backup module loads after the window is up, so these defaults repeat its settings.
+    parser.add_argument("--backup-every", type=float, metavar="HOURS",
+                        help="take a snapshot when the newest is HOURS old, 0 to never (default: 24)")
+    parser.add_argument("--backup-keep", type=int, metavar="N", help="snapshots to keep (default: 7)")
+    return parser.parse_known_args(argv)
 
 
 if __name__ == '__main__':
-    db.init_db()
-    
-    app_qt = QApplication(sys.argv)
-    window = TaskManagerApp()
+    args, qt_args = parse_args(sys.argv[1:])
+    profile = StartupProfile(args.profile_startup)
+    db.DB_PATH = args.db
+    db.ARCHIVE_AFTER_DAYS = args.archive_after
+    if args.backup_every is not None or args.backup_keep is not None:
+        import backup
+        if args.backup_every is not None:
+            backup.INTERVAL_HOURS = args.backup_every
+        if args.backup_keep is not None:
+            backup.KEEP = args.backup_keep
+    if args.diagnostics:
+        import diagnostics
+        diagnostics.enable()
+    profile.mark("python + Qt imports")
+
+    app_qt = QApplication(sys.argv[:1] + qt_args)
+    profile.mark("QApplication")
+    if args.diagnostics:
+        stall_detector = diagnostics.StallDetector()
+        stall_detector.start()
+
+    from app import TaskManagerApp
+    profile.mark("app imports")
+
+    tasks = store.open_store(args.store, defer=True)
+    profile.mark("init_db")
+
+    window = TaskManagerApp(tasks)
+    profile.mark("window shell")
     window.show()
+    profile.mark("show")
+
+    def first_page_loaded():
+        profile.mark("first page")
+        profile.report()
+
+    window.first_page_loaded.connect(first_page_loaded)
+    QTimer.singleShot(0, lambda: profile.mark("first paint"))
     sys.exit(app_qt.exec_())
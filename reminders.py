@@ -0,0 +1,184 @@
+import heapq
+from datetime import datetime
+from PyQt5.QtCore import QObject, QThreadPool, QTimer, pyqtSignal
+import db
+from workers import QueryWorker
+
+# Re-check at least this often, so a suspended machine or a clock change is caught up quickly.
+MAX_WAIT_MS = 60 * 1000
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now():
+    return datetime.utcnow().strftime(TIME_FORMAT)
+
+
+def _ms_until(due_at):
+    try:
+        due = datetime.strptime(due_at, TIME_FORMAT)
+    except ValueError:
+        return 0
+    return max(0, int((due - datetime.utcnow()).total_seconds() * 1000))
+
+
+class ReminderScheduler(QObject):
+    # Keeps the next `limit` deadlines in a min-heap of (due_at, id) and arms one single-shot
+    # timer for the earliest. _due holds each tracked task's current deadline; repository
+    # signals update it and push the new entry, and stale heap entries are dropped when they
+    # reach the top instead of being searched for. Everything up to the horizon, the last
+    # deadline read from idx_tasks_due, is in the heap; past it the next batch is read.
+    reminders_due = pyqtSignal(list)
+
+    def __init__(self, repository, parent=None, limit=db.REMINDER_BATCH_SIZE):
+        super().__init__(parent)
+        self.repository = repository
+        self.limit = limit
+        self._heap = []
+        self._due = {}
+        self._horizon = None
+        self._loading = False
+        self._touched = set()
+        self._generation = 0
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+        repository.task_inserted.connect(self._on_task_changed)
+        repository.task_updated.connect(self._on_task_changed)
+        repository.task_replaced.connect(self._on_task_replaced)
+        repository.task_removed.connect(self._on_task_removed)
+        repository.tasks_updated.connect(self._on_tasks_updated)
+        repository.tasks_removed.connect(self._on_tasks_removed)
+
+    def start(self):
+        self.reload()
+
+    def stop(self):
+        self._generation += 1
+        self._timer.stop()
+
+    def reload(self):
+        # Drops everything and reads the first batch again, e.g. after another process wrote.
+        self._heap = []
+        self._due = {}
+        self._horizon = None
+        self._load(None)
+
+    def pending(self):
+        return len(self._due)
+
+    def next_due(self):
+        self._drop_stale()
+        return self._heap[0] if self._heap else None
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def _load(self, after):
+        self._generation += 1
+        self._loading = True
+        self._touched = set()
+        store = self.repository.store
+        limit = self.limit
+        worker = QueryWorker(store, self._generation, lambda: [(row['due_at'], row['id']) for row in
+                                                              store.get_upcoming_due(after, limit)],
+                             self.is_current)
+        worker.signals.finished.connect(self._on_loaded)
+        worker.signals.failed.connect(self._on_load_failed)
+        self._pool.start(worker)
+
+    def _on_loaded(self, generation, entries):
+        if not self.is_current(generation):
+            return
+        self._loading = False
+        for due_at, task_id in entries:
+            # A task changed while the batch was read already has its newer deadline.
+            if task_id not in self._touched and self._due.get(task_id) != due_at:
+                self._due[task_id] = due_at
+                heapq.heappush(self._heap, (due_at, task_id))
+        self._horizon = entries[-1] if len(entries) == self.limit else None
+        self._arm()
+
+    def _on_load_failed(self, generation, message):
+        if self.is_current(generation):
+            self._loading = False
+            self._arm()
+
+    def _track(self, task):
+        if self._loading:
+            self._touched.add(task.id)
+        if task.due_at and task.status != 'completed' and task.due_at > _now():
+            if self._due.get(task.id) != task.due_at:
+                self._due[task.id] = task.due_at
+                heapq.heappush(self._heap, (task.due_at, task.id))
+        else:
+            self._due.pop(task.id, None)
+
+    def _forget(self, task_id):
+        if self._loading:
+            self._touched.add(task_id)
+        self._due.pop(task_id, None)
+
+    def _on_task_changed(self, task):
+        self._track(task)
+        self._arm()
+
+    def _on_task_replaced(self, old_id, task):
+        self._forget(old_id)
+        self._track(task)
+        self._arm()
+
+    def _on_task_removed(self, task_id):
+        self._forget(task_id)
+        self._arm()
+
+    def _on_tasks_updated(self, tasks):
+        for task in tasks:
+            self._track(task)
+        self._arm()
+
+    def _on_tasks_removed(self, task_ids):
+        for task_id in task_ids:
+            self._forget(task_id)
+        self._arm()
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _compact(self):
+        # Edits push entries without removing old ones; rebuild once they outnumber the live ones,
+        # and keep only the `limit` nearest deadlines, moving the horizon in to match.
+        if len(self._heap) <= 2 * max(len(self._due), self.limit):
+            return
+        entries = [(due_at, task_id) for task_id, due_at in self._due.items()]
+        if len(entries) > self.limit:
+            entries = heapq.nsmallest(self.limit, entries)
+            self._due = {task_id: due_at for due_at, task_id in entries}
+            self._horizon = entries[-1] if self._horizon is None else min(self._horizon, entries[-1])
+        heapq.heapify(entries)
+        self._heap = entries
+
+    def _arm(self):
+        self._timer.stop()
+        self._compact()
+        self._drop_stale()
+        if not self._loading and self._horizon is not None and (not self._heap or self._heap[0] > self._horizon):
+            self._load(self._horizon)
+        if self._heap:
+            self._timer.start(min(_ms_until(self._heap[0][0]), MAX_WAIT_MS))
+
+    def _fire(self):
+        now = _now()
+        task_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, task_id = heapq.heappop(self._heap)
+            if self._due.get(task_id) == due_at:
+                del self._due[task_id]
+                task_ids.append(task_id)
+        tasks = [task for task in map(self.repository.get_task, task_ids)
+                 if task is not None and task.status != 'completed']
+        if tasks:
+            self.reminders_due.emit(tasks)
+        self._arm()
@@ -0,0 +1,254 @@
+import itertools
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from PyQt5.QtCore import QObject, pyqtSignal
+import db
+from store import SQLiteStore
+from writer import WriteQueue
+
+Task = namedtuple('Task', ['id', 'title', 'description', 'category', 'status', 'created_at', 'updated_at', 'due_at'])
+
+CACHE_SIZE = 5000
+
+
+def task_from_row(row):
+    return Task(*(row[field] for field in Task._fields))
+
+
+class TaskRepository(QObject):
+    task_inserted = pyqtSignal(object)
+    task_updated = pyqtSignal(object)
+    task_removed = pyqtSignal(int)
+    task_replaced = pyqtSignal(int, object)
+    tasks_updated = pyqtSignal(list)
+    tasks_removed = pyqtSignal(list)
+    write_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None, capacity=CACHE_SIZE, store=None):
+        super().__init__(parent)
+        self.store = store if store is not None else SQLiteStore()
+        self.capacity = capacity
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._provisional_ids = itertools.count(-1, -1)
+        self._saved_ids = {}
+        self._versions = {}
+        self.writer = WriteQueue(self, self.store)
+        self.writer.completed.connect(self._on_write_completed)
+        self.writer.failed.connect(self._on_write_failed)
+
+    def _remember(self, task):
+        self._cache[task.id] = task
+        self._cache.move_to_end(task.id)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return task
+
+    def remember(self, tasks):
+        for task in tasks:
+            self._remember(task)
+
+    def get_task(self, task_id):
+        task = self._cache.get(task_id)
+        if task is not None:
+            self._cache.move_to_end(task_id)
+            return task
+        row = self.store.get_task(task_id)
+        return self._remember(task_from_row(row)) if row else None
+
+    def invalidate(self, task_id=None):
+        if task_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(task_id, None)
+
+    def close(self):
+        self.writer.stop()
+
+    def _saved_id(self, task_id):
+        return self._saved_ids.get(task_id, task_id)
+
+    def _touch(self, task_id):
+        # Results of older writes to a task must not overwrite a newer optimistic change.
+        self._versions[task_id] = version = self._versions.get(task_id, 0) + 1
+        return version
+
+    def _is_latest(self, task_id, version):
+        return self._versions.get(task_id) == version
+
+    def _submit(self, func, *args, on_success=None, on_failure=None):
+        token = self.writer.submit(func, *args)
+        self._pending[token] = (on_success, on_failure)
+
+    def _on_write_completed(self, token, result):
+        on_success, _ = self._pending.pop(token, (None, None))
+        if on_success:
+            on_success(result)
+
+    def _on_write_failed(self, token, message):
+        if token not in self._pending:
+            return
+        _, on_failure = self._pending.pop(token)
+        if on_failure:
+            on_failure()
+        self.write_failed.emit(message)
+
+    # The mutations below run on the writer thread; the UI is updated
+    # optimistically right away and rolled back if the write fails.
+
+    def _write_insert(self, provisional_id, title, description, category, due_at):
+        task_id = self.store.add_task(title, description, category, due_at)
+        self._saved_ids[provisional_id] = task_id
+        return task_from_row(self.store.get_task(task_id))
+
+    def _write_update(self, task_id, title, description, category, status, due_at):
+        task_id = self._saved_id(task_id)
+        self.store.update_task(task_id, title, description, category, status, due_at)
+        row = self.store.get_task(task_id)
+        return task_from_row(row) if row else None
+
+    def _write_delete(self, task_id):
+        self.store.delete_task(self._saved_id(task_id))
+
+    def _write_restore(self, tasks):
+        self.store.restore_tasks([(self._saved_id(task.id), task.title, task.description, task.category, task.status,
+                                   task.created_at, task.due_at) for task in tasks])
+
+    def _write_update_bulk(self, task_ids, category, status):
+        return self.store.update_tasks_bulk([self._saved_id(task_id) for task_id in task_ids], category, status)
+
+    def _write_delete_bulk(self, task_ids):
+        return self.store.delete_tasks_bulk([self._saved_id(task_id) for task_id in task_ids])
+
+    def add_task(self, title, description="", category="عام", due_at=None):
+        now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        task = self._remember(Task(next(self._provisional_ids), title, description, category, 'pending', now, now,
+                                   due_at))
+        self.task_inserted.emit(task)
+        
+        def saved(saved_task):
+            self.invalidate(task.id)
+            self.task_replaced.emit(task.id, self._remember(saved_task))
+        
+        def rollback():
+            self.invalidate(task.id)
+            self.task_removed.emit(task.id)
+        
+        self._submit(self._write_insert, task.id, title, description, category, due_at,
+                     on_success=saved, on_failure=rollback)
+        return task
+
+    def update_task(self, task_id, title="", description=None, category="", status="", due_at=""):
+        previous = self.get_task(task_id)
+        if previous is None:
+            return None
+        changes = {field: value for field, value in
+                   (('title', title), ('category', category), ('status', status))
+                   if value}
+        if description is not None:
+            changes['description'] = description
+        if due_at != "":
+            changes['due_at'] = due_at
+        task = self._remember(previous._replace(**changes))
+        version = self._touch(task_id)
+        self.task_updated.emit(task)
+        
+        def saved(saved_task):
+            if not self._is_latest(task_id, version):
+                return
+            if saved_task is None:
+                self.invalidate(task_id)
+                self.task_removed.emit(task_id)
+                return
+            self.task_updated.emit(self._remember(saved_task))
+        
+        def rollback():
+            if self._is_latest(task_id, version):
+                self.task_updated.emit(self._remember(previous))
+        
+        self._submit(self._write_update, task_id, title, description, category, status, due_at,
+                     on_success=saved, on_failure=rollback)
+        return task
+
+    def delete_task(self, task_id):
+        previous = self.get_task(task_id)
+        version = self._touch(task_id)
+        self.invalidate(task_id)
+        self.task_removed.emit(task_id)
+        
+        def rollback():
+            if previous is not None and self._is_latest(task_id, version):
+                self.task_inserted.emit(self._remember(previous))
+        
+        self._submit(self._write_delete, task_id, on_failure=rollback)
+
+    def restore_task(self, task):
+        self.restore_tasks([task])
+
+    def restore_tasks(self, tasks):
+        # Writes every field of each task back, re-inserting deleted tasks under their old ids.
+        previous = {task.id: self._cache.get(task.id) for task in tasks}
+        versions = {task.id: self._touch(task.id) for task in tasks}
+        self.remember(tasks)
+        self.tasks_updated.emit([task for task in tasks if previous[task.id] is not None])
+        # Oldest first, so the newest restored task ends up at the top of the table.
+        for task in sorted(tasks, key=lambda task: (task.created_at, task.id)):
+            if previous[task.id] is None:
+                self.task_inserted.emit(task)
+        
+        def rollback():
+            latest = [task for task in tasks if self._is_latest(task.id, versions[task.id])]
+            self.tasks_updated.emit([self._remember(previous[task.id]) for task in latest
+                                     if previous[task.id] is not None])
+            removed = [task.id for task in latest if previous[task.id] is None]
+            for task_id in removed:
+                self.invalidate(task_id)
+            self.tasks_removed.emit(removed)
+        
+        self._submit(self._write_restore, list(tasks), on_failure=rollback)
+
+    # Bulk changes are one statement on the writer thread and one signal for the view.
+
+    def update_tasks(self, tasks, category="", status=""):
+        changes = {field: value for field, value in (('category', category), ('status', status)) if value}
+        if not tasks or not changes:
+            return
+        versions = {task.id: self._touch(task.id) for task in tasks}
+        self.tasks_updated.emit([self._remember(task._replace(**changes)) for task in tasks])
+        
+        def rollback():
+            self.tasks_updated.emit([self._remember(task) for task in tasks
+                                     if self._is_latest(task.id, versions[task.id])])
+        
+        self._submit(self._write_update_bulk, [task.id for task in tasks], category, status, on_failure=rollback)
+
+    def delete_tasks(self, tasks):
+        if not tasks:
+            return
+        versions = {task.id: self._touch(task.id) for task in tasks}
+        for task in tasks:
+            self.invalidate(task.id)
+        self.tasks_removed.emit([task.id for task in tasks])
+        
+        def rollback():
+            for task in sorted(tasks, key=lambda task: (task.created_at, task.id)):
+                if self._is_latest(task.id, versions[task.id]):
+                    self.task_inserted.emit(self._remember(task))
+        
+        self._submit(self._write_delete_bulk, [task.id for task in tasks], on_failure=rollback)
+
+    def unarchive_tasks(self, tasks):
+        # Copy back, then drop the archived copies in a second transaction (see db.copy_to_archive).
+        task_ids = [task.id for task in tasks]
+        now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self.tasks_updated.emit([self._remember(task._replace(updated_at=now)) for task in tasks])
+        
+        def copied(_):
+            self._submit(self.store.remove_unarchived, task_ids)
+        
+        def rollback():
+            for task_id in task_ids:
+                self.invalidate(task_id)
+            self.tasks_removed.emit(task_ids)
+        
+        self._submit(self.store.copy_from_archive, task_ids, on_success=copied, on_failure=rollback)
@@ -0,0 +1,784 @@
+import bisect
+import os
+import re
+import string
+import sys
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import db
+
+STORE_ENGINE = os.environ.get("TASKS_STORE", "sqlite")
+
+PROGRESS_INTERVAL = 1000
+SNIPPET_WORDS = 12
+
+SORTED_FIELDS = ('created_at', 'category', 'status')
+DUE_FIELDS = ('due_at', 'status')
+TEXT_FIELDS = ('title', 'description')
+
+_WORD = re.compile(r"\w+")
+# COLLATE NOCASE folds ASCII letters only.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class TaskStore(ABC):
+    # What the repository, the table model and the write queue need from storage. Rows are
+    # mappings with the Task fields; category and status are names, timestamps are UTC
+    # "YYYY-MM-DD HH:MM:SS" strings and due_at may be None. Writes may run on any thread,
+    # inside transaction(). due filters are db.DUE_FILTERS, orders are db.ORDERINGS; cursors
+    # only have to make sense to the store that returned them.
+    engine = None
+    # backup.py copies database files; an engine without them has no snapshots.
+    snapshots = False
+
+    def open(self, defer=False):
+        return self
+
+    def close(self):
+        pass
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def run_with_retry(self, func, *args):
+        return func(*args)
+
+    @contextmanager
+    def interruptible(self, cancelled):
+        yield
+
+    def data_version(self):
+        return 0
+
+    @abstractmethod
+    def add_task(self, title, description="", category="عام", due_at=None):
+        pass
+
+    @abstractmethod
+    def bulk_insert(self, tasks, chunk_size=db.BULK_CHUNK_SIZE, progress=None):
+        pass
+
+    @abstractmethod
+    def get_task(self, task_id):
+        pass
+
+    @abstractmethod
+    def update_task(self, task_id, title="", description=None, category="", status="", due_at=""):
+        pass
+
+    @abstractmethod
+    def delete_task(self, task_id):
+        pass
+
+    @abstractmethod
+    def restore_tasks(self, tasks):
+        pass
+
+    @abstractmethod
+    def update_tasks_bulk(self, task_ids, category="", status=""):
+        pass
+
+    @abstractmethod
+    def delete_tasks_bulk(self, task_ids):
+        pass
+
+    @abstractmethod
+    def get_tasks_page(self, category=None, status=None, cursor=None, page_size=50, due=None, order=None):
+        pass
+
+    @abstractmethod
+    def locate_task(self, task_id, category=None, status=None, page_size=50, due=None, order=None):
+        pass
+
+    @abstractmethod
+    def previous_page_cursor(self, cursor, category=None, status=None, page_size=50, due=None, order=None):
+        pass
+
+    @abstractmethod
+    def get_upcoming_due(self, after=None, limit=db.REMINDER_BATCH_SIZE):
+        pass
+
+    @abstractmethod
+    def search_tasks(self, query, category=None, status=None, limit=50, offset=0, start_mark="<b>",
+                     end_mark="</b>", include_archive=False, due=None, order=None):
+        pass
+
+    @abstractmethod
+    def get_stats(self):
+        pass
+
+    @abstractmethod
+    def get_daily_throughput(self, days=14):
+        pass
+
+    @abstractmethod
+    def get_category_names(self):
+        pass
+
+    @abstractmethod
+    def category_id(self, name):
+        pass
+
+    def category_color(self, name):
+        return None
+
+    def invalidate_categories(self):
+        pass
+
+    def get_task_history(self, task_id):
+        return []
+
+    # Housekeeping the app runs on the writer thread, one bounded step per call. An engine
+    # without a schema, an archive or a history log has nothing to do.
+
+    def pending_migrations(self):
+        return []
+
+    def apply_migration(self, version):
+        return version
+
+    def pending_indexes(self):
+        return []
+
+    def build_index(self, name):
+        return name
+
+    def pending_backfills(self):
+        return []
+
+    def backfill_batch(self, version, position, target):
+        return target
+
+    def compact_history(self):
+        return 0
+
+    def copy_to_archive(self, older_than_days, batch_size=db.ARCHIVE_BATCH_SIZE):
+        return []
+
+    def remove_archived(self, task_ids):
+        return 0
+
+    def vacuum_step(self):
+        return False
+
+    def copy_from_archive(self, task_ids):
+        pass
+
+    def remove_unarchived(self, task_ids):
+        return 0
+
+
+class SQLiteStore(TaskStore):
+    # db.py keeps one database per process (db.DB_PATH), so opening a store with another path
+    # switches it; run separate processes to use several files side by side.
+    engine = "sqlite"
+    snapshots = True
+
+    def __init__(self, path=None):
+        self.path = path
+        self._history_cursor = 0
+
+    def open(self, defer=False):
+        if self.path is not None:
+            db.close_connection()
+            db.DB_PATH = self.path
+        self.path = db.DB_PATH
+        db.init_db(defer)
+        return self
+
+    def close(self):
+        db.close_connection()
+
+    def transaction(self):
+        return db.transaction()
+
+    def run_with_retry(self, func, *args):
+        return db.run_with_retry(func, *args)
+
+    @contextmanager
+    def interruptible(self, cancelled):
+        # A query still running when cancelled() turns true fails with "interrupted".
+        conn = db.get_connection()
+        conn.set_progress_handler(cancelled, PROGRESS_INTERVAL)
+        try:
+            yield
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def data_version(self):
+        return db.data_version()
+
+    def add_task(self, title, description="", category="عام", due_at=None):
+        return db.add_task(title, description, category, due_at)
+
+    def bulk_insert(self, tasks, chunk_size=db.BULK_CHUNK_SIZE, progress=None):
+        return db.bulk_insert(tasks, chunk_size, progress)
+
+    def get_task(self, task_id):
+        return db.get_task(task_id)
+
+    def update_task(self, task_id, title="", description=None, category="", status="", due_at=""):
+        db.update_task(task_id, title, description, category, status, due_at)
+
+    def delete_task(self, task_id):
+        db.delete_task(task_id)
+
+    def restore_tasks(self, tasks):
+        db.restore_tasks(tasks)
+
+    def update_tasks_bulk(self, task_ids, category="", status=""):
+        return db.update_tasks_bulk(task_ids, category, status)
+
+    def delete_tasks_bulk(self, task_ids):
+        return db.delete_tasks_bulk(task_ids)
+
+    def get_tasks_page(self, category=None, status=None, cursor=None, page_size=50, due=None, order=None):
+        return db.get_tasks_page(category, status, cursor, page_size, due, order)
+
+    def locate_task(self, task_id, category=None, status=None, page_size=50, due=None, order=None):
+        return db.locate_task(task_id, category, status, page_size, due, order)
+
+    def previous_page_cursor(self, cursor, category=None, status=None, page_size=50, due=None, order=None):
+        return db.previous_page_cursor(cursor, category, status, page_size, due, order)
+
+    def get_upcoming_due(self, after=None, limit=db.REMINDER_BATCH_SIZE):
+        return db.get_upcoming_due(after, limit)
+
+    def search_tasks(self, query, category=None, status=None, limit=50, offset=0, start_mark="<b>",
+                     end_mark="</b>", include_archive=False, due=None, order=None):
+        return db.search_tasks(query, category, status, limit, offset, start_mark, end_mark, include_archive, due,
+                               order)
+
+    def get_stats(self):
+        return db.get_stats()
+
+    def get_daily_throughput(self, days=14):
+        return db.get_daily_throughput(days)
+
+    def get_category_names(self):
+        return db.get_category_names()
+
+    def category_id(self, name):
+        return db.category_id(name)
+
+    def category_color(self, name):
+        return db.category_color(name)
+
+    def invalidate_categories(self):
+        db.invalidate_categories()
+
+    def get_task_history(self, task_id):
+        return db.get_task_history(task_id)
+
+    def pending_migrations(self):
+        return db.pending_migrations()
+
+    def apply_migration(self, version):
+        return db.apply_migration(version)
+
+    def pending_indexes(self):
+        return db.pending_indexes()
+
+    def build_index(self, name):
+        return db.build_index(name)
+
+    def pending_backfills(self):
+        return db.pending_backfills()
+
+    def backfill_batch(self, version, position, target):
+        return db.backfill_batch(version, position, target)
+
+    def compact_history(self):
+        removed, self._history_cursor = db.compact_history(after=self._history_cursor)
+        return removed
+
+    def copy_to_archive(self, older_than_days, batch_size=db.ARCHIVE_BATCH_SIZE):
+        return db.copy_to_archive(older_than_days, batch_size)
+
+    def remove_archived(self, task_ids):
+        return db.remove_archived(task_ids)
+
+    def vacuum_step(self):
+        return db.vacuum_step()
+
+    def copy_from_archive(self, task_ids):
+        db.copy_from_archive(task_ids)
+
+    def remove_unarchived(self, task_ids):
+        return db.remove_unarchived(task_ids)
+
+
+def _now(hours=0):
+    return (datetime.utcnow() + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _due_range(due):
+    if due not in db.DUE_FILTERS:
+        raise ValueError(f"Unknown due filter: {due}")
+    if due == 'overdue':
+        return None, _now()
+    return _now(), _now(db.DUE_SOON_HOURS)
+
+
+def _sort_order(order, due=None):
+    order = order or ('due_asc' if due else 'created_desc')
+    if order not in db.ORDERINGS:
+        raise ValueError(f"Unknown task ordering: {order}")
+    key, _, direction = order.rpartition('_')
+    return key, direction == 'desc'
+
+
+def _walk(index, after, descending):
+    # The keys of a sorted index that come after `after` (from the start if None) in this direction.
+    if descending:
+        position = len(index) if after is None else bisect.bisect_left(index, after)
+        return (index[i] for i in range(position - 1, -1, -1))
+    position = 0 if after is None else bisect.bisect_right(index, after)
+    return (index[i] for i in range(position, len(index)))
+
+
+def _same(old, row, fields):
+    return old is not None and row is not None and all(old[field] == row[field] for field in fields)
+
+
+def _tokens(text):
+    # Close to the FTS5 index: Arabic folding, then unicode61 with remove_diacritics.
+    text = unicodedata.normalize('NFKD', db.fold_text(text or "").lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+class MemoryStore(TaskStore):
+    # Tasks live in a dict, with the indexes the SQLite schema has: sorted (created_at, id) keys
+    # overall and per category and status, sorted (due_at, id) keys of open tasks with a
+    # deadline, plus an inverted word index for search. The other orders get a sorted key list
+    # the first time they are asked for. Every change goes through _put(), which keeps them all
+    # current and journals the old row so a failed transaction rolls back.
+    engine = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._order = []
+        self._by_category = defaultdict(list)
+        self._by_status = defaultdict(list)
+        self._by_due = []
+        self._sort_indexes = {}
+        # Positions in the order SQLite numbers categories, which the category sort follows.
+        self._category_ids = {name: i for i, name in enumerate(db.DEFAULT_CATEGORIES, 1)}
+        self._counts = defaultdict(int)
+        self._words = defaultdict(set)
+        self._vocabulary = []
+        self._task_words = {}
+        self._last_id = 0
+        self._journal = None
+        self._depth = 0
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            self._journal = [('last_id', self._last_id)]
+            self._depth = 1
+            try:
+                yield
+            except BaseException:
+                journal, self._journal = self._journal, None
+                for task_id, row in reversed(journal):
+                    if task_id == 'last_id':
+                        self._last_id = row
+                    else:
+                        self._put(task_id, row)
+                raise
+            finally:
+                self._journal = None
+                self._depth = 0
+
+    def _sorted_indexes(self, row):
+        return self._order, self._by_category[row['category']], self._by_status[row['status']]
+
+    def _has_due(self, row):
+        return row['due_at'] is not None and row['status'] != 'completed'
+
+    def _sort_key(self, key, row):
+        # The values SQLite sorts by for this key (db.SORT_TERMS), then the id.
+        if key == 'id':
+            return (row['id'],)
+        if key == 'title':
+            return (db.fold_text(row['title']).translate(_ASCII_LOWER), row['id'])
+        if key == 'category':
+            return (self._category_ids.get(row['category'], 0), row['created_at'], row['id'])
+        if key == 'status':
+            return (db.STATUS_CODES[row['status']], row['created_at'], row['id'])
+        if key == 'due':
+            return (row['due_at'] or '', row['id'])
+        return (row[f'{key}_at'], row['id'])
+
+    def _sort_index(self, key):
+        index = self._sort_indexes.get(key)
+        if index is None:
+            index = self._sort_indexes[key] = sorted(self._sort_key(key, row) for row in self._rows.values())
+        return index
+
+    def _order_index(self, key, category, status):
+        if key == 'created':
+            return self._index_for(category, status)
+        if key == 'due':
+            return self._by_due
+        return self._sort_index(key)
+
+    def _put(self, task_id, row):
+        # Replaces, inserts (row given) or removes (row None) one task. Only the indexes whose
+        # fields changed are touched, so a status change does not re-index the text.
+        old = self._rows.pop(task_id, None)
+        if self._journal is not None:
+            self._journal.append((task_id, old))
+        if row is not None:
+            self._rows[task_id] = row
+            self._last_id = max(self._last_id, task_id)
+            if row['category'] and row['category'] not in self._category_ids:
+                self._category_ids[row['category']] = len(self._category_ids) + 1
+        for key, index in self._sort_indexes.items():
+            old_key = self._sort_key(key, old) if old is not None else None
+            new_key = self._sort_key(key, row) if row is not None else None
+            if old_key != new_key:
+                if old_key is not None:
+                    del index[bisect.bisect_left(index, old_key)]
+                if new_key is not None:
+                    bisect.insort(index, new_key)
+        if not _same(old, row, SORTED_FIELDS):
+            if old is not None:
+                key = (old['created_at'], task_id)
+                for index in self._sorted_indexes(old):
+                    del index[bisect.bisect_left(index, key)]
+                self._counts[(old['category'] or '', old['status'])] -= 1
+            if row is not None:
+                key = (row['created_at'], task_id)
+                for index in self._sorted_indexes(row):
+                    bisect.insort(index, key)
+                self._counts[(row['category'] or '', row['status'])] += 1
+        if not _same(old, row, DUE_FIELDS):
+            if old is not None and self._has_due(old):
+                del self._by_due[bisect.bisect_left(self._by_due, (old['due_at'], task_id))]
+            if row is not None and self._has_due(row):
+                bisect.insort(self._by_due, (row['due_at'], task_id))
+        if not _same(old, row, TEXT_FIELDS):
+            if old is not None:
+                title, description = self._task_words.pop(task_id)
+                for word in set(title) | set(description):
+                    self._words[word].discard(task_id)
+            if row is not None:
+                title, description = (tuple(map(sys.intern, _tokens(row[field]))) for field in TEXT_FIELDS)
+                for word in set(title) | set(description):
+                    if not self._words[word]:
+                        bisect.insort(self._vocabulary, word)
+                    self._words[word].add(task_id)
+                self._task_words[task_id] = (title, description)
+
+    def add_task(self, title, description="", category="عام", due_at=None):
+        now = _now()
+        with self.transaction():
+            task_id = self._last_id + 1
+            self._put(task_id, {'id': task_id, 'title': title, 'description': description,
+                                'category': category or None, 'status': 'pending',
+                                'created_at': now, 'updated_at': now, 'due_at': due_at})
+        return task_id
+
+    def bulk_insert(self, tasks, chunk_size=db.BULK_CHUNK_SIZE, progress=None):
+        total = 0
+        tasks = iter(tasks)
+        while True:
+            chunk = [task for _, task in zip(range(chunk_size), tasks)]
+            if not chunk:
+                break
+            now = _now()
+            with self.transaction():
+                for task in chunk:
+                    db.status_code(task.get('status') or 'pending')
+                    task_id = self._last_id + 1
+                    self._put(task_id, {'id': task_id, 'title': task.get('title'),
+                                        'description': task.get('description'),
+                                        'category': task.get('category') or None,
+                                        'status': task.get('status') or 'pending',
+                                        'created_at': task.get('created_at') or now,
+                                        'updated_at': task.get('updated_at') or now,
+                                        'due_at': task.get('due_at')})
+            total += len(chunk)
+            if progress:
+                progress(total)
+        return total
+
+    def get_task(self, task_id):
+        with self._lock:
+            row = self._rows.get(task_id)
+            return dict(row) if row is not None else None
+
+    def _changed(self, row, changes):
+        if changes.get('status'):
+            db.status_code(changes['status'])
+        changes = {field: value for field, value in changes.items()
+                   if value or field == 'due_at' and value is None or field == 'description' and value == ""}
+        if not changes:
+            return None
+        return dict(row, updated_at=_now(), **changes)
+
+    def update_task(self, task_id, title="", description=None, category="", status="", due_at=""):
+        with self.transaction():
+            row = self._rows.get(task_id)
+            if row is None:
+                return
+            row = self._changed(row, {'title': title, 'description': description, 'category': category,
+                                      'status': status, 'due_at': due_at})
+            if row is not None:
+                self._put(task_id, row)
+
+    def delete_task(self, task_id):
+        with self.transaction():
+            if task_id in self._rows:
+                self._put(task_id, None)
+
+    def restore_tasks(self, tasks):
+        now = _now()
+        with self.transaction():
+            for task_id, title, description, category, status, created_at, due_at in tasks:
+                db.status_code(status)
+                old = self._rows.get(task_id)
+                self._put(task_id, {'id': task_id, 'title': title, 'description': description,
+                                    'category': category or None, 'status': status,
+                                    'created_at': old['created_at'] if old else created_at or now,
+                                    'updated_at': now, 'due_at': due_at})
+
+    def update_tasks_bulk(self, task_ids, category="", status=""):
+        if not category and not status:
+            return 0
+        count = 0
+        with self.transaction():
+            for task_id in set(task_ids):
+                row = self._rows.get(task_id)
+                if row is None:
+                    continue
+                self._put(task_id, self._changed(row, {'category': category, 'status': status}))
+                count += 1
+        return count
+
+    def delete_tasks_bulk(self, task_ids):
+        count = 0
+        with self.transaction():
+            for task_id in set(task_ids):
+                if task_id in self._rows:
+                    self._put(task_id, None)
+                    count += 1
+        return count
+
+    def _index_for(self, category, status):
+        # The smaller of the two indexes drives the scan; the other filter is checked per row.
+        if category and status:
+            by_category, by_status = self._by_category.get(category, []), self._by_status.get(status, [])
+            return by_category if len(by_category) <= len(by_status) else by_status
+        if category:
+            return self._by_category.get(category, [])
+        if status:
+            return self._by_status.get(status, [])
+        return self._order
+
+    def _matches(self, row, category, status, due_range=None):
+        if due_range is not None:
+            low, high = due_range
+            if not self._has_due(row) or low is not None and row['due_at'] < low or row['due_at'] >= high:
+                return False
+        return (not category or row['category'] == category) and (not status or row['status'] == status)
+
+    def _due_page(self, category, status, cursor, page_size, due):
+        # Nearest deadline first, walking the due index from the cursor or the start of the range.
+        low, high = due_range = _due_range(due)
+        tasks = []
+        with self._lock:
+            if cursor is not None:
+                position = bisect.bisect_right(self._by_due, tuple(cursor))
+            else:
+                position = 0 if low is None else bisect.bisect_left(self._by_due, (low,))
+            while position < len(self._by_due) and self._by_due[position][0] < high and len(tasks) <= page_size:
+                row = self._rows[self._by_due[position][1]]
+                if self._matches(row, category, status, due_range):
+                    tasks.append(dict(row))
+                position += 1
+        if len(tasks) <= page_size:
+            return tasks, None
+        tasks = tasks[:page_size]
+        return tasks, (tasks[-1]['due_at'], tasks[-1]['id'])
+
+    def get_upcoming_due(self, after=None, limit=db.REMINDER_BATCH_SIZE):
+        with self._lock:
+            if after is None:
+                position = bisect.bisect_right(self._by_due, (_now(), float('inf')))
+            else:
+                position = bisect.bisect_right(self._by_due, tuple(after))
+            return [{'id': task_id, 'due_at': due_at} for due_at, task_id in self._by_due[position:position + limit]]
+
+    def get_tasks_page(self, category=None, status=None, cursor=None, page_size=50, due=None, order=None):
+        if status:
+            db.status_code(status)
+        key, descending = _sort_order(order, due)
+        if key == 'due':
+            return self._due_page(category, status, cursor, page_size, due)
+        # Created order reads the index of the filter; the others read theirs and check the filters.
+        due_range = _due_range(due) if due else None
+        tasks = []
+        with self._lock:
+            index = self._order_index(key, category, status)
+            for entry in _walk(index, None if cursor is None else tuple(cursor), descending):
+                row = self._rows[entry[-1]]
+                if self._matches(row, category, status, due_range):
+                    tasks.append(dict(row))
+                    if len(tasks) > page_size:
+                        break
+            if len(tasks) <= page_size:
+                return tasks, None
+            tasks = tasks[:page_size]
+            return tasks, self._sort_key(key, tasks[-1])
+
+    def _before(self, key, after, category, status, due, descending):
+        # The keys of the matching rows ahead of `after` in this order, nearest first.
+        due_range = _due_range(due) if due else None
+        index = self._order_index(key, category, status)
+        return (entry for entry in _walk(index, after, not descending)
+                if self._matches(self._rows[entry[-1]], category, status, due_range))
+
+    def locate_task(self, task_id, category=None, status=None, page_size=50, due=None, order=None):
+        key, descending = _sort_order(order, due)
+        with self._lock:
+            row = self._rows.get(task_id)
+            if row is None or not self._matches(row, category, status, _due_range(due) if due else None):
+                return None
+            before = list(self._before(key, self._sort_key(key, row), category, status, due, descending))
+        page, position = divmod(len(before), page_size)
+        return (1, None) if page == 0 else (page + 1, before[position])
+
+    def previous_page_cursor(self, cursor, category=None, status=None, page_size=50, due=None, order=None):
+        key, descending = _sort_order(order, due)
+        with self._lock:
+            for count, entry in enumerate(self._before(key, tuple(cursor), category, status, due, descending), 1):
+                if count == page_size:
+                    return entry
+        return None
+
+    def _prefixed(self, term):
+        words = set()
+        position = bisect.bisect_left(self._vocabulary, term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            words.add(self._vocabulary[position])
+            position += 1
+        return words
+
+    def _snippet(self, text, terms, start_mark, end_mark):
+        words = db.fold_text(text or "").split()
+        hits = [i for i, word in enumerate(words)
+                if any(token.startswith(term) for token in _tokens(word) for term in terms)]
+        start = max(0, min(hits[0] if hits else 0, len(words) - SNIPPET_WORDS))
+        end = start + SNIPPET_WORDS
+        marked = [f"{start_mark}{word}{end_mark}" if i in hits else word
+                  for i, word in enumerate(words[start:end], start)]
+        return ("…" if start else "") + " ".join(marked) + ("…" if end < len(words) else "")
+
+    def search_tasks(self, query, category=None, status=None, limit=50, offset=0, start_mark="<b>",
+                     end_mark="</b>", include_archive=False, due=None, order=None):
+        # Every word matches as a prefix, like the FTS query; title hits weigh ten times more.
+        # There is no archive in memory, so include_archive changes nothing.
+        terms = _tokens(query)
+        if not terms:
+            return []
+        if status:
+            db.status_code(status)
+        due_range = _due_range(due) if due else None
+        with self._lock:
+            expansions = [self._prefixed(term) for term in terms]
+            ids = None
+            for words in expansions:
+                matching = set().union(*(self._words[word] for word in words))
+                ids = matching if ids is None else ids & matching
+            results = []
+            for task_id in ids:
+                row = self._rows[task_id]
+                if not self._matches(row, category, status, due_range):
+                    continue
+                title, description = self._task_words[task_id]
+                score = sum(10.0 * sum(word in words for word in title) / max(len(title), 1) +
+                            sum(word in words for word in description) / max(len(description), 1)
+                            for words in expansions)
+                results.append((-score, task_id))
+            results.sort()
+            if order:
+                key, descending = _sort_order(order, due)
+                results.sort(key=lambda result: self._sort_key(key, self._rows[result[1]]), reverse=descending)
+            rows = []
+            for rank, task_id in results[offset:offset + limit]:
+                row = self._rows[task_id]
+                in_title = any(word in words for word in self._task_words[task_id][0] for words in expansions)
+                text = row['title'] if in_title else row['description']
+                rows.append(dict(row, archived=0, rank=rank,
+                                 snippet=self._snippet(text, terms, start_mark, end_mark)))
+        return rows
+
+    def get_stats(self):
+        by_category = {}
+        by_status = {}
+        with self._lock:
+            for (category, status), count in self._counts.items():
+                if count > 0:
+                    by_category[category] = by_category.get(category, 0) + count
+                    by_status[status] = by_status.get(status, 0) + count
+        total = sum(by_status.values())
+        completed = by_status.get('completed', 0)
+        return {
+            'total': total,
+            'by_category': by_category,
+            'by_status': by_status,
+            'completion_rate': completed / total if total else 0.0,
+        }
+
+    def get_daily_throughput(self, days=14):
+        # Counted from the tasks there are now, so unlike SQLite's task_daily a deleted task no longer counts.
+        first = _now(-24 * (days - 1))[:10]
+        counts = defaultdict(lambda: [0, 0])
+        with self._lock:
+            for row in self._rows.values():
+                if row['created_at'][:10] >= first:
+                    counts[row['created_at'][:10]][0] += 1
+                if row['status'] == 'completed' and row['updated_at'][:10] >= first:
+                    counts[row['updated_at'][:10]][1] += 1
+        return [{'day': day, 'created': created, 'completed': completed}
+                for day, (created, completed) in sorted(counts.items())]
+
+    def get_category_names(self):
+        with self._lock:
+            return list(self._category_ids)
+
+    def category_id(self, name):
+        return self._category_ids.get(name)
+
+
+STORE_ENGINES = {
+    SQLiteStore.engine: SQLiteStore,
+    MemoryStore.engine: MemoryStore,
+}
+
+
+def open_store(engine=None, path=None, defer=False):
+    # engine defaults to STORE_ENGINE (TASKS_STORE in the environment); path and defer
+    # (see db.init_db) only apply to SQLite.
+    engine = engine or STORE_ENGINE
+    if engine not in STORE_ENGINES:
+        raise ValueError(f"Unknown task store: {engine}")
+    store = SQLiteStore(path) if engine == SQLiteStore.engine else STORE_ENGINES[engine]()
+    return store.open(defer)
@@ -0,0 +1,114 @@
+from PyQt5.QtWidgets import (QVBoxLayout, QHBoxLayout, QLineEdit, QTextEdit, QComboBox, QLabel, QDialog, QCheckBox,
+                             QDateTimeEdit)
+from PyQt5.QtCore import Qt, QDateTime, QTime
+from PyQt5.QtGui import QFont
+import theme
+from theme import StyledButton
+
+
+class AddTaskDialog(QDialog):
+    def __init__(self, categories, parent=None, task=None):
+        super().__init__(parent)
+        self.categories = categories
+        self.task = task
+        self.init_ui()
+        
+    def init_ui(self):
+        self.setWindowTitle("إضافة مهمة جديدة" if not self.task else "تعديل المهمة")
+        self.setGeometry(100, 100, 550, 560)
+        self.setObjectName("taskDialog")
+        
+        layout = QVBoxLayout()
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        title_label = QLabel("العنوان:")
+        title_label.setFont(theme.font("Arial", 11, QFont.Bold))
+        layout.addWidget(title_label)
+        self.title_input = QLineEdit()
+        self.title_input.setPlaceholderText("أدخل عنوان المهمة...")
+        self.title_input.setMinimumHeight(35)
+        if self.task:
+            self.title_input.setText(self.task.title)
+        layout.addWidget(self.title_input)
+        
+        desc_label = QLabel("الوصف:")
+        desc_label.setFont(theme.font("Arial", 11, QFont.Bold))
+        layout.addWidget(desc_label)
+        self.desc_input = QTextEdit()
+        self.desc_input.setPlaceholderText("أدخل وصف المهمة...")
+        self.desc_input.setMinimumHeight(120)
+        if self.task:
+            self.desc_input.setText(self.task.description or "")
+        layout.addWidget(self.desc_input)
+        
+        category_label = QLabel("التصنيف:")
+        category_label.setFont(theme.font("Arial", 11, QFont.Bold))
+        layout.addWidget(category_label)
+        self.category_input = QComboBox()
+        self.category_input.addItems(self.categories)
+        self.category_input.setMinimumHeight(35)
+        if self.task:
+            self.category_input.setCurrentText(self.task.category)
+        layout.addWidget(self.category_input)
+        
+        self.due_check = QCheckBox("موعد نهائي:")
+        self.due_check.setFont(theme.font("Arial", 11, QFont.Bold))
+        layout.addWidget(self.due_check)
+        self.due_input = QDateTimeEdit()
+        self.due_input.setCalendarPopup(True)
+        self.due_input.setDisplayFormat("yyyy-MM-dd HH:mm")
+        self.due_input.setMinimumHeight(35)
+        if self.task and self.task.due_at:
+            due = QDateTime.fromString(self.task.due_at, "yyyy-MM-dd HH:mm:ss")
+            due.setTimeSpec(Qt.UTC)
+            self.due_input.setDateTime(due.toLocalTime())
+            self.due_check.setChecked(True)
+        else:
+            self.due_input.setDateTime(QDateTime(QDateTime.currentDateTime().date().addDays(1), QTime(9, 0)))
+        self.due_input.setEnabled(self.due_check.isChecked())
+        self.due_check.toggled.connect(self.due_input.setEnabled)
+        layout.addWidget(self.due_input)
+        
+        if self.task:
+            status_label = QLabel("الحالة:")
+            status_label.setFont(theme.font("Arial", 11, QFont.Bold))
+            layout.addWidget(status_label)
+            self.status_combo = QComboBox()
+            self.status_combo.addItems(["قيد الانتظار", "قيد الإنجاز", "مكتملة"])
+            self.status_combo.setMinimumHeight(35)
+            status_map = {"pending": "قيد الانتظار", "in_progress": "قيد الإنجاز", "completed": "مكتملة"}
+            self.status_combo.setCurrentText(status_map.get(self.task.status, "قيد الانتظار"))
+            layout.addWidget(self.status_combo)
+        
+        layout.addStretch()
+        
+        button_layout = QHBoxLayout()
+        button_layout.setSpacing(10)
+        save_btn = StyledButton("حفظ المهمة", "success")
+        cancel_btn = StyledButton("إلغاء", "secondary")
+        save_btn.setMinimumHeight(40)
+        cancel_btn.setMinimumHeight(40)
+        save_btn.clicked.connect(self.accept)
+        cancel_btn.clicked.connect(self.reject)
+        button_layout.addWidget(save_btn)
+        button_layout.addWidget(cancel_btn)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
+        
+    def get_data(self):
+        status_reverse_map = {"قيد الانتظار": "pending", "قيد الإنجاز": "in_progress", "مكتملة": "completed"}
+        due_at = None
+        if self.due_check.isChecked():
+            due_at = self.due_input.dateTime().toUTC().toString("yyyy-MM-dd HH:mm:00")
+            # Unchanged deadlines keep their seconds, so the edit is not mistaken for a change.
+            if self.task and self.task.due_at and self.task.due_at[:16] == due_at[:16]:
+                due_at = self.task.due_at
+        return {
+            'title': self.title_input.text(),
+            'description': self.desc_input.toPlainText(),
+            'category': self.category_input.currentText(),
+            'status': status_reverse_map.get(getattr(self, 'status_combo', None) and self.status_combo.currentText(), "pending"),
+            'due_at': due_at
+        }
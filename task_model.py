@@ -0,0 +1,596 @@
+import string
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from PyQt5.QtWidgets import QApplication, QStyledItemDelegate, QStyleOptionViewItem, QStyle
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QRect, QEvent, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QPainter
+import db
+import diagnostics
+import theme
+from repository import task_from_row
+from workers import QueryWorker
+
+STATUS_LABELS = {"pending": "قيد الانتظار", "in_progress": "قيد الإنجاز", "completed": "مكتملة"}
+DUE_LABELS = {"overdue": "متأخرة", "due_soon": f"خلال {db.DUE_SOON_HOURS} ساعة"}
+DUE_COLORS = {"overdue": "#e74c3c", "due_soon": "#e67e22"}
+
+(COLUMN_ID, COLUMN_TITLE, COLUMN_DESCRIPTION, COLUMN_CATEGORY, COLUMN_STATUS, COLUMN_DUE, COLUMN_CREATED,
+ COLUMN_UPDATED, COLUMN_ACTIONS) = range(9)
+# Header clicks sort by these db.SORTS keys; the other columns do not sort.
+SORT_COLUMNS = {COLUMN_ID: 'id', COLUMN_TITLE: 'title', COLUMN_CATEGORY: 'category', COLUMN_STATUS: 'status',
+                COLUMN_CREATED: 'created', COLUMN_UPDATED: 'updated'}
+
+TaskIdRole = Qt.UserRole + 1
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+# The value of each db.SORT_TERMS term (and the due order's) for a Task, compared the way SQLite
+# compares them; COLLATE NOCASE folds ASCII letters only. SQL NULLs sort first, like ''.
+SORT_VALUES = {
+    db.SORT_TERMS['title'][0]: lambda task, store: db.fold_text(task.title).translate(_ASCII_LOWER),
+    db.SORT_TERMS['category'][0]:
+        lambda task, store: 0 if not task.category else store.category_id(task.category) or float('inf'),
+    't.status': lambda task, store: db.status_code(task.status),
+    't.created_at': lambda task, store: task.created_at or '',
+    't.updated_at': lambda task, store: task.updated_at or '',
+    't.due_at': lambda task, store: task.due_at or '',
+}
+
+
+@lru_cache(maxsize=4096)
+def format_time(timestamp):
+    # Timestamps are stored in UTC and shown in local time.
+    try:
+        value = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return timestamp
+    return value.astimezone().strftime("%Y-%m-%d %H:%M")
+
+
+class TaskTableModel(QAbstractTableModel):
+    HEADERS = ["#", "العنوان", "الوصف", "التصنيف", "الحالة", "الموعد", "الإنشاء", "آخر تعديل", "الإجراءات"]
+    PAGE_SIZE = 500
+    CHUNK_SIZE = 100
+
+    query_failed = pyqtSignal(str)
+    loading_changed = pyqtSignal(bool)
+    page_changed = pyqtSignal(int, bool, bool)
+    task_located = pyqtSignal(int)
+
+    def __init__(self, repository, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.repository.task_inserted.connect(self._on_task_inserted)
+        self.repository.task_updated.connect(self._on_task_updated)
+        self.repository.task_removed.connect(self._on_task_removed)
+        self.repository.task_replaced.connect(self._on_task_replaced)
+        self.repository.tasks_updated.connect(self._on_tasks_updated)
+        self.repository.tasks_removed.connect(self._on_tasks_removed)
+        self._tasks = []
+        self._snippets = {}
+        self._archived = set()
+        self._filters = {'category': None, 'status': None, 'text': None, 'include_archive': False, 'due': None}
+        self._order = None
+        self._page_starts = [None]
+        self._first_page = 1
+        self._anchor_id = None
+        self._next_cursor = None
+        self._loading = False
+        self._generation = 0
+        self._reset_pending = False
+        self._load_started = 0.0
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._white = theme.color("white")
+        self._archived_color = theme.color("#95a5a6")
+        self._strike_font = theme.font(strike_out=True)
+        self._due_colors = {state: theme.color(value) for state, value in DUE_COLORS.items()}
+
+    def set_filters(self, category=None, status=None, text=None, include_archive=False, due=None):
+        self._filters = {'category': category, 'status': status, 'text': text, 'include_archive': include_archive,
+                         'due': due}
+        self._page_starts = [None]
+        self._first_page = 1
+        self._anchor_id = None
+        self._load_page()
+
+    def order(self):
+        return self._order
+
+    def set_order(self, order, anchor_id=None):
+        # order is one of db.ORDERINGS, or None for newest first (nearest deadline first under a
+        # due filter, best match first in search). The page shown afterwards is the one the anchor
+        # task lands on in the new order; without an anchor, and for search, it is the first.
+        self._order = order
+        self._anchor_id = None
+        if anchor_id is None or anchor_id < 0 or self._filters['text']:
+            self._page_starts = [None]
+            self._first_page = 1
+            self._load_page()
+            return
+        self._anchor_id = anchor_id
+        filters = dict(self._filters)
+        store = self.repository.store
+        self._start_lookup(lambda: store.locate_task(anchor_id, filters['category'], filters['status'],
+                                                     self.PAGE_SIZE, filters['due'], order), self._on_located)
+
+    def refresh(self):
+        self._load_page()
+
+    def sync(self):
+        # Re-read the rows on screen after another process changed the database, and apply
+        # the differences row by row so the scroll position and selection survive.
+        if self._loading or self._reset_pending:
+            return
+        limit = min(max(len(self._tasks), self.CHUNK_SIZE), self.PAGE_SIZE)
+        self._start_query(self._page_starts[-1], limit, self._on_synced)
+
+    def page_number(self):
+        # After a re-sort the first known page can be further in than page 1.
+        return self._first_page + len(self._page_starts) - 1
+
+    def has_previous_page(self):
+        return self.page_number() > 1
+
+    def has_next_page(self):
+        return self._next_cursor is not None and len(self._tasks) >= self.PAGE_SIZE
+
+    def next_page(self):
+        if self.has_next_page() and not self._loading:
+            self._page_starts.append(self._next_cursor)
+            self._load_page()
+
+    def previous_page(self):
+        if len(self._page_starts) > 1:
+            self._page_starts.pop()
+            self._load_page()
+        elif self.has_previous_page() and not self._loading:
+            # A page nobody has walked through yet: read its start backwards from this one.
+            filters, order, cursor = dict(self._filters), self._order, self._page_starts[0]
+            store = self.repository.store
+            self._start_lookup(lambda: store.previous_page_cursor(cursor, filters['category'], filters['status'],
+                                                                  self.PAGE_SIZE, filters['due'], order),
+                               self._on_previous_found)
+
+    def first_page(self):
+        if self.has_previous_page():
+            self._page_starts = [None]
+            self._first_page = 1
+            self._load_page()
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def _load_page(self):
+        self._generation += 1
+        self._load_started = time.perf_counter()
+        self._reset_pending = True
+        self._pool.clear()
+        self._request_chunk(self._page_starts[-1], 0)
+
+    def _start_lookup(self, fetch, on_loaded):
+        # Finds where a page starts; the page itself loads once the answer is back.
+        self._generation += 1
+        self._pool.clear()
+        worker = QueryWorker(self.repository.store, self._generation, fetch, self.is_current)
+        worker.signals.finished.connect(on_loaded)
+        worker.signals.failed.connect(self._on_chunk_failed)
+        self._set_loading(True)
+        self._pool.start(worker)
+
+    def _on_located(self, generation, located):
+        if not self.is_current(generation):
+            return
+        self._set_loading(False)
+        if located is None:
+            # Filtered out meanwhile: start from the top.
+            self._anchor_id = None
+            located = (1, None)
+        self._first_page, start = located
+        self._page_starts = [start]
+        self._load_page()
+
+    def _on_previous_found(self, generation, cursor):
+        if not self.is_current(generation):
+            return
+        self._set_loading(False)
+        self._page_starts = [cursor]
+        self._first_page = 1 if cursor is None else self._first_page - 1
+        self._load_page()
+
+    def _request_chunk(self, cursor, loaded):
+        self._start_query(cursor, min(self.CHUNK_SIZE, self.PAGE_SIZE - loaded), self._on_chunk_loaded)
+
+    def _start_query(self, cursor, limit, on_loaded):
+        filters = dict(self._filters)
+        order = self._order
+        store = self.repository.store
+        
+        def fetch():
+            if filters['text']:
+                # Ranked search results have no stable key, so they page by offset.
+                offset = cursor or 0
+                rows = store.search_tasks(filters['text'], filters['category'], filters['status'],
+                                          limit=limit + 1, offset=offset, start_mark="«", end_mark="»",
+                                          include_archive=filters['include_archive'], due=filters['due'],
+                                          order=order)
+                next_cursor = offset + limit if len(rows) > limit else None
+                archived = {row['id'] for row in rows[:limit] if row['archived']}
+                return [(task_from_row(row), row['snippet']) for row in rows[:limit]], next_cursor, archived
+            rows, next_cursor = store.get_tasks_page(filters['category'], filters['status'], cursor, limit,
+                                                     filters['due'], order)
+            return [(task_from_row(row), None) for row in rows], next_cursor, set()
+        
+        worker = QueryWorker(store, self._generation, fetch, self.is_current)
+        worker.signals.finished.connect(on_loaded)
+        worker.signals.failed.connect(self._on_chunk_failed)
+        self._set_loading(True)
+        self._pool.start(worker)
+
+    def _set_loading(self, loading):
+        if loading != self._loading:
+            self._loading = loading
+            self.loading_changed.emit(loading)
+
+    def _on_chunk_loaded(self, generation, result):
+        if not self.is_current(generation):
+            return
+        results, self._next_cursor, archived = result
+        self._set_loading(False)
+        tasks = [task for task, _ in results]
+        started = time.perf_counter()
+        reset = self._reset_pending
+        self.repository.remember(tasks)
+        if reset:
+            self._reset_pending = False
+            self.beginResetModel()
+            self._tasks = tasks
+            self._snippets = {}
+            self._snippets.update((task.id, snippet) for task, snippet in results if snippet)
+            self._archived = archived
+            self.endResetModel()
+        elif tasks:
+            self._snippets.update((task.id, snippet) for task, snippet in results if snippet)
+            self._archived |= archived
+            first = len(self._tasks)
+            self.beginInsertRows(QModelIndex(), first, first + len(tasks) - 1)
+            self._tasks.extend(tasks)
+            self.endInsertRows()
+        populated = time.perf_counter()
+        diagnostics.record("load.populate", (populated - started) * 1000, len(tasks))
+        if reset and diagnostics.enabled():
+            # Runs once the event loop is free again, after the view has laid out the new rows.
+            QTimer.singleShot(0, lambda: self._record_shown(generation, populated))
+        self.page_changed.emit(self.page_number(), self.has_previous_page(), self.has_next_page())
+        if self._anchor_id is not None:
+            # Keep reading chunks until the re-sorted page reaches the task the view was on.
+            row = self._row_of(self._anchor_id)
+            if row is not None:
+                self._anchor_id = None
+                self.task_located.emit(row)
+            elif self.canFetchMore(QModelIndex()):
+                self.fetchMore(QModelIndex())
+            else:
+                self._anchor_id = None
+
+    def _record_shown(self, generation, populated):
+        if self.is_current(generation):
+            now = time.perf_counter()
+            diagnostics.record("load.layout", (now - populated) * 1000)
+            diagnostics.record("load.total", (now - self._load_started) * 1000, len(self._tasks))
+
+    def _on_synced(self, generation, result):
+        if not self.is_current(generation):
+            return
+        results, self._next_cursor, archived = result
+        self._set_loading(False)
+        tasks = [task for task, _ in results]
+        self.repository.remember(tasks)
+        self._snippets.update((task.id, snippet) for task, snippet in results if snippet)
+        self._archived |= archived
+        
+        ids = {task.id for task in tasks}
+        for row in reversed(range(len(self._tasks))):
+            # Provisional rows (negative ids) are still on their way to the database.
+            if self._tasks[row].id > 0 and self._tasks[row].id not in ids:
+                self._on_task_removed(self._tasks[row].id)
+        row = 0
+        for task in tasks:
+            while row < len(self._tasks) and self._tasks[row].id < 0:
+                row += 1
+            if row < len(self._tasks) and self._tasks[row].id == task.id:
+                if self._tasks[row] != task:
+                    self._tasks[row] = task
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            elif self._row_of(task.id) is not None:
+                # The order itself changed; a reset is simpler than moving rows around.
+                self.beginResetModel()
+                self._tasks = tasks
+                self.endResetModel()
+                break
+            else:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._tasks.insert(row, task)
+                self.endInsertRows()
+            row += 1
+        self.page_changed.emit(self.page_number(), self.has_previous_page(), self.has_next_page())
+
+    def _on_chunk_failed(self, generation, message):
+        if not self.is_current(generation):
+            return
+        self._set_loading(False)
+        self._next_cursor = None
+        self.query_failed.emit(message)
+
+    def _row_of(self, task_id):
+        for row, task in enumerate(self._tasks):
+            if task.id == task_id:
+                return row
+        return None
+
+    def _matches(self, task):
+        if self._filters['category'] and task.category != self._filters['category']:
+            return False
+        if self._filters['status'] and task.status != self._filters['status']:
+            return False
+        if self._filters['due'] and db.due_state(task.due_at, task.status) != self._filters['due']:
+            return False
+        if self._filters['text']:
+            haystack = db.fold_text(f"{task.title} {task.description or ''}").lower()
+            return all(word in haystack for word in db.fold_text(self._filters['text']).lower().split())
+        return True
+
+    def _sort_key(self, task, terms):
+        # The (terms..., id) key the page query orders by, computed in Python. A provisional task
+        # will get the highest id, so it goes after every saved task with the same values.
+        store = self.repository.store
+        return tuple(SORT_VALUES[term](task, store) for term in terms) + (task.id if task.id > 0 else float('inf'),)
+
+    def _insert_row(self, task):
+        # The row the task takes among the loaded ones, or None when it belongs to another page.
+        if self._filters['text'] and self._order is None:
+            # Best match first has no key to compare; the new task goes on top of the first page.
+            return None if self.has_previous_page() else 0
+        terms, descending = db.ordering(self._order, self._filters['due'], self._filters['category'],
+                                         self._filters['status'])
+        key = self._sort_key(task, terms)
+        for row, other in enumerate(self._tasks):
+            other_key = self._sort_key(other, terms)
+            if (key > other_key) if descending else (key < other_key):
+                # Before the first loaded row of a later page means an earlier page.
+                return None if row == 0 and self.has_previous_page() else row
+        # Past the last loaded row: the next chunk will bring it, unless this is the end of the list.
+        return len(self._tasks) if self._next_cursor is None else None
+
+    def _on_task_inserted(self, task):
+        if self._row_of(task.id) is not None:
+            self._on_task_updated(task)
+            return
+        if not self._matches(task):
+            return
+        row = self._insert_row(task)
+        if row is None:
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._tasks.insert(row, task)
+        self.endInsertRows()
+
+    def _on_task_updated(self, task):
+        # Only live tasks are ever updated, so a restored archive row stops being marked.
+        self._archived.discard(task.id)
+        row = self._row_of(task.id)
+        if row is None:
+            return
+        if not self._matches(task):
+            self._on_task_removed(task.id)
+            return
+        self._tasks[row] = task
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def _on_task_replaced(self, old_id, task):
+        row = self._row_of(old_id)
+        if row is None:
+            return
+        self._tasks[row] = task
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def _on_task_removed(self, task_id):
+        row = self._row_of(task_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._tasks[row]
+        self._snippets.pop(task_id, None)
+        self.endRemoveRows()
+
+    def _on_tasks_updated(self, tasks):
+        rows = {task.id: row for row, task in enumerate(self._tasks)}
+        changed = []
+        hidden = []
+        for task in tasks:
+            self._archived.discard(task.id)
+            row = rows.get(task.id)
+            if row is None:
+                continue
+            if self._matches(task):
+                self._tasks[row] = task
+                changed.append(row)
+            else:
+                hidden.append(task.id)
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 0), self.index(max(changed), self.columnCount() - 1))
+        self._on_tasks_removed(hidden)
+
+    def _on_tasks_removed(self, task_ids):
+        task_ids = set(task_ids)
+        rows = [row for row, task in enumerate(self._tasks) if task.id in task_ids]
+        # Remove contiguous runs from the bottom up, so earlier row numbers stay valid.
+        while rows:
+            last = rows.pop()
+            first = last
+            while rows and rows[-1] == first - 1:
+                first = rows.pop()
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for task in self._tasks[first:last + 1]:
+                self._snippets.pop(task.id, None)
+            del self._tasks[first:last + 1]
+            self.endRemoveRows()
+
+    def canFetchMore(self, parent):
+        return (not parent.isValid() and not self._loading and self._next_cursor is not None
+                and len(self._tasks) < self.PAGE_SIZE)
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        self._request_chunk(self._next_cursor, len(self._tasks))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._tasks)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        if orientation == Qt.Horizontal and role == Qt.InitialSortOrderRole:
+            # The first click on a date column shows the newest first.
+            return Qt.DescendingOrder if section in (COLUMN_CREATED, COLUMN_UPDATED) else Qt.AscendingOrder
+        return None
+
+    def task_at(self, row):
+        return self._tasks[row]
+
+    def is_archived(self, task_id):
+        return task_id in self._archived
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self._tasks[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == COLUMN_ID:
+                return str(task.id)
+            if column == COLUMN_TITLE:
+                return task.title
+            if column == COLUMN_DESCRIPTION:
+                desc = task.description or ""
+                if len(desc) > 60:
+                    desc = desc[:57] + "..."
+                return desc
+            if column == COLUMN_CATEGORY:
+                return task.category
+            if column == COLUMN_STATUS:
+                return STATUS_LABELS.get(task.status, "قيد الانتظار")
+            if column == COLUMN_DUE:
+                return format_time(task.due_at) if task.due_at else ""
+            if column == COLUMN_CREATED:
+                return format_time(task.created_at) if task.created_at else ""
+            if column == COLUMN_UPDATED:
+                return format_time(task.updated_at) if task.updated_at else ""
+            return None
+        if role == TaskIdRole:
+            return task.id
+        if role == Qt.ToolTipRole:
+            if column in (COLUMN_TITLE, COLUMN_DESCRIPTION):
+                snippet = self._snippets.get(task.id)
+                if task.id in self._archived:
+                    return f"مؤرشفة\n{snippet}" if snippet else "مؤرشفة"
+                return snippet
+            return None
+        if role == Qt.TextAlignmentRole:
+            if column in (COLUMN_ID, COLUMN_CATEGORY, COLUMN_STATUS, COLUMN_DUE, COLUMN_CREATED, COLUMN_UPDATED):
+                return Qt.AlignCenter
+            return None
+        if role == Qt.BackgroundRole:
+            if column == COLUMN_CATEGORY:
+                return theme.category_color(self.repository.store, task.category)
+            if column == COLUMN_STATUS:
+                return theme.status_color(task.status)
+            return None
+        if role == Qt.ForegroundRole:
+            if column in (COLUMN_CATEGORY, COLUMN_STATUS):
+                return self._white
+            if task.id in self._archived:
+                return self._archived_color
+            if column == COLUMN_DUE:
+                return self._due_colors.get(db.due_state(task.due_at, task.status))
+            return None
+        if role == Qt.FontRole:
+            if task.status == 'completed' and column != COLUMN_ACTIONS:
+                return self._strike_font
+            return None
+        return None
+
+
+class TaskBadgeDelegate(QStyledItemDelegate):
+    def paint(self, painter, option, index):
+        # The view's own cell background first, so selected rows show their highlight around the badge.
+        item_option = QStyleOptionViewItem(option)
+        self.initStyleOption(item_option, index)
+        item_option.text = ""
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, item_option, painter, option.widget)
+        painter.save()
+        inset = 3 if option.state & QStyle.State_Selected else 1
+        painter.fillRect(option.rect.adjusted(inset, inset, -inset, -inset), index.data(Qt.BackgroundRole))
+        painter.setPen(index.data(Qt.ForegroundRole))
+        font = index.data(Qt.FontRole)
+        if font is not None:
+            painter.setFont(font)
+        painter.drawText(option.rect, Qt.AlignCenter, index.data(Qt.DisplayRole))
+        painter.restore()
+
+
+class TaskActionsDelegate(QStyledItemDelegate):
+    edit_requested = pyqtSignal(int)
+    delete_requested = pyqtSignal(int)
+
+    BUTTON_WIDTH = 35
+    BUTTON_SPACING = 5
+    MARGIN = 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._edit_color = theme.color(theme.BUTTON_VARIANTS["primary"][0])
+        self._delete_color = theme.color(theme.BUTTON_VARIANTS["danger"][0])
+        self._text_color = theme.color("white")
+        self._font = theme.font("Arial", 11, QFont.Bold)
+
+    def _button_rects(self, rect):
+        top = rect.top() + self.MARGIN
+        height = rect.height() - 2 * self.MARGIN
+        edit_rect = QRect(rect.left() + self.MARGIN, top, self.BUTTON_WIDTH, height)
+        delete_rect = QRect(edit_rect.right() + self.BUTTON_SPACING, top, self.BUTTON_WIDTH, height)
+        return edit_rect, delete_rect
+
+    def paint(self, painter, option, index):
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        edit_rect, delete_rect = self._button_rects(option.rect)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setFont(self._font)
+        for rect, color, text in ((edit_rect, self._edit_color, "✎"), (delete_rect, self._delete_color, "✕")):
+            painter.setBrush(color)
+            painter.drawRoundedRect(rect, 4, 4)
+            painter.setPen(self._text_color)
+            painter.drawText(rect, Qt.AlignCenter, text)
+            painter.setPen(Qt.NoPen)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            edit_rect, delete_rect = self._button_rects(option.rect)
+            task_id = index.data(TaskIdRole)
+            if edit_rect.contains(event.pos()):
+                self.edit_requested.emit(task_id)
+                return True
+            if delete_rect.contains(event.pos()):
+                self.delete_requested.emit(task_id)
+                return True
+        return super().editorEvent(event, model, option, index)
@@ -0,0 +1,187 @@
+from PyQt5.QtWidgets import QApplication, QPushButton
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QFont
+
+STATUS_COLORS = {
+    "pending": "#e74c3c",
+    "in_progress": "#f39c12",
+    "completed": "#27ae60"
+}
+
+DEFAULT_COLOR = "#95a5a6"
+
+# variant: (background, hover, pressed, padding, font-size)
+BUTTON_VARIANTS = {
+    "primary": ("#3498db", "#2980b9", "#1f618d", "8px 16px", "13px"),
+    "success": ("#27ae60", "#229954", "#1e8449", "8px 16px", None),
+    "danger": ("#e74c3c", "#c0392b", "#a93226", "8px 12px", "12px"),
+    "secondary": ("#34495e", "#2c3e50", "#1a252f", "8px 12px", "12px"),
+}
+
+BASE_STYLESHEET = """
+    QMainWindow {
+        background-color: #f8f9fa;
+    }
+    QWidget#centralWidget {
+        background-color: #f8f9fa;
+    }
+    QFrame#headerFrame {
+        background-color: #ecf0f1;
+        border-radius: 8px;
+        border: 1px solid #bdc3c7;
+    }
+    QFrame#dashboardFrame {
+        background-color: #fff;
+        border-radius: 8px;
+        border: 1px solid #ecf0f1;
+    }
+    QFrame#controlsFrame {
+        background-color: #fff;
+        border-radius: 8px;
+        border: 1px solid #ecf0f1;
+    }
+    QTableView {
+        border: 1px solid #ecf0f1;
+        border-radius: 6px;
+        background-color: white;
+        alternate-background-color: #f8f9fa;
+        gridline-color: #ecf0f1;
+    }
+    QTableView::item {
+        padding: 5px;
+        border: none;
+    }
+    QTableView::item:selected {
+        background-color: #3498db;
+        color: white;
+    }
+    QHeaderView::section {
+        background-color: #34495e;
+        color: white;
+        padding: 8px;
+        border: none;
+        font-weight: bold;
+    }
+    QComboBox {
+        border: 2px solid #bdc3c7;
+        border-radius: 4px;
+        padding: 4px;
+        background-color: white;
+    }
+    QComboBox:focus {
+        border: 2px solid #3498db;
+    }
+    QLineEdit {
+        border: 2px solid #bdc3c7;
+        border-radius: 4px;
+        padding: 6px;
+        background-color: white;
+    }
+    QLineEdit:focus {
+        border: 2px solid #3498db;
+    }
+    QDialog#taskDialog {
+        background-color: #ecf0f1;
+    }
+    QDialog#taskDialog QLineEdit, QDialog#taskDialog QTextEdit {
+        border: 2px solid #bdc3c7;
+        border-radius: 4px;
+        padding: 8px;
+        font-size: 12px;
+        background-color: white;
+    }
+    QDialog#taskDialog QComboBox {
+        border: 2px solid #bdc3c7;
+        border-radius: 4px;
+        padding: 6px;
+        font-size: 12px;
+        background-color: white;
+    }
+    QDialog#taskDialog QLineEdit:focus, QDialog#taskDialog QTextEdit:focus, QDialog#taskDialog QComboBox:focus {
+        border: 2px solid #3498db;
+    }
+"""
+
+_stylesheet = None
+_colors = {}
+_fonts = {}
+
+
+def _button_rules(variant, background, hover, pressed, padding, font_size):
+    selector = f'QPushButton[variant="{variant}"]'
+    font_rule = f"font-size: {font_size};" if font_size else ""
+    return f"""
+    {selector} {{
+        background-color: {background};
+        color: white;
+        border: none;
+        padding: {padding};
+        border-radius: 4px;
+        font-weight: bold;
+        {font_rule}
+    }}
+    {selector}:hover {{
+        background-color: {hover};
+    }}
+    {selector}:pressed {{
+        background-color: {pressed};
+    }}
+"""
+
+
+def stylesheet():
+    global _stylesheet
+    if _stylesheet is None:
+        rules = [_button_rules(variant, *values) for variant, values in BUTTON_VARIANTS.items()]
+        _stylesheet = BASE_STYLESHEET + "".join(rules)
+    return _stylesheet
+
+
+def apply_theme(app=None):
+    app = app or QApplication.instance()
+    if app.property("themeApplied"):
+        return
+    app.setStyleSheet(stylesheet())
+    app.setProperty("themeApplied", True)
+
+
+def color(value):
+    cached = _colors.get(value)
+    if cached is None:
+        cached = _colors[value] = QColor(value)
+    return cached
+
+
+def category_color(store, category):
+    return color(store.category_color(category) or DEFAULT_COLOR)
+
+
+def status_color(status):
+    return color(STATUS_COLORS.get(status, DEFAULT_COLOR))
+
+
+def font(family=None, size=-1, weight=-1, strike_out=False):
+    key = (family, size, weight, strike_out)
+    cached = _fonts.get(key)
+    if cached is None:
+        cached = QFont(family) if family else QFont()
+        if size > 0:
+            cached.setPointSize(size)
+        if weight >= 0:
+            cached.setWeight(weight)
+        cached.setStrikeOut(strike_out)
+        _fonts[key] = cached
+    return cached
+
+
+class StyledButton(QPushButton):
+    def __init__(self, text, style_type="primary"):
+        super().__init__(text)
+        self.style_type = style_type
+        self.apply_style()
+        
+    def apply_style(self):
+        self.setProperty("variant", self.style_type)
+        if self.testAttribute(Qt.WA_WState_Polished):
+            self.style().unpolish(self)
+            self.style().polish(self)
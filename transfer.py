@@ -0,0 +1,168 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+import db
+
+EXPORT_FIELDS = ['id'] + db.TASK_FIELDS
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_csv(path, tasks):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_FIELDS)
+        for task in tasks:
+            writer.writerow([task[field] for field in EXPORT_FIELDS])
+            yield
+
+
+def write_jsonl(path, tasks):
+    with open(path, 'w', encoding='utf-8') as f:
+        for task in tasks:
+            f.write(json.dumps({field: task[field] for field in EXPORT_FIELDS}, ensure_ascii=False) + "\n")
+            yield
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('json', 'ndjson'):
+        return 'jsonl'
+    if extension not in READERS:
+        raise SystemExit(f"Cannot guess the format of {path}, use --format csv|jsonl")
+    return extension
+
+
+def clean_records(records, start):
+    for line, record in enumerate(records, start=start + 1):
+        title = (record.get('title') or "").strip()
+        if not title:
+            raise ValueError(f"Record {line} has no title")
+        yield {
+            'title': title,
+            'description': record.get('description') or "",
+            'category': record.get('category') or "عام",
+            'status': record.get('status') or None,
+            'created_at': record.get('created_at') or None,
+            'updated_at': record.get('updated_at') or None,
+            'due_at': record.get('due_at') or None,
+        }
+
+
+class Progress:
+    def __init__(self, label, offset=0):
+        self.label = label
+        self.offset = offset
+        self.start = time.perf_counter()
+        self.count = 0
+
+    def update(self, count):
+        self.count = count
+        elapsed = time.perf_counter() - self.start
+        rate = count / elapsed if elapsed else 0
+        sys.stderr.write(f"\r{self.label}: {self.offset + count} rows ({rate:,.0f} rows/s)")
+        sys.stderr.flush()
+
+    def finish(self):
+        self.update(self.count)
+        sys.stderr.write("\n")
+
+
+def checkpoint_path(source):
+    return source + ".checkpoint"
+
+
+def read_checkpoint(source):
+    try:
+        with open(checkpoint_path(source), encoding='utf-8') as f:
+            return json.load(f)['rows']
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(source, rows):
+    path = checkpoint_path(source)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({'rows': rows}, f)
+    os.replace(path + ".tmp", path)
+
+
+def import_tasks(args):
+    fmt = detect_format(args.source, args.format)
+    skip = read_checkpoint(args.source) if args.resume else 0
+    records = itertools.islice(READERS[fmt](args.source), skip, None)
+    progress = Progress("Imported", skip)
+
+    def on_chunk(count):
+        write_checkpoint(args.source, skip + count)
+        progress.update(count)
+
+    try:
+        db.bulk_insert(clean_records(records, skip), chunk_size=args.chunk_size, progress=on_chunk)
+    except (ValueError, OSError, db.sqlite3.Error) as e:
+        progress.finish()
+        committed = read_checkpoint(args.source)
+        raise SystemExit(f"Import failed after {committed} rows: {e}\nRun again with --resume to continue.")
+    progress.finish()
+    if os.path.exists(checkpoint_path(args.source)):
+        os.remove(checkpoint_path(args.source))
+
+
+def export_tasks(args):
+    fmt = detect_format(args.destination, args.format)
+    progress = Progress("Exported")
+    for count, _ in enumerate(WRITERS[fmt](args.destination, db.iter_tasks()), start=1):
+        if count % args.chunk_size == 0:
+            progress.update(count)
+    progress.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream tasks in and out of the task database")
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--busy-timeout", type=int, default=db.BUSY_TIMEOUT_MS,
+                        help="milliseconds to wait for other processes holding the write lock (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="import tasks from a CSV or JSON Lines file")
+    import_parser.add_argument("source")
+    import_parser.add_argument("--format", choices=sorted(READERS))
+    import_parser.add_argument("--chunk-size", type=int, default=db.BULK_CHUNK_SIZE)
+    import_parser.add_argument("--resume", action="store_true", help="skip the chunks committed by a failed run")
+    import_parser.set_defaults(handler=import_tasks)
+
+    export_parser = subparsers.add_parser("export", help="export all tasks to a CSV or JSON Lines file")
+    export_parser.add_argument("destination")
+    export_parser.add_argument("--format", choices=sorted(WRITERS))
+    export_parser.add_argument("--chunk-size", type=int, default=db.BULK_CHUNK_SIZE)
+    export_parser.set_defaults(handler=export_tasks)
+
+    args = parser.parse_args()
+    db.DB_PATH = args.db
+    db.BUSY_TIMEOUT_MS = args.busy_timeout
+    db.init_db()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
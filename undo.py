@@ -0,0 +1,85 @@
+from PyQt5.QtWidgets import QUndoCommand
+
+UNDO_LIMIT = 100
+
+
+# Each command goes through the repository, so undo and redo are optimistic writes like any other.
+# Tasks are put back with restore_task(), which keeps their id and therefore later commands valid.
+
+class AddTaskCommand(QUndoCommand):
+    def __init__(self, repository, title, description, category, due_at=None):
+        super().__init__(f"إضافة «{title}»")
+        self.repository = repository
+        self.fields = (title, description, category, due_at)
+        self.task = None
+
+    def redo(self):
+        if self.task is None:
+            self.task = self.repository.add_task(*self.fields)
+            self.repository.task_replaced.connect(self._on_replaced)
+        else:
+            self.repository.restore_task(self.task)
+
+    def undo(self):
+        self.repository.delete_task(self.task.id)
+
+    def _on_replaced(self, old_id, task):
+        # Follow the provisional id to the one the database assigned.
+        if old_id == self.task.id:
+            self.task = task
+            self.repository.task_replaced.disconnect(self._on_replaced)
+
+
+class EditTaskCommand(QUndoCommand):
+    def __init__(self, repository, before, after):
+        super().__init__(f"تعديل «{before.title}»")
+        self.repository = repository
+        self.before = before
+        self.after = after
+
+    def redo(self):
+        self.repository.restore_task(self.after)
+
+    def undo(self):
+        self.repository.restore_task(self.before)
+
+
+class DeleteTaskCommand(QUndoCommand):
+    def __init__(self, repository, task):
+        super().__init__(f"حذف «{task.title}»")
+        self.repository = repository
+        self.task = task
+
+    def redo(self):
+        self.repository.delete_task(self.task.id)
+
+    def undo(self):
+        self.repository.restore_task(self.task)
+
+
+class BulkUpdateCommand(QUndoCommand):
+    def __init__(self, repository, tasks, category="", status=""):
+        super().__init__(f"تعديل {len(tasks)} مهمة")
+        self.repository = repository
+        self.tasks = tasks
+        self.category = category
+        self.status = status
+
+    def redo(self):
+        self.repository.update_tasks(self.tasks, self.category, self.status)
+
+    def undo(self):
+        self.repository.restore_tasks(self.tasks)
+
+
+class BulkDeleteCommand(QUndoCommand):
+    def __init__(self, repository, tasks):
+        super().__init__(f"حذف {len(tasks)} مهمة")
+        self.repository = repository
+        self.tasks = tasks
+
+    def redo(self):
+        self.repository.delete_tasks(self.tasks)
+
+    def undo(self):
+        self.repository.restore_tasks(self.tasks)
@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+import time
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+import db
+import diagnostics
+
+
+class QuerySignals(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+
+class QueryWorker(QRunnable):
+    def __init__(self, store, generation, fetch, is_current):
+        super().__init__()
+        self.store = store
+        self.generation = generation
+        self.fetch = fetch
+        self.is_current = is_current
+        self.signals = QuerySignals()
+        self.queued_at = time.perf_counter()
+
+    def run(self):
+        if not self.is_current(self.generation):
+            return
+        started = time.perf_counter()
+        diagnostics.record("load.wait", (started - self.queued_at) * 1000)
+        try:
+            # Interrupt the query as soon as a newer generation has been requested.
+            with self.store.interruptible(lambda: not self.is_current(self.generation)):
+                result = self.fetch()
+        except Exception as e:
+            # Any failure is reported, or the model would wait for this result forever.
+            if self.is_current(self.generation):
+                self.signals.failed.emit(self.generation, str(e))
+            return
+        diagnostics.record("load.fetch", (time.perf_counter() - started) * 1000, diagnostics.row_count(result))
+        self.signals.finished.emit(self.generation, result)
+
+
+class BackupSignals(QObject):
+    progress = pyqtSignal(str, int, int)
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+
+class BackupWorker(QRunnable):
+    # Runs backup.create_snapshot or backup.restore_snapshot off the GUI thread. The backup API
+    # yields between steps, so cancel() takes effect after at most one step.
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = BackupSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        # Imported here so the backup module stays off the startup path.
+        import backup
+        try:
+            result = self.func(*self.args, progress=self.signals.progress.emit, cancelled=self.is_cancelled,
+                               **self.kwargs)
+        except backup.BackupCancelled:
+            self.signals.cancelled.emit()
+            return
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self.signals.failed.emit(str(e))
+            return
+        finally:
+            # Pool threads are reused; their connection would otherwise hold the files open.
+            db.close_connection()
+        self.signals.finished.emit(result)
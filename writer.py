@@ -0,0 +1,263 @@
+import itertools
+import queue
+import threading
+import time
+from PyQt5.QtCore import QObject, pyqtSignal
+import db
+from store import SQLiteStore
+
+BATCH_WINDOW = 0.005
+MAX_BATCH = 500
+WATCH_INTERVAL = 1.0
+
+_STOP = object()
+
+
+class WriteQueue(QObject):
+    completed = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    external_change = pyqtSignal()
+
+    def __init__(self, parent=None, store=None):
+        super().__init__(parent)
+        self.store = store if store is not None else SQLiteStore()
+        self._queue = queue.Queue()
+        self._tokens = itertools.count(1)
+        self._data_version = None
+        self._last_watch = 0.0
+        self._thread = threading.Thread(target=self._run, name="task-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args):
+        token = next(self._tokens)
+        self._queue.put((token, func, args))
+        return token
+
+    def wait(self):
+        self._queue.join()
+
+    def stop(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _watch(self):
+        now = time.monotonic()
+        if now - self._last_watch < WATCH_INTERVAL:
+            return
+        self._last_watch = now
+        # data_version ignores this connection's own commits, so any change came from someone else.
+        try:
+            version = self.store.data_version()
+        except db.sqlite3.Error:
+            return
+        if self._data_version is not None and version != self._data_version:
+            self.external_change.emit()
+        self._data_version = version
+
+    def _next_batch(self):
+        while True:
+            self._watch()
+            try:
+                command = self._queue.get(timeout=WATCH_INTERVAL)
+                break
+            except queue.Empty:
+                pass
+        if command is _STOP:
+            return None
+        batch = [command]
+        # Commands that arrive within the window share one transaction and one commit.
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                command = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if command is _STOP:
+                self._queue.task_done()
+                self._queue.put(_STOP)
+                break
+            batch.append(command)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self._queue.task_done()
+                self.store.close()
+                return
+            try:
+                self._execute(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _run_batch(self, batch):
+        with self.store.transaction():
+            return [(token, func(*args)) for token, func, args in batch]
+
+    def _execute(self, batch):
+        try:
+            results = self.store.run_with_retry(self._run_batch, batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self.failed.emit(batch[0][0], str(e))
+                return
+            # Replay one by one so a bad command does not fail the commands grouped with it.
+            for command in batch:
+                self._execute([command])
+            return
+        for token, result in results:
+            self.completed.emit(token, result)
+
+
+class BackfillRunner(QObject):
+    # Finishes an upgrade after startup: the schema steps store.open(defer=True) left, then the
+    # deferred indexes, then the row backfills. progress reports the stage ('schema', 'index' or
+    # 'backfill') with its position and target; schema_ready fires once the tables match this version.
+    progress = pyqtSignal(str, int, int)
+    schema_ready = pyqtSignal()
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, writer, parent=None):
+        super().__init__(parent)
+        self.writer = writer
+        self._stage = None
+        self._pending = []
+        self._done = 0
+        self._token = None
+        self._stopped = False
+        writer.completed.connect(self._on_completed)
+        writer.failed.connect(self._on_failed)
+
+    def start(self):
+        self._stopped = False
+        self._start_stage('schema', self.writer.store.pending_migrations())
+
+    def stop(self):
+        self._stopped = True
+
+    def _start_stage(self, stage, pending):
+        self._stage = stage
+        self._pending = [list(item) if stage == 'backfill' else item for item in pending]
+        self._done = 0
+        if stage == 'index':
+            self.schema_ready.emit()
+        self._submit_next()
+
+    def _submit_next(self):
+        if self._stopped:
+            return
+        store = self.writer.store
+        # One step, index or batch at a time, so mutations queued in the meantime never wait for more than one.
+        if self._stage == 'schema' and self._pending:
+            self._token = self.writer.submit(store.apply_migration, self._pending[0])
+        elif self._stage == 'schema':
+            self._start_stage('index', store.pending_indexes())
+        elif self._stage == 'index' and self._pending:
+            self._token = self.writer.submit(store.build_index, self._pending[0])
+        elif self._stage == 'index':
+            self._start_stage('backfill', store.pending_backfills())
+        elif self._pending:
+            version, position, target = self._pending[0]
+            self._token = self.writer.submit(store.backfill_batch, version, position, target)
+        else:
+            self.finished.emit()
+
+    def _on_completed(self, token, result):
+        if token != self._token:
+            return
+        self._token = None
+        if self._stopped:
+            return
+        if self._stage == 'backfill':
+            backfill = self._pending[0]
+            backfill[1] = result
+            self.progress.emit(self._stage, result, backfill[2])
+            if result >= backfill[2]:
+                self._pending.pop(0)
+        else:
+            self._pending.pop(0)
+            self._done += 1
+            self.progress.emit(self._stage, self._done, self._done + len(self._pending))
+        self._submit_next()
+
+    def _on_failed(self, token, message):
+        if token != self._token:
+            return
+        self._token = None
+        self.failed.emit(message)
+
+
+class ArchiveRunner(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, writer, parent=None):
+        super().__init__(parent)
+        self.writer = writer
+        self._token = None
+        self._step = None
+        self._stopped = False
+        self._older_than_days = db.ARCHIVE_AFTER_DAYS
+        self._archived = 0
+        writer.completed.connect(self._on_completed)
+        writer.failed.connect(self._on_failed)
+
+    def is_running(self):
+        return self._token is not None
+
+    def start(self, older_than_days=None):
+        if self.is_running():
+            return
+        self._older_than_days = older_than_days if older_than_days is not None else db.ARCHIVE_AFTER_DAYS
+        self._archived = 0
+        self._stopped = False
+        if self._older_than_days > 0:
+            self._submit(self.writer.store.copy_to_archive, self._older_than_days)
+
+    def stop(self):
+        self._stopped = True
+
+    def _submit(self, step, *args):
+        # Copy, remove and vacuum steps each go through the queue on their own, so each one is a
+        # separate transaction and user writes queued in between wait for at most one batch.
+        if self._stopped:
+            self._token = None
+            return
+        self._step = step
+        self._token = self.writer.submit(step, *args)
+
+    def _on_completed(self, token, result):
+        if token != self._token:
+            return
+        store = self.writer.store
+        if self._step == store.copy_to_archive:
+            if result:
+                self._submit(store.remove_archived, result)
+            elif self._archived:
+                self._submit(store.vacuum_step)
+            else:
+                self._token = None
+                self.finished.emit(0)
+        elif self._step == store.remove_archived:
+            self._archived += result
+            self.progress.emit(self._archived)
+            self._submit(store.copy_to_archive, self._older_than_days)
+        elif result:
+            self._submit(store.vacuum_step)
+        else:
+            self._token = None
+            self.finished.emit(self._archived)
+
+    def _on_failed(self, token, message):
+        if token != self._token:
+            return
+        self._token = None
+        self.failed.emit(message)